@@ -1,15 +1,45 @@
 # 'requests' para fazer requisições HTTP e obter o conteúdo HTML das páginas web.
 import requests
 
-# 'BeautifulSoup' para analisar (fazer o "parse") do conteúdo HTML e extrair dados de forma fácil.
-from bs4 import BeautifulSoup
+# 'HTTPAdapter' permite configurar o pool de conexões keep-alive reaproveitado entre as requisições.
+from requests.adapters import HTTPAdapter
+
+# Camada de extração: analisa (faz o "parse") do HTML com selectolax/lxml quando
+# instalados, ou com o BeautifulSoup.
+from extracao import (
+    extrair_categorias, extrair_pagina_categoria, extrair_pagina_livro, BACKEND_PADRAO, BACKENDS_DISPONIVEIS,
+)
+
+# Livros semelhantes (TF-IDF do título, categoria, preço e nota), recalculados no fim da ingestão.
+import semelhantes
 
 # 'urljoin' para construir URLs completas a partir de caminhos relativos (essencial para a paginação).
-from urllib.parse import urljoin
+# 'urlsplit' para descobrir o host de cada URL (usado no limite de conexões por host).
+from urllib.parse import urljoin, urlsplit
+
+# Bibliotecas padrão para a raspagem concorrente e para a linha de comando.
+import argparse
+import hashlib
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
 
 # Componentes do SQLAlchemy, um ORM (Object-Relational Mapper) para interagir com o banco de dados usando objetos Python.
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import bindparam, create_engine, select, func, Column, Integer, String, DateTime, Boolean, Float, ForeignKey, Text
+from sqlalchemy.orm import declarative_base
+
+# 'insert' do dialeto SQLite oferece o 'ON CONFLICT ... DO UPDATE' (upsert).
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Estruturas do banco compartilhadas com a API (migrações, busca textual e campos numéricos).
+from banco import (
+    garantir_busca_textual, garantir_esquema, campos_numericos, incrementar_versao_catalogo, atualizar_categorias,
+    ativar_wal, configurar_sqlite, ultima_sequencia,
+)
 
 # =============================================================================
 # SOLUÇÃO PARA CONECTAR AO BANCO DE DADOS NA PASTA 'instance'
@@ -36,6 +66,29 @@ os.makedirs(instance_folder, exist_ok=True)
 # 4. Monta a URI do banco de dados apontando para o arquivo dentro da pasta 'instance'
 SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(instance_folder, 'base.db')
 
+# URL da página inicial do site a ser "raspado".
+URL_PADRAO = "https://books.toscrape.com/"
+
+# Valores padrão da raspagem concorrente (podem ser alterados pela linha de comando).
+CONCORRENCIA_PADRAO = 8
+LIMITE_POR_HOST_PADRAO = 8
+TIMEOUT_REQUISICAO = 30
+
+# Novas tentativas com espera exponencial (0,5s, 1s, 2s, ...) antes de desistir de uma página.
+TENTATIVAS_PADRAO = 4
+ESPERA_BASE = 0.5
+
+# Quantidade de páginas processadas entre dois checkpoints (commit no banco).
+INTERVALO_CHECKPOINT_PADRAO = 20
+
+# Segundos entre duas linhas de progresso (páginas/s, livros/s, bytes baixados...).
+INTERVALO_RELATORIO_PADRAO = 5.0
+
+# Etapa opcional de detalhes ('--detalhes'): páginas de livro baixadas em paralelo e
+# itens aceitos em cada fila entre as etapas (o limite da memória usada por ela).
+CONCORRENCIA_DETALHES_PADRAO = 8
+FILA_DETALHES_PADRAO = 100
+
 
 # Cria uma classe Base declarativa da qual nossos modelos de tabela herdarão.
 Base = declarative_base()
@@ -54,6 +107,60 @@ class Livros(Base):
     categoria = Column(String)
     imagem = Column(String)
 
+    # Valores normalizados (e indexados) para filtros e ordenação no banco:
+    # preço em centavos, nota de 1 a 5 e disponibilidade em estoque.
+    preco_centavos = Column(Integer, index=True)
+    nota = Column(Integer, index=True)
+    em_estoque = Column(Boolean, index=True)
+
+    # Categoria normalizada; a coluna 'categoria' (texto) continua gravada por compatibilidade.
+    categoria_id = Column(Integer, ForeignKey('categorias.id'), index=True)
+
+    # Feed de alterações: quando o livro apareceu, quando mudou pela última vez e a
+    # posição da última mudança na sequência compartilhada com 'livros_removidos'.
+    criado_em = Column(DateTime)
+    atualizado_em = Column(DateTime)
+    sequencia = Column(Integer, index=True)
+
+    # Campos da página de detalhe do livro, preenchidos só com '--detalhes'.
+    upc = Column(String)
+    descricao = Column(Text)
+    quantidade_estoque = Column(Integer)
+    quantidade_avaliacoes = Column(Integer)
+
+# Livros que sumiram do site: a remoção também entra no feed de alterações.
+class LivrosRemovidos(Base):
+    __tablename__ = 'livros_removidos'
+
+    id = Column(Integer, primary_key=True)
+    titulo = Column(String)
+    categoria_id = Column(Integer)
+    sequencia = Column(Integer, nullable=False, index=True)
+    removido_em = Column(DateTime)
+
+# Vizinhos de cada livro (ver semelhantes.py), recalculados ao fim de cada ingestão
+# que altera o catálogo; a chave primária (livro, posição) é o índice da consulta da API.
+class LivrosSemelhantes(Base):
+    __tablename__ = 'livros_semelhantes'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    livro_id = Column(Integer, primary_key=True)
+    posicao = Column(Integer, primary_key=True)
+    semelhante_id = Column(Integer, nullable=False)
+    similaridade = Column(Float, nullable=False)
+
+# Categorias do catálogo, com a quantidade de livros e os preços (em centavos)
+# recalculados pela ingestão a cada gravação.
+class Categorias(Base):
+    __tablename__ = 'categorias'
+
+    id = Column(Integer, primary_key=True)
+    nome = Column(String, unique=True, nullable=False)
+    quantidade_livros = Column(Integer, nullable=False, default=0, server_default='0')
+    preco_minimo_centavos = Column(Integer)
+    preco_maximo_centavos = Column(Integer)
+    preco_medio_centavos = Column(Float)
+
 # Definição do modelo ORM para a tabela 'usuario'.
 class Usuario(Base):
     # CORREÇÃO: Adicionando o nome da tabela.
@@ -65,120 +172,1123 @@ class Usuario(Base):
     nome_usuario = Column(String(80), unique=True, nullable=False)
     senha = Column(String(120), nullable=False)
 
+# Estado de cada página de categoria já raspada, usado na raspagem incremental.
+class EstadoCrawl(Base):
+    __tablename__ = 'estado_crawl'
 
-# Cria a "engine" (motor) que gerencia a conexão com o banco de dados.
-engine = create_engine(SQLALCHEMY_DATABASE_URI)
+    url = Column(String, primary_key=True)
+    # Validadores devolvidos pelo servidor, reenviados nas requisições condicionais.
+    etag = Column(String)
+    last_modified = Column(String)
+    # Hash SHA-256 do HTML, para detectar páginas iguais mesmo sem ETag/Last-Modified.
+    hash_conteudo = Column(String)
+    # Paginação guardada para continuar a navegação sem analisar a página de novo.
+    proxima = Column(String)
+    total_paginas = Column(Integer)
+    # Títulos dos livros da página (lista em JSON): uma página ignorada por não ter mudado
+    # ainda conta os seus livros como presentes no site.
+    titulos = Column(Text)
+    atualizado_em = Column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
 
-# Cria TODAS as tabelas ('livros' e 'usuario') no banco de dados, caso ainda não existam.
-Base.metadata.create_all(engine)
+# Fronteira da raspagem em andamento (páginas pendentes, concluídas e com falha),
+# gravada nos checkpoints para que uma execução interrompida possa ser retomada.
+class FronteiraCrawl(Base):
+    __tablename__ = 'fronteira_crawl'
 
-# Cria uma fábrica de sessões ('Session') que será usada para criar objetos de sessão individuais.
-Session = sessionmaker(bind=engine)
+    url = Column(String, primary_key=True)
+    # 'pendente', 'concluida' ou 'falha'.
+    situacao = Column(String, nullable=False)
+    erro = Column(String)
+    atualizado_em = Column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
 
-# Cria uma instância de sessão, que é a nossa "ponte" para interagir com o banco de dados.
-session = Session()
 
-# URL da página inicial do site a ser "raspado".
-url = "https://books.toscrape.com/"
-
-print("Iniciando o scraping do site 'books.toscrape.com'...")
-
-# Faz uma requisição GET para a URL inicial.
-response = requests.get(url)
-
-# Obtém o conteúdo HTML da resposta.
-html = response.text
-
-# Cria um objeto BeautifulSoup para analisar o HTML.
-soup = BeautifulSoup(html, "html.parser")
-
-# Seleciona todos os links de categorias na barra lateral usando um seletor CSS.
-categories = soup.select('div.side_categories ul.nav-list ul li a')
-print(f"Encontradas {len(categories)} categorias.")
-
-# Itera sobre cada tag de link (<a>) encontrada para as categorias.
-for cat in categories:
-    # Constrói a URL completa para a página da categoria.
-    url_categoria = url + cat['href']
-
-    # Loop 'while True' para lidar com a paginação dentro de cada categoria.
-    # O loop continuará até que não haja mais um botão "próxima página".
-    while True:
-        print(f"Acessando a URL da categoria: {url_categoria}")
-        response = requests.get(url_categoria)
-        html = response.text
-        soup = BeautifulSoup(html, "html.parser")
-
-        # Extrai o nome da categoria do cabeçalho <h1> da página.
-        categoria_nome = soup.find('h1').text.strip()
-
-        # Encontra todos os contêineres de livros na página atual.
-        livros = soup.find_all('article', class_="product_pod")
-        print(f"Encontrados {len(livros)} livros na categoria '{categoria_nome}'...")
-
-        # Itera sobre cada livro encontrado na página.
-        for livro in livros:
-            # Extrai o título do livro.
-            titulo = livro.find('h3').text.strip()
-            
-            # Extrai a URL relativa da imagem e a torna completa (embora já seja relativa à raiz, o site a resolve).
-            imagem = livro.find('img')['src']
-            
-            # Extrai o preço do livro.
-            preco = livro.find('p', class_='price_color').text.strip()
-            
-            # Extrai o status de disponibilidade em estoque.
-            estoque = livro.select_one('p.instock.availability').get_text(strip=True)
-            
-            # Extrai a avaliação em estrelas.
-            estrelas_tag = livro.find('p', class_='star-rating')
-            classes = estrelas_tag.get("class", [])  # Pega a lista de classes, ex: ["star-rating", "Three"]
-            avaliacao = [c for c in classes if c != "star-rating"][0] # Remove "star-rating" e pega a classe de avaliação.
-
-     
-            
-           # Verifica se um livro com o mesmo título já existe no banco de dados.
-            # .first() retorna o objeto se encontrado, ou None caso contrário.
-            existe = session.query(Livros).filter_by(titulo=titulo).first()
-            
-            # Se o livro não existir no banco de dados...
-            if not existe:
-                print(f"Salvando livro novo: {titulo}")
-                # Cria uma nova instância do objeto 'Livros' com os dados extraídos.
-                novo_livro = Livros(
-                    titulo=titulo,
-                    preco=preco,
-                    avaliacao=avaliacao,
-                    disponibilidade=estoque,
-                    categoria=categoria_nome,
-                    imagem=imagem
+# Resumo de cada execução da ingestão, para acompanhar o desempenho ao longo do tempo.
+class ExecucaoIngestao(Base):
+    __tablename__ = 'execucoes_ingestao'
+
+    id = Column(Integer, primary_key=True)
+    iniciada_em = Column(DateTime, nullable=False)
+    duracao_s = Column(Float)
+    url = Column(String)
+    # 'completa', 'incremental' ou 'retomada'.
+    modo = Column(String)
+    # 'concluida', 'interrompida' ou 'falha'.
+    situacao = Column(String)
+    paginas_processadas = Column(Integer)
+    paginas_ignoradas = Column(Integer)
+    paginas_com_falha = Column(Integer)
+    livros_inseridos = Column(Integer)
+    livros_atualizados = Column(Integer)
+    livros_inalterados = Column(Integer)
+    requisicoes = Column(Integer)
+    novas_tentativas = Column(Integer)
+    bytes_baixados = Column(Integer)
+    tempo_download = Column(Float)
+    tempo_analise = Column(Float)
+    tempo_gravacao = Column(Float)
+    # Todos os contadores e o tempo de cada categoria, em JSON.
+    resumo = Column(Text)
+
+
+# =============================================================================
+# CLIENTE HTTP COMPARTILHADO
+# =============================================================================
+
+def criar_sessao_http(concorrencia):
+    # Uma única 'requests.Session' mantém as conexões abertas (keep-alive) e é
+    # reaproveitada por todas as threads, evitando um novo handshake TCP/TLS por página.
+    sessao_http = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=concorrencia, pool_maxsize=concorrencia)
+    sessao_http.mount("http://", adaptador)
+    sessao_http.mount("https://", adaptador)
+    return sessao_http
+
+
+class LimitadorPorHost:
+    # Limita quantas requisições simultâneas podem ir para um mesmo host,
+    # independentemente do tamanho do pool de threads.
+    def __init__(self, limite):
+        self.limite = limite
+        self._semaforos = {}
+        self._trava = threading.Lock()
+
+    def semaforo(self, url):
+        host = urlsplit(url).netloc
+        with self._trava:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.limite)
+            return self._semaforos[host]
+
+
+def baixar(sessao_http, limitador, url, cabecalhos=None, tentativas=TENTATIVAS_PADRAO, medidor=None):
+    # Faz a requisição GET respeitando o limite de conexões do host.
+    # Falhas de rede, 429 e 5xx são repetidas com espera exponencial (com um pouco de
+    # aleatoriedade para as threads não voltarem todas ao mesmo tempo).
+    for tentativa in range(tentativas):
+        if medidor is not None:
+            medidor.incrementar('requisicoes')
+            if tentativa:
+                medidor.incrementar('novas_tentativas')
+        try:
+            with limitador.semaforo(url):
+                response = sessao_http.get(url, headers=cabecalhos, timeout=TIMEOUT_REQUISICAO)
+            if response.status_code != 429 and response.status_code < 500:
+                response.raise_for_status()
+                return response
+            erro = requests.HTTPError(f"{response.status_code} para {url}", response=response)
+        except requests.HTTPError:
+            # Demais erros 4xx (ex: 404) não se resolvem tentando de novo.
+            raise
+        except requests.RequestException as excecao:
+            erro = excecao
+
+        if tentativa + 1 < tentativas:
+            espera = ESPERA_BASE * (2 ** tentativa)
+            print(f"Falha ao acessar {url} ({erro}); nova tentativa em {espera:.1f}s.")
+            time.sleep(espera + random.uniform(0, espera / 2))
+
+    raise erro
+
+
+def raspar_pagina(sessao_http, limitador, url_categoria, anterior=None, tentativas=TENTATIVAS_PADRAO,
+                  backend=BACKEND_PADRAO, medidor=None):
+    # Executado pelas threads do pool: baixa e analisa uma página de categoria.
+    # Se a página já foi raspada antes, a requisição é condicional (ETag/Last-Modified).
+    cabecalhos = {}
+    if anterior:
+        if anterior['etag']:
+            cabecalhos['If-None-Match'] = anterior['etag']
+        if anterior['last_modified']:
+            cabecalhos['If-Modified-Since'] = anterior['last_modified']
+
+    inicio = time.perf_counter()
+    response = baixar(sessao_http, limitador, url_categoria, cabecalhos, tentativas, medidor)
+    tempos = {
+        'tempo_download': time.perf_counter() - inicio,
+        'tempo_analise': 0.0,
+        'bytes': len(response.content),
+    }
+
+    # 304 Not Modified: nada mudou, reaproveita a paginação guardada.
+    if response.status_code == 304:
+        return dict(anterior, url=url_categoria, inalterada=True, estado=None, **tempos)
+
+    inicio = time.perf_counter()
+
+    estado = {
+        'url': url_categoria,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'hash_conteudo': hashlib.sha256(response.content).hexdigest(),
+    }
+
+    # Servidor sem validadores, mas o conteúdo é o mesmo: dispensa a análise do HTML.
+    if anterior and anterior['hash_conteudo'] == estado['hash_conteudo']:
+        estado.update(proxima=anterior['proxima'], total_paginas=anterior['total_paginas'],
+                      titulos=anterior.get('titulos'))
+        tempos['tempo_analise'] = time.perf_counter() - inicio
+        return dict(estado, inalterada=True, estado=estado, **tempos)
+
+    pagina = extrair_pagina_categoria(response.text, backend)
+    estado.update(proxima=pagina['proxima'], total_paginas=pagina['total_paginas'],
+                  titulos=json.dumps([livro['titulo'] for livro in pagina['livros']], ensure_ascii=False))
+    tempos['tempo_analise'] = time.perf_counter() - inicio
+    pagina.update(url=url_categoria, inalterada=False, estado=estado, **tempos)
+    return pagina
+
+
+def carregar_fronteira(engine):
+    # Carrega a fronteira gravada pela última execução (url -> situação).
+    with engine.connect() as conexao:
+        return dict(conexao.execute(select(FronteiraCrawl.url, FronteiraCrawl.situacao)).all())
+
+
+def carregar_estados(engine):
+    # Carrega o estado de todas as páginas já raspadas (url -> validadores e paginação).
+    with engine.connect() as conexao:
+        return {
+            linha.url: dict(linha._mapping)
+            for linha in conexao.execute(select(EstadoCrawl.__table__))
+        }
+
+
+# =============================================================================
+# MEDIÇÃO
+# =============================================================================
+
+class MedidorIngestao:
+    # Contadores e tempos da execução, por etapa e por categoria. As threads de download
+    # contam requisições e novas tentativas; o restante é somado na thread principal.
+    # No lugar de uma linha por livro, imprime o progresso a cada 'intervalo' segundos.
+    def __init__(self, intervalo_relatorio=INTERVALO_RELATORIO_PADRAO):
+        self.intervalo_relatorio = intervalo_relatorio
+        self.inicio = time.perf_counter()
+        self.contadores = {
+            'paginas_processadas': 0, 'paginas_ignoradas': 0, 'paginas_com_falha': 0,
+            'livros_encontrados': 0, 'requisicoes': 0, 'novas_tentativas': 0, 'bytes_baixados': 0,
+            # Tempo somado das threads em cada etapa (com concorrência, pode passar do tempo total).
+            'tempo_download': 0.0, 'tempo_analise': 0.0,
+            # Etapa de detalhes (ver EtapaDetalhes), com os tempos somados da mesma forma.
+            'detalhes_baixados': 0, 'detalhes_com_falha': 0, 'detalhes_atualizados': 0,
+            'detalhes_inalterados': 0, 'detalhes_sem_livro': 0,
+            'tempo_download_detalhes': 0.0, 'tempo_analise_detalhes': 0.0, 'tempo_gravacao_detalhes': 0.0,
+        }
+        # Por categoria (pasta da URL): páginas, livros, bytes e tempo de download e análise.
+        self.categorias = {}
+        self._trava = threading.Lock()
+        self._ultimo_relatorio = self.inicio
+
+    def incrementar(self, nome, valor=1):
+        with self._trava:
+            self.contadores[nome] += valor
+
+    def registrar_pagina(self, url_pagina, pagina):
+        if pagina['inalterada']:
+            self.incrementar('paginas_ignoradas')
+        else:
+            self.incrementar('paginas_processadas')
+            self.incrementar('livros_encontrados', len(pagina['livros']))
+        self.incrementar('bytes_baixados', pagina['bytes'])
+        self.incrementar('tempo_download', pagina['tempo_download'])
+        self.incrementar('tempo_analise', pagina['tempo_analise'])
+
+        categoria = self.categorias.setdefault(_pasta_da_url(url_pagina), {
+            'paginas': 0, 'livros': 0, 'bytes': 0, 'tempo_download': 0.0, 'tempo_analise': 0.0,
+        })
+        categoria['paginas'] += 1
+        categoria['livros'] += 0 if pagina['inalterada'] else len(pagina['livros'])
+        categoria['bytes'] += pagina['bytes']
+        categoria['tempo_download'] += pagina['tempo_download']
+        categoria['tempo_analise'] += pagina['tempo_analise']
+
+    def relatar_se_preciso(self, gravador):
+        agora = time.perf_counter()
+        if agora - self._ultimo_relatorio >= self.intervalo_relatorio:
+            self._ultimo_relatorio = agora
+            self.relatar(gravador)
+
+    def relatar(self, gravador):
+        decorrido = max(time.perf_counter() - self.inicio, 1e-9)
+        c = self.contadores
+        paginas = c['paginas_processadas'] + c['paginas_ignoradas']
+        detalhes = ''
+        if c['detalhes_baixados'] or c['detalhes_com_falha']:
+            detalhes = (f" | detalhes: {c['detalhes_baixados']} ({c['detalhes_baixados'] / decorrido:.1f}/s; "
+                        f"{c['detalhes_atualizados']} gravados, {c['detalhes_com_falha']} com falha)")
+        print(
+            f"[{decorrido:7.1f}s] páginas: {paginas} ({paginas / decorrido:.1f}/s; "
+            f"{c['paginas_ignoradas']} sem alterações, {c['paginas_com_falha']} com falha) | "
+            f"livros: {c['livros_encontrados']} ({c['livros_encontrados'] / decorrido:.1f}/s; "
+            f"{gravador.inseridos} novos, {gravador.atualizados} atualizados) | "
+            f"{c['bytes_baixados'] / 1e6:.1f} MB ({c['bytes_baixados'] / 1e6 / decorrido:.2f} MB/s) | "
+            f"novas tentativas: {c['novas_tentativas']}{detalhes}",
+            flush=True,
+        )
+
+    def resumo(self, gravador):
+        # Resumo da execução em estruturas simples (gravado em JSON na tabela 'execucoes_ingestao').
+        resumo = dict(
+            self.contadores,
+            duracao_s=time.perf_counter() - self.inicio,
+            livros_inseridos=gravador.inseridos,
+            livros_atualizados=gravador.atualizados,
+            livros_inalterados=gravador.inalterados,
+            livros_removidos=gravador.removidos,
+            tempo_gravacao=gravador.tempo_gravacao,
+        )
+        resumo['categorias'] = self.categorias
+        return resumo
+
+    def categorias_mais_lentas(self, quantidade=5):
+        return sorted(
+            self.categorias.items(),
+            key=lambda item: item[1]['tempo_download'] + item[1]['tempo_analise'],
+            reverse=True,
+        )[:quantidade]
+
+
+def _pasta_da_url(url_pagina):
+    # ".../category/books/travel_2/page-2.html" -> "travel_2"
+    return url_pagina.rstrip('/').rsplit('/', 2)[-2]
+
+
+# =============================================================================
+# RASPAGEM
+# =============================================================================
+
+def rastrear(url, gravador, concorrencia=CONCORRENCIA_PADRAO, limite_por_host=LIMITE_POR_HOST_PADRAO,
+             estados=None, fronteira=None, tentativas=TENTATIVAS_PADRAO,
+             intervalo_checkpoint=INTERVALO_CHECKPOINT_PADRAO, backend=BACKEND_PADRAO,
+             medidor=None, detalhado=False, limitador=None, detalhes=None):
+    # 'estados' traz o que foi guardado na última execução; vazio = raspagem completa.
+    # 'fronteira' (url -> situação) só é informada ao retomar uma execução interrompida.
+    # 'detalhado' imprime uma linha por página, além do progresso periódico do medidor.
+    # 'detalhes' (EtapaDetalhes) recebe o link de cada livro das páginas analisadas.
+    estados = estados or {}
+    medidor = medidor or MedidorIngestao()
+
+    sessao_http = criar_sessao_http(concorrencia)
+    limitador = limitador or LimitadorPorHost(limite_por_host)
+
+    if fronteira:
+        # Retomada: as páginas concluídas não são baixadas de novo; as pendentes
+        # e as que falharam voltam para a fila.
+        concluidas = {u for u, situacao in fronteira.items() if situacao == 'concluida'}
+        iniciais = [u for u in fronteira if u not in concluidas]
+        print(f"Retomando a raspagem: {len(concluidas)} páginas já concluídas, {len(iniciais)} a processar.")
+    else:
+        concluidas = set()
+        # Faz uma requisição GET para a URL inicial e obtém as categorias da barra lateral.
+        resposta = baixar(sessao_http, limitador, url, tentativas=tentativas, medidor=medidor)
+        medidor.incrementar('bytes_baixados', len(resposta.content))
+        iniciais = extrair_categorias(resposta.text, url, backend)
+        print(f"Encontradas {len(iniciais)} categorias.")
+
+        # Nova execução: a fronteira anterior é descartada e as categorias formam o
+        # primeiro checkpoint.
+        gravador.limpar_fronteira()
+        for url_categoria in iniciais:
+            gravador.registrar_fronteira(url_categoria, 'pendente')
+        gravador.checkpoint()
+
+    executor = ThreadPoolExecutor(max_workers=concorrencia)
+    # Páginas enviadas ao pool e ainda não processadas (futuro -> URL).
+    pendentes = {}
+    try:
+        # URLs já enfileiradas, para que nenhuma página seja baixada duas vezes.
+        enfileiradas = set(concluidas)
+
+        def enfileirar(url_pagina, nova=True):
+            if url_pagina not in enfileiradas:
+                enfileiradas.add(url_pagina)
+                if nova:
+                    gravador.registrar_fronteira(url_pagina, 'pendente')
+                futuro = executor.submit(
+                    raspar_pagina, sessao_http, limitador, url_pagina, estados.get(url_pagina), tentativas, backend,
+                    medidor,
                 )
-                # Adiciona o novo objeto à sessão.
-                session.add(novo_livro)
-                # Comita (salva) a transação no banco de dados.
-                session.commit()
+                pendentes[futuro] = url_pagina
+
+        # Todas as categorias entram na fila de uma vez; as threads do pool as baixam em paralelo.
+        for url_categoria in iniciais:
+            enfileirar(url_categoria, nova=False)
+
+        desde_checkpoint = 0
+        while pendentes:
+            # O 'timeout' mantém o relatório de progresso em dia mesmo com páginas lentas.
+            concluidos, _ = wait(pendentes, timeout=medidor.intervalo_relatorio, return_when=FIRST_COMPLETED)
+            medidor.relatar_se_preciso(gravador)
+
+            for futuro in concluidos:
+                url_categoria = pendentes.pop(futuro)
+
+                try:
+                    pagina = futuro.result()
+                except Exception as erro:
+                    # Uma página que falhou mesmo após as novas tentativas não interrompe
+                    # a raspagem: fica marcada na fronteira e é refeita com '--retomar'.
+                    print(f"Desistindo da página {url_categoria}: {erro}")
+                    medidor.incrementar('paginas_com_falha')
+                    gravador.registrar_fronteira(url_categoria, 'falha', str(erro))
+                    continue
+
+                medidor.registrar_pagina(url_categoria, pagina)
+                if detalhado:
+                    if pagina['inalterada']:
+                        print(f"Página sem alterações, análise ignorada: {url_categoria}")
+                    else:
+                        print(f"Encontrados {len(pagina['livros'])} livros na categoria '{pagina['categoria']}' ({url_categoria})")
+
+                if pagina['proxima']:
+                    if pagina['proxima'] == 'page-2.html':
+                        # Na primeira página já sabemos quantas páginas a categoria tem ("Page 1 of 8"):
+                        # as demais são enfileiradas de uma vez, sem esperar o botão "next" de cada uma.
+                        for numero in range(3, pagina['total_paginas'] + 1):
+                            enfileirar(urljoin(url_categoria, f'page-{numero}.html'))
+
+                    # Usa urljoin para construir a URL completa da próxima página de forma segura.
+                    enfileirar(urljoin(url_categoria, pagina['proxima']))
+
+                # A gravação acontece sempre nesta thread, um único escritor para o SQLite.
+                # A página só é marcada como concluída junto com os seus livros.
+                gravador.processar_pagina(pagina)
+                gravador.registrar_fronteira(url_categoria, 'concluida')
+
+                # Com a fila de detalhes cheia, esta thread espera: as listagens não
+                # avançam mais rápido do que as páginas de livro são processadas.
+                if detalhes is not None and not pagina['inalterada']:
+                    for livro in pagina['livros']:
+                        detalhes.enfileirar(livro['titulo'], urljoin(url_categoria, livro['link']))
+
+                desde_checkpoint += 1
+                if desde_checkpoint >= intervalo_checkpoint:
+                    gravador.checkpoint()
+                    desde_checkpoint = 0
+    except BaseException:
+        # Falha na gravação ou Ctrl-C: as páginas ainda na fila são canceladas em vez de
+        # baixadas até o fim da fronteira. Elas continuam 'pendente' na fronteira e são
+        # refeitas com '--retomar'. ('cancel_futures' do shutdown só existe a partir do
+        # Python 3.9.)
+        for futuro in pendentes:
+            futuro.cancel()
+        executor.shutdown(wait=False)
+        raise
+    else:
+        executor.shutdown()
+    finally:
+        sessao_http.close()
+
+    return dict(medidor.contadores)
+
+
+# =============================================================================
+# GRAVAÇÃO EM LOTE
+# =============================================================================
+
+# Campos atualizados quando um livro já existente volta a aparecer no site.
+CAMPOS_ATUALIZAVEIS = ('preco', 'avaliacao', 'disponibilidade', 'categoria', 'imagem')
+
+# Campos derivados dos de texto (valores numéricos e categoria normalizada), gravados junto com eles.
+CAMPOS_DERIVADOS = ('preco_centavos', 'nota', 'em_estoque', 'categoria_id')
+
+# Campos do feed de alterações, preenchidos na gravação de cada lote ('criado_em' só na inserção).
+CAMPOS_ALTERACAO = ('sequencia', 'atualizado_em')
+
+LOTE_PADRAO = 500
+
+
+class GravadorLivros:
+    # Acumula os livros raspados e os grava em lotes com INSERT ... ON CONFLICT (upsert),
+    # no lugar de um SELECT + COMMIT por livro. Cada lote (livros, estado das páginas e
+    # fronteira) é gravado em uma transação curta, aberta só na hora de gravar: a trava
+    # de escrita do SQLite nunca fica presa enquanto as páginas são baixadas, e a API
+    # pode gravar (ex: '/registro') durante a ingestão.
+    def __init__(self, engine, tamanho_lote=LOTE_PADRAO):
+        self.tamanho_lote = tamanho_lote
+        self.inseridos = 0
+        self.atualizados = 0
+        self.inalterados = 0
+        self.removidos = 0
+        # Tempo gasto na gravação (montagem dos lotes, comandos e commits).
+        self.tempo_gravacao = 0.0
+        self._buffer = []
+        self._estados = []
+        self._fronteira = []
+        # Categorias dos livros do lote, cujos agregados são recalculados ao gravá-lo.
+        self._categorias_alteradas = set()
+        self._limpar_fronteira = False
+        # Títulos encontrados no site nesta execução, para detectar os livros removidos.
+        # Deixa de ser confiável se alguma página ignorada não tiver os títulos guardados.
+        self._vistos = set()
+        self.vistos_completos = True
+        # Compartilhada com a gravação dos detalhes (outra conexão, em outra thread): as
+        # duas leem a última sequência e gravam em seguida, e uma transação do SQLite não
+        # passa de leitura para escrita se outra conexão gravou nesse meio-tempo.
+        self.trava_escrita = threading.Lock()
+
+        self._conexao = engine.connect()
+
+        # Carrega de uma só vez os livros existentes (título -> campos atualizáveis),
+        # para decidir em memória o que é novo, o que mudou e o que pode ser ignorado.
+        colunas = [Livros.__table__.c[campo] for campo in CAMPOS_ATUALIZAVEIS]
+        self._existentes = {
+            linha[0]: tuple(linha[1:])
+            for linha in self._conexao.execute(select(Livros.__table__.c.titulo, *colunas))
+        }
+
+        # Categorias já cadastradas (nome -> id); as novas são inseridas ao aparecerem.
+        tabela_categorias = Categorias.__table__
+        self._categorias = {
+            nome: id_categoria
+            for id_categoria, nome in self._conexao.execute(select(tabela_categorias.c.id, tabela_categorias.c.nome))
+        }
+        # Encerra a leitura inicial: nenhuma transação fica aberta entre os lotes.
+        self._conexao.commit()
+
+        # Upsert: insere o livro novo ou atualiza preço/disponibilidade do já existente.
+        tabela = Livros.__table__
+        comando = sqlite_insert(tabela)
+        self._upsert = comando.on_conflict_do_update(
+            index_elements=[tabela.c.titulo],
+            set_={
+                campo: comando.excluded[campo]
+                for campo in CAMPOS_ATUALIZAVEIS + CAMPOS_DERIVADOS + CAMPOS_ALTERACAO
+            },
+        )
+
+        # O estado das páginas vai na mesma transação dos livros: uma página só é
+        # considerada "sem alterações" depois que os seus livros estão gravados.
+        tabela_estado = EstadoCrawl.__table__
+        comando = sqlite_insert(tabela_estado)
+        self._upsert_estado = comando.on_conflict_do_update(
+            index_elements=[tabela_estado.c.url],
+            set_=dict(
+                {
+                    coluna.name: comando.excluded[coluna.name]
+                    for coluna in tabela_estado.c if coluna.name not in ('url', 'atualizado_em')
+                },
+                atualizado_em=func.current_timestamp(),
+            ),
+        )
+
+        tabela_fronteira = FronteiraCrawl.__table__
+        comando = sqlite_insert(tabela_fronteira)
+        self._upsert_fronteira = comando.on_conflict_do_update(
+            index_elements=[tabela_fronteira.c.url],
+            set_={
+                'situacao': comando.excluded.situacao,
+                'erro': comando.excluded.erro,
+                'atualizado_em': func.current_timestamp(),
+            },
+        )
+
+    def adicionar(self, categoria, livros):
+        for dados in livros:
+            linha = dict(dados, categoria=categoria)
+            titulo = linha['titulo']
+            valores = tuple(linha[campo] for campo in CAMPOS_ATUALIZAVEIS)
+            anterior = self._existentes.get(titulo)
+
+            # Só os contadores: o progresso é informado periodicamente pelo MedidorIngestao.
+            if anterior == valores:
+                self.inalterados += 1
+                continue
+
+            if anterior is None:
+                self.inseridos += 1
             else:
-                # Se o livro já existir, apenas informa no console.
-                print(f"Livro já existente no banco de dados: {titulo}")
-
-
-        # Procura pelo link do botão "next" (próxima página).
-        next_button = soup.select_one('li.next > a')
-        
-        # Se um botão "next" for encontrado...
-        if next_button:
-            # Pega o link relativo (ex: 'page-2.html') do botão.
-            next_page_url_relativa = next_button['href']
-            # Usa urljoin para construir a URL completa da próxima página de forma segura.
-            url_categoria = urljoin(url_categoria, next_page_url_relativa)
+                self.atualizados += 1
+
+            self._existentes[titulo] = valores
+            linha.update(campos_numericos(linha), categoria_id=self._id_categoria(categoria))
+            self._buffer.append(linha)
+            self._categorias_alteradas.add(linha['categoria_id'])
+
+            if len(self._buffer) >= self.tamanho_lote:
+                self.descarregar()
+
+    def _id_categoria(self, nome):
+        if nome not in self._categorias:
+            with self.trava_escrita, self._conexao.begin():
+                resultado = self._conexao.execute(Categorias.__table__.insert().values(nome=nome))
+            self._categorias[nome] = resultado.inserted_primary_key[0]
+        return self._categorias[nome]
+
+    def registrar_estado(self, estado):
+        self._estados.append(estado)
+
+    def processar_pagina(self, pagina):
+        inicio = time.perf_counter()
+        if not pagina['inalterada']:
+            self._vistos.update(livro['titulo'] for livro in pagina['livros'])
+            self.adicionar(pagina['categoria'], pagina['livros'])
+        elif pagina.get('titulos') is not None:
+            self._vistos.update(json.loads(pagina['titulos']))
         else:
-            # Se não houver botão "next", significa que estamos na última página da categoria.
-            # O 'break' encerra o loop 'while' e o script passa para a próxima categoria.
-            print(f"Fim da categoria '{categoria_nome}'. Passando para a próxima.")
-            break
+            self.vistos_completos = False
+        if pagina['estado']:
+            self.registrar_estado(pagina['estado'])
+        self.tempo_gravacao += time.perf_counter() - inicio
+
+    def registrar_fronteira(self, url, situacao, erro=None):
+        self._fronteira.append({'url': url, 'situacao': situacao, 'erro': erro})
+
+    def limpar_fronteira(self):
+        # A fronteira anterior é apagada na mesma transação que grava a nova.
+        self._limpar_fronteira = True
+
+    def descarregar(self):
+        # Grava o que foi acumulado em uma única transação curta, com um 'executemany'
+        # por tabela. Os livros vêm antes do estado e da fronteira: uma página só fica
+        # "sem alterações" ou "concluída" depois que os seus livros estão gravados.
+        if not (self._buffer or self._estados or self._fronteira or self._limpar_fronteira):
+            return
+        with self.trava_escrita, self._conexao.begin():
+            if self._buffer:
+                # A sequência é lida e usada na mesma transação de escrita: com um único
+                # escritor por vez no SQLite, os números nunca se repetem nem voltam atrás.
+                sequencia = ultima_sequencia(self._conexao)
+                agora = _agora()
+                for linha in self._buffer:
+                    sequencia += 1
+                    linha.update(sequencia=sequencia, criado_em=agora, atualizado_em=agora)
+                self._conexao.execute(self._upsert, self._buffer)
+                # Os agregados das categorias e a nova versão do catálogo ficam visíveis junto
+                # com os livros alterados (a versão invalida as respostas em cache da API).
+                atualizar_categorias(self._conexao, self._categorias_alteradas)
+                incrementar_versao_catalogo(self._conexao)
+            if self._estados:
+                self._conexao.execute(self._upsert_estado, self._estados)
+            if self._limpar_fronteira:
+                self._conexao.execute(FronteiraCrawl.__table__.delete())
+            if self._fronteira:
+                self._conexao.execute(self._upsert_fronteira, self._fronteira)
+        self._buffer = []
+        self._estados = []
+        self._fronteira = []
+        self._categorias_alteradas = set()
+        self._limpar_fronteira = False
+
+    def remover_ausentes(self):
+        # Registra como removidos os livros que não apareceram em nenhuma página desta
+        # execução: cada um vai para 'livros_removidos' com um novo número na sequência
+        # e sai de 'livros' (os gatilhos da busca textual atualizam o índice).
+        self.descarregar()
+        tabela = Livros.__table__
+        with self.trava_escrita, self._conexao.begin():
+            ausentes = [
+                linha for linha in self._conexao.execute(select(tabela.c.id, tabela.c.titulo, tabela.c.categoria_id))
+                if linha.titulo not in self._vistos
+            ]
+            if not ausentes:
+                return 0
+
+            sequencia = ultima_sequencia(self._conexao)
+            agora = _agora()
+            # 'OR REPLACE': o SQLite pode reaproveitar o maior ID de um livro apagado.
+            self._conexao.execute(LivrosRemovidos.__table__.insert().prefix_with('OR REPLACE'), [
+                {'id': linha.id, 'titulo': linha.titulo, 'categoria_id': linha.categoria_id,
+                 'sequencia': sequencia + i, 'removido_em': agora}
+                for i, linha in enumerate(ausentes, start=1)
+            ])
+            self._conexao.execute(tabela.delete().where(tabela.c.id == bindparam('id_removido')),
+                                  [{'id_removido': linha.id} for linha in ausentes])
+            atualizar_categorias(self._conexao, {linha.categoria_id for linha in ausentes})
+            incrementar_versao_catalogo(self._conexao)
+
+        for linha in ausentes:
+            self._existentes.pop(linha.titulo, None)
+        self.removidos += len(ausentes)
+        return len(ausentes)
+
+    def checkpoint(self):
+        # Grava o estado das páginas e a fronteira acumulados desde o último checkpoint:
+        # uma execução interrompida recomeça daqui.
+        inicio = time.perf_counter()
+        self.descarregar()
+        self.tempo_gravacao += time.perf_counter() - inicio
+
+    def fechar(self):
+        inicio = time.perf_counter()
+        try:
+            self.descarregar()
+        finally:
+            self._conexao.close()
+            self.tempo_gravacao += time.perf_counter() - inicio
+
+
+def _agora():
+    # Horário em UTC sem fuso, o mesmo formato do CURRENT_TIMESTAMP do SQLite.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# =============================================================================
+# DETALHES DOS LIVROS (ETAPA OPCIONAL)
+# =============================================================================
+
+# Campos lidos da página de cada livro (ver extrair_pagina_livro).
+CAMPOS_DETALHES = ('upc', 'descricao', 'quantidade_estoque', 'quantidade_avaliacoes')
+
+# Marca de fim de cada fila: a thread que a recebe termina.
+_FIM = None
+
+
+class EtapaDetalhes:
+    # Baixa, analisa e grava a página de cada livro encontrado nas listagens, em
+    # threads ligadas por filas limitadas (queue.Queue com 'maxsize'):
+    #
+    #   listagens --URL--> N threads de download --HTML--> 1 thread de análise
+    #             --campos--> 1 thread de gravação (em lotes)
+    #
+    # As etapas trabalham ao mesmo tempo, e cada fila guarda no máximo 'tamanho_fila'
+    # itens: quando uma etapa atrasa, a fila dela enche e quem a alimenta espera (até o
+    # laço das listagens, em 'rastrear'). A memória usada não cresce com o catálogo.
+    # A análise fica em uma só thread: com o GIL, mais threads não analisariam mais
+    # rápido, e os analisadores em C levam bem menos tempo que o download.
+    def __init__(self, engine, gravador, limitador, medidor, concorrencia=CONCORRENCIA_DETALHES_PADRAO,
+                 tamanho_fila=FILA_DETALHES_PADRAO, tamanho_lote=LOTE_PADRAO, tentativas=TENTATIVAS_PADRAO,
+                 backend=BACKEND_PADRAO):
+        self.tamanho_lote = tamanho_lote
+        self.tentativas = tentativas
+        self.backend = backend
+        self._engine = engine
+        self._trava_escrita = gravador.trava_escrita
+        self._limitador = limitador
+        self._medidor = medidor
+        self._sessao_http = criar_sessao_http(concorrencia)
+        self._urls = queue.Queue(maxsize=tamanho_fila)
+        self._paginas = queue.Queue(maxsize=tamanho_fila)
+        self._campos = queue.Queue(maxsize=tamanho_fila)
+        # Maior ocupação de cada fila, para conferir que a memória ficou limitada.
+        self.maximos = {'urls': 0, 'paginas': 0, 'campos': 0}
+        # Primeiro erro da gravação: a thread continua esvaziando a fila (para as
+        # demais não ficarem presas) e o erro é repassado em 'encerrar'.
+        self._erro = None
+        self._encerrada = False
+
+        # Daemon: uma ingestão interrompida não fica esperando as filas.
+        self._downloads = [threading.Thread(target=self._baixar, daemon=True) for _ in range(concorrencia)]
+        self._analise = threading.Thread(target=self._analisar, daemon=True)
+        self._gravacao = threading.Thread(target=self._gravar, daemon=True)
+        for thread in self._downloads + [self._analise, self._gravacao]:
+            thread.start()
+
+    def _colocar(self, fila, nome, item):
+        fila.put(item)
+        self.maximos[nome] = max(self.maximos[nome], fila.qsize())
+
+    def enfileirar(self, titulo, url_livro):
+        # Espera se a fila estiver cheia.
+        self._colocar(self._urls, 'urls', (titulo, url_livro))
+
+    def encerrar(self, descartar=False):
+        # Termina as etapas em ordem, cada uma depois de esvaziar a sua fila. Com
+        # 'descartar' (ingestão interrompida), as URLs ainda não baixadas são ignoradas.
+        if self._encerrada:
+            return None
+        self._encerrada = True
+        if descartar:
+            while True:
+                try:
+                    self._urls.get_nowait()
+                except queue.Empty:
+                    break
+        for _ in self._downloads:
+            self._urls.put(_FIM)
+        for thread in self._downloads:
+            thread.join()
+        self._paginas.put(_FIM)
+        self._analise.join()
+        self._campos.put(_FIM)
+        self._gravacao.join()
+        self._sessao_http.close()
+        if self._erro is not None and not descartar:
+            raise self._erro
+        return dict(self.maximos)
+
+    # ---- etapas (cada uma em suas threads) -------------------------------------------
+
+    def _baixar(self):
+        while True:
+            item = self._urls.get()
+            if item is _FIM:
+                return
+            titulo, url_livro = item
+            inicio = time.perf_counter()
+            try:
+                resposta = baixar(self._sessao_http, self._limitador, url_livro, tentativas=self.tentativas,
+                                  medidor=self._medidor)
+            except Exception as erro:
+                # Como nas listagens, um livro que falhou não interrompe a ingestão.
+                print(f"Desistindo dos detalhes de {url_livro}: {erro}")
+                self._medidor.incrementar('detalhes_com_falha')
+                continue
+            self._medidor.incrementar('tempo_download_detalhes', time.perf_counter() - inicio)
+            self._medidor.incrementar('detalhes_baixados')
+            self._medidor.incrementar('bytes_baixados', len(resposta.content))
+            # Sem charset no Content-Type (como no site original), o 'requests' decodifica
+            # o texto como ISO-8859-1 e a descrição ficaria com "â€™" no lugar de "’"; as
+            # páginas declaram UTF-8 no <meta>.
+            if 'charset' not in resposta.headers.get('Content-Type', ''):
+                resposta.encoding = 'utf-8'
+            self._colocar(self._paginas, 'paginas', (titulo, resposta.text))
+
+    def _analisar(self):
+        while True:
+            item = self._paginas.get()
+            if item is _FIM:
+                return
+            titulo, html = item
+            inicio = time.perf_counter()
+            try:
+                campos = extrair_pagina_livro(html, self.backend)
+            except Exception as erro:
+                print(f"Desistindo dos detalhes de '{titulo}': {erro}")
+                self._medidor.incrementar('detalhes_com_falha')
+                continue
+            finally:
+                self._medidor.incrementar('tempo_analise_detalhes', time.perf_counter() - inicio)
+            self._colocar(self._campos, 'campos', dict(campos, titulo=titulo))
+
+    def _gravar(self):
+        # A conexão é aberta na própria thread que a usa.
+        with self._engine.connect() as conexao:
+            # 'novos': itens recebidos desde a última gravação (o lote também leva os pendentes).
+            lote, novos = [], 0
+            while True:
+                item = self._campos.get()
+                fim = item is _FIM
+                if not fim:
+                    lote.append(item)
+                    novos += 1
+                if self._erro is not None:
+                    lote = []
+                elif lote and (fim or novos >= self.tamanho_lote):
+                    try:
+                        lote = self._gravar_lote(conexao, lote, fim)
+                    except Exception as erro:
+                        self._erro = erro
+                        lote = []
+                    novos = 0
+                if fim:
+                    return
+
+    def _gravar_lote(self, conexao, lote, final):
+        # Atualiza os livros do lote que mudaram, com um novo número na sequência (o feed
+        # de alterações e o cache da API enxergam os detalhes). Devolve os itens cujo
+        # livro ainda não está no banco: a listagem dele pode estar no lote do gravador
+        # que ainda não foi enviado, e eles voltam no próximo lote. No último, são
+        # descartados (o gravador já enviou tudo antes de 'encerrar').
+        inicio = time.perf_counter()
+        tabela = Livros.__table__
+        por_titulo = {item['titulo']: item for item in lote}
+        with self._trava_escrita, conexao.begin():
+            atuais = conexao.execute(
+                select(tabela.c.id, tabela.c.titulo, *(tabela.c[campo] for campo in CAMPOS_DETALHES))
+                .where(tabela.c.titulo.in_(list(por_titulo)))
+            ).all()
+            alterados = []
+            for linha in atuais:
+                item = por_titulo.pop(linha.titulo)
+                if tuple(linha[2:]) == tuple(item[campo] for campo in CAMPOS_DETALHES):
+                    self._medidor.incrementar('detalhes_inalterados')
+                    continue
+                alterados.append(dict({campo: item[campo] for campo in CAMPOS_DETALHES}, id_livro=linha.id))
+
+            if alterados:
+                sequencia = ultima_sequencia(conexao)
+                agora = _agora()
+                for item in alterados:
+                    sequencia += 1
+                    item.update(sequencia=sequencia, atualizado_em=agora)
+                conexao.execute(tabela.update().where(tabela.c.id == bindparam('id_livro')), alterados)
+                incrementar_versao_catalogo(conexao)
+        self._medidor.incrementar('detalhes_atualizados', len(alterados))
+        self._medidor.incrementar('tempo_gravacao_detalhes', time.perf_counter() - inicio)
+
+        pendentes = list(por_titulo.values())
+        if final:
+            self._medidor.incrementar('detalhes_sem_livro', len(pendentes))
+            return []
+        return pendentes
+
+
+def preparar_banco(engine):
+    # Cria TODAS as tabelas ('livros' e 'usuario') no banco de dados, caso ainda não existam,
+    # atualiza bancos criados por versões anteriores e cria o índice de busca textual (FTS5);
+    # os gatilhos o mantêm em dia durante a gravação. A API não migra o banco: só lê.
+    Base.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        garantir_esquema(conexao)
+        garantir_busca_textual(conexao)
+
+
+def migrar_banco(banco=SQLALCHEMY_DATABASE_URI):
+    # '--migrar': só atualiza o esquema (e calcula os livros semelhantes que faltarem), sem
+    # raspar o site. Serve para publicar um banco gerado por uma versão anterior: no Vercel
+    # o arquivo é somente leitura, então o journal volta ao modo padrão (DELETE), que não
+    # precisa dos arquivos '-wal' e '-shm' ao lado do banco.
+    engine = configurar_sqlite(create_engine(banco))
+    preparar_banco(engine)
+    if semelhantes.DISPONIVEL:
+        with engine.connect() as conexao:
+            calculados = semelhantes.semelhantes_calculados(conexao)
+        if not calculados:
+            print("Calculando os livros semelhantes...")
+            semelhantes.calcular_semelhantes(engine)
+    with engine.connect() as conexao:
+        conexao.exec_driver_sql("PRAGMA journal_mode=DELETE")
+    engine.dispose()
+
+
+def executar_ingestao(url=URL_PADRAO, banco=SQLALCHEMY_DATABASE_URI, concorrencia=CONCORRENCIA_PADRAO,
+                      limite_por_host=LIMITE_POR_HOST_PADRAO, lote=LOTE_PADRAO, backend=BACKEND_PADRAO,
+                      completo=False, retomar=False, tentativas=TENTATIVAS_PADRAO,
+                      intervalo_checkpoint=INTERVALO_CHECKPOINT_PADRAO,
+                      intervalo_relatorio=INTERVALO_RELATORIO_PADRAO, detalhado=False, calcular_semelhantes=True,
+                      detalhes=False, concorrencia_detalhes=CONCORRENCIA_DETALHES_PADRAO,
+                      fila_detalhes=FILA_DETALHES_PADRAO):
+    # Executa uma ingestão completa e devolve as estatísticas da execução
+    # (ou None se '--retomar' não encontrou nada pendente). O resumo da execução
+    # também é gravado na tabela 'execucoes_ingestao'.
+
+    # Cria a "engine" (motor) que gerencia a conexão com o banco de dados, com os
+    # mesmos PRAGMAs da API (espera pela trava de escrita). O journal em modo WAL, que
+    # deixa a API ler enquanto a ingestão grava, é ativado aqui, pelo escritor.
+    engine = configurar_sqlite(create_engine(banco))
+    ativar_wal(engine)
+
+    preparar_banco(engine)
+
+    # Validadores e hashes da última execução, para as requisições condicionais.
+    estados = {} if completo else carregar_estados(engine)
+
+    # A página de um livro só é baixada quando a listagem dele é analisada: se há livros
+    # gravados sem os detalhes (ex: ingestões anteriores sem '--detalhes'), todas as
+    # listagens são reprocessadas nesta execução.
+    if detalhes and estados and not retomar:
+        with engine.connect() as conexao:
+            sem_detalhes = conexao.execute(
+                select(func.count()).select_from(Livros.__table__).where(Livros.__table__.c.upc.is_(None))
+            ).scalar()
+        if sem_detalhes:
+            print(f"{sem_detalhes} livros ainda sem detalhes: todas as listagens serão reprocessadas.")
+            estados = {}
+
+    # Fronteira gravada pela execução interrompida (vazia = começa do início).
+    fronteira = carregar_fronteira(engine) if retomar else None
+    if retomar and fronteira and all(situacao == 'concluida' for situacao in fronteira.values()):
+        engine.dispose()
+        return None
+
+    # O gravador envia os livros em lotes e comita a cada checkpoint.
+    gravador = GravadorLivros(engine, tamanho_lote=lote)
+    medidor = MedidorIngestao(intervalo_relatorio)
+    # Compartilhado pelas listagens e pelas páginas de livro: o limite vale para as duas.
+    limitador = LimitadorPorHost(limite_por_host)
+    etapa_detalhes = None
+    iniciada_em = _agora()
+    modo = 'retomada' if fronteira else ('completa' if completo or not estados else 'incremental')
+    situacao = 'falha'
+
+    print(f"Iniciando o scraping do site '{url}'...")
+
+    try:
+        if detalhes:
+            etapa_detalhes = EtapaDetalhes(
+                engine, gravador, limitador, medidor, concorrencia=concorrencia_detalhes, tamanho_fila=fila_detalhes,
+                tamanho_lote=lote, tentativas=tentativas, backend=backend,
+            )
+        estatisticas = rastrear(
+            url,
+            gravador,
+            concorrencia=concorrencia,
+            limite_por_host=limite_por_host,
+            estados=estados,
+            fronteira=fronteira,
+            tentativas=tentativas,
+            intervalo_checkpoint=intervalo_checkpoint,
+            backend=backend,
+            medidor=medidor,
+            detalhado=detalhado,
+            limitador=limitador,
+            detalhes=etapa_detalhes,
+        )
+        if etapa_detalhes is not None:
+            # Os livros das últimas listagens são gravados antes: os detalhes que ainda
+            # esperam pelo seu livro são conferidos uma última vez ao encerrar a etapa.
+            gravador.checkpoint()
+            filas = etapa_detalhes.encerrar()
+            estatisticas.update(medidor.contadores, maximos_filas_detalhes=filas)
+        remover_ausentes(gravador, modo, estatisticas)
+        if calcular_semelhantes:
+            gravador.checkpoint()
+            estatisticas['semelhantes'] = atualizar_semelhantes(engine, gravador)
+        situacao = 'concluida'
+    except KeyboardInterrupt:
+        situacao = 'interrompida'
+        raise
+    finally:
+        # Mesmo em caso de falha, os livros já raspados são gravados.
+        gravador.fechar()
+        if etapa_detalhes is not None:
+            etapa_detalhes.encerrar(descartar=True)
+        resumo = medidor.resumo(gravador)
+        registrar_execucao(engine, url, modo, situacao, iniciada_em, resumo)
+        engine.dispose()
+
+    estatisticas.update(
+        inseridos=gravador.inseridos,
+        atualizados=gravador.atualizados,
+        inalterados=gravador.inalterados,
+        removidos=gravador.removidos,
+        tempo_gravacao=gravador.tempo_gravacao,
+        duracao_s=resumo['duracao_s'],
+        categorias_mais_lentas=medidor.categorias_mais_lentas(),
+    )
+    return estatisticas
+
+
+def remover_ausentes(gravador, modo, estatisticas):
+    # Só uma execução que percorreu o site inteiro sabe quais livros sumiram: uma
+    # retomada, uma página com falha ou uma página ignorada sem os títulos guardados
+    # (estado gravado antes do feed de alterações) fariam livros presentes parecerem removidos.
+    if modo == 'retomada':
+        motivo = "a execução retomou uma raspagem interrompida"
+    elif estatisticas['paginas_com_falha']:
+        motivo = "há páginas com falha"
+    elif not gravador.vistos_completos:
+        motivo = "há páginas ignoradas sem os títulos guardados (execute uma vez com '--completo')"
+    else:
+        gravador.remover_ausentes()
+        return
+    print(f"Livros removidos do site não foram verificados: {motivo}.")
+
+
+def atualizar_semelhantes(engine, gravador):
+    # Os vizinhos dependem do catálogo inteiro: qualquer livro novo, alterado ou removido
+    # muda a lista de outros livros, então o cálculo é refeito do zero (vetorizado, em
+    # blocos). Devolve o tempo de cada etapa, ou None se nada foi calculado.
+    if not semelhantes.DISPONIVEL:
+        print("Livros semelhantes não calculados: o NumPy não está instalado (pip install numpy).")
+        return None
+    with engine.connect() as conexao:
+        calculados = semelhantes.semelhantes_calculados(conexao)
+    if calculados and not (gravador.inseridos or gravador.atualizados or gravador.removidos):
+        return None
+    print("Calculando os livros semelhantes...")
+    return semelhantes.calcular_semelhantes(engine)
+
+
+def registrar_execucao(engine, url, modo, situacao, iniciada_em, resumo):
+    # Grava o resumo da execução: as colunas principais para consultas em SQL e
+    # o resumo completo (com o tempo de cada categoria) em JSON.
+    colunas = {coluna.name for coluna in ExecucaoIngestao.__table__.c}
+    with engine.begin() as conexao:
+        conexao.execute(ExecucaoIngestao.__table__.insert().values(
+            url=url, modo=modo, situacao=situacao, iniciada_em=iniciada_em,
+            resumo=json.dumps(resumo, ensure_ascii=False),
+            **{nome: valor for nome, valor in resumo.items() if nome in colunas},
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raspa o site 'books.toscrape.com' e alimenta a base de livros.")
+    parser.add_argument('--url', default=URL_PADRAO, help="URL inicial do site a ser raspado.")
+    parser.add_argument('--banco', default=SQLALCHEMY_DATABASE_URI, help="URI SQLAlchemy do banco de destino.")
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA_PADRAO,
+                        help="Número de páginas baixadas em paralelo (1 = modo sequencial).")
+    parser.add_argument('--limite-por-host', type=int, default=LIMITE_POR_HOST_PADRAO,
+                        help="Máximo de requisições simultâneas para um mesmo host.")
+    parser.add_argument('--lote', type=int, default=LOTE_PADRAO,
+                        help="Quantidade de livros enviados ao banco por comando de gravação.")
+    parser.add_argument('--parser', choices=BACKENDS_DISPONIVEIS, default=BACKEND_PADRAO,
+                        help="Analisador de HTML (o padrão é o mais rápido instalado).")
+    parser.add_argument('--completo', action='store_true',
+                        help="Ignora o estado salvo e reprocessa todas as páginas.")
+    parser.add_argument('--retomar', '--resume', action='store_true',
+                        help="Continua a partir do último checkpoint de uma execução interrompida.")
+    parser.add_argument('--tentativas', type=int, default=TENTATIVAS_PADRAO,
+                        help="Tentativas por página antes de marcá-la como falha.")
+    parser.add_argument('--intervalo-checkpoint', type=int, default=INTERVALO_CHECKPOINT_PADRAO,
+                        help="Páginas processadas entre dois checkpoints no banco.")
+    parser.add_argument('--intervalo-relatorio', type=float, default=INTERVALO_RELATORIO_PADRAO,
+                        help="Segundos entre duas linhas de progresso.")
+    parser.add_argument('--detalhado', action='store_true',
+                        help="Imprime também uma linha para cada página processada.")
+    parser.add_argument('--sem-semelhantes', action='store_true',
+                        help="Não recalcula os livros semelhantes no fim da ingestão.")
+    parser.add_argument('--detalhes', action='store_true',
+                        help="Baixa também a página de cada livro (UPC, descrição, estoque e avaliações).")
+    parser.add_argument('--concorrencia-detalhes', type=int, default=CONCORRENCIA_DETALHES_PADRAO,
+                        help="Páginas de livro baixadas em paralelo com '--detalhes'.")
+    parser.add_argument('--fila-detalhes', type=int, default=FILA_DETALHES_PADRAO,
+                        help="Itens aceitos em cada fila da etapa de detalhes (limita a memória).")
+    parser.add_argument('--migrar', action='store_true',
+                        help="Só atualiza o esquema do banco (sem raspar o site) e sai.")
+    args = parser.parse_args()
+
+    if args.migrar:
+        migrar_banco(args.banco)
+        print("Banco migrado.")
+        return
+
+    estatisticas = executar_ingestao(
+        url=args.url,
+        banco=args.banco,
+        concorrencia=max(1, args.concorrencia),
+        limite_por_host=max(1, args.limite_por_host),
+        lote=max(1, args.lote),
+        backend=args.parser,
+        completo=args.completo,
+        retomar=args.retomar,
+        tentativas=max(1, args.tentativas),
+        intervalo_checkpoint=max(1, args.intervalo_checkpoint),
+        intervalo_relatorio=max(0.1, args.intervalo_relatorio),
+        detalhado=args.detalhado,
+        calcular_semelhantes=not args.sem_semelhantes,
+        detalhes=args.detalhes,
+        concorrencia_detalhes=max(1, args.concorrencia_detalhes),
+        fila_detalhes=max(1, args.fila_detalhes),
+    )
+    if estatisticas is None:
+        print("A última execução foi concluída; não há nada a retomar.")
+        return
+
+    print("\nProcesso de scraping concluído com sucesso!")
+    print(f"Páginas reprocessadas: {estatisticas['paginas_processadas']} | "
+          f"ignoradas (sem alterações): {estatisticas['paginas_ignoradas']} | "
+          f"com falha: {estatisticas['paginas_com_falha']}")
+    if estatisticas['paginas_com_falha']:
+        print("Execute novamente com '--retomar' para refazer as páginas que falharam.")
+    print(f"Livros novos: {estatisticas['inseridos']} | atualizados: {estatisticas['atualizados']} | "
+          f"sem alteração: {estatisticas['inalterados']} | removidos: {estatisticas['removidos']}")
+    print(f"Duração: {estatisticas['duracao_s']:.1f}s | requisições: {estatisticas['requisicoes']} "
+          f"(novas tentativas: {estatisticas['novas_tentativas']}) | "
+          f"baixados: {estatisticas['bytes_baixados'] / 1e6:.1f} MB")
+    print(f"Tempo por etapa (somado entre as threads): download {estatisticas['tempo_download']:.1f}s | "
+          f"análise {estatisticas['tempo_analise']:.1f}s | gravação {estatisticas['tempo_gravacao']:.1f}s")
+    if args.detalhes:
+        filas = estatisticas['maximos_filas_detalhes']
+        print(f"Detalhes: {estatisticas['detalhes_baixados']} páginas de livro | "
+              f"gravados: {estatisticas['detalhes_atualizados']} | "
+              f"sem alteração: {estatisticas['detalhes_inalterados']} | "
+              f"com falha: {estatisticas['detalhes_com_falha']}")
+        print(f"Tempo por etapa dos detalhes: download {estatisticas['tempo_download_detalhes']:.1f}s | "
+              f"análise {estatisticas['tempo_analise_detalhes']:.1f}s | "
+              f"gravação {estatisticas['tempo_gravacao_detalhes']:.1f}s | "
+              f"maior ocupação das filas: {filas['urls']} URLs, {filas['paginas']} páginas, "
+              f"{filas['campos']} livros")
+    if estatisticas.get('semelhantes'):
+        tempos = estatisticas['semelhantes']
+        print(f"Livros semelhantes: {tempos['livros']} livros | vetores {tempos['vetores_s']:.1f}s | "
+              f"vizinhos {tempos['vizinhos_s']:.1f}s | gravação {tempos['gravacao_s']:.1f}s")
+    print("Categorias mais lentas (download + análise):")
+    for categoria, dados in estatisticas['categorias_mais_lentas']:
+        print(f"  {categoria:<40} {dados['tempo_download'] + dados['tempo_analise']:7.2f}s "
+              f"em {dados['paginas']} páginas")
+    print("Os dados foram salvos no arquivo 'livros.db'.")
 
-print("\nProcesso de scraping concluído com sucesso!")
-print("Os dados foram salvos no arquivo 'livros.db'.")
 
-# Fecha a sessão com o banco de dados.
-session.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
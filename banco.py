@@ -0,0 +1,357 @@
+# Estruturas do banco compartilhadas entre a ingestão (alimenta_base.py) e a API (livros.py)
+# que não são descritas pelos modelos do SQLAlchemy: configuração das conexões, migrações
+# de bancos já existentes, agregados das categorias, versão do catálogo, índice de busca
+# textual e a conversão dos campos de texto do site em valores numéricos.
+
+import re
+
+from sqlalchemy import bindparam, event, text
+
+
+# =============================================================================
+# CONEXÕES
+# =============================================================================
+
+# Aplicados a cada nova conexão SQLite, tanto na API quanto na ingestão:
+#   - synchronous=NORMAL: no modo WAL, sincroniza o disco nos checkpoints do WAL e não
+#     a cada commit (uma queda de energia pode perder só as últimas transações);
+#   - busy_timeout: quem precisar da trava de escrita espera por ela (em ms) em vez de
+#     falhar na hora com "database is locked".
+# Nenhum dos dois grava no arquivo, então também valem para um banco somente leitura.
+PRAGMAS_SQLITE = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+}
+
+
+def _aplicar_pragmas(conexao_dbapi, registro):
+    cursor = conexao_dbapi.cursor()
+    for nome, valor in PRAGMAS_SQLITE.items():
+        cursor.execute(f"PRAGMA {nome}={valor}")
+    cursor.close()
+
+
+def ativar_wal(engine):
+    # Journal em modo WAL: leitores não bloqueiam o escritor e o escritor não bloqueia os
+    # leitores, então a API continua respondendo enquanto a ingestão grava. O modo fica
+    # gravado no arquivo, por isso só o escritor (a ingestão) o ativa: a API apenas lê,
+    # e um banco somente leitura não aceita a troca (nem tem onde criar '-wal' e '-shm').
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conexao:
+            conexao.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+def configurar_sqlite(engine):
+    # Registra os PRAGMAs na engine; deve ser chamada antes da primeira conexão.
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _aplicar_pragmas)
+    return engine
+
+
+# =============================================================================
+# CAMPOS NUMÉRICOS
+# =============================================================================
+
+NOTAS = {"One": 1, "Two": 2, "Three": 3, "Four": 4, "Five": 5}
+
+
+def preco_em_centavos(preco):
+    # "£45.17" (ou "Â£45.17", quando a página foi decodificada como latin-1) -> 4517
+    encontrado = re.search(r"(\d+)(?:\.(\d{1,2}))?", preco or "")
+    if not encontrado:
+        return None
+    return int(encontrado.group(1)) * 100 + int((encontrado.group(2) or "0").ljust(2, "0"))
+
+
+def nota_numerica(avaliacao):
+    # "Three" -> 3
+    return NOTAS.get(avaliacao)
+
+
+def esta_em_estoque(disponibilidade):
+    # "In stock" / "In stock (22 available)" -> True; "Out of stock" -> False
+    return (disponibilidade or "").strip().lower().startswith("in stock")
+
+
+def campos_numericos(livro):
+    # Valores normalizados gravados junto com os campos de texto de um livro.
+    return {
+        "preco_centavos": preco_em_centavos(livro["preco"]),
+        "nota": nota_numerica(livro["avaliacao"]),
+        "em_estoque": esta_em_estoque(livro["disponibilidade"]),
+    }
+
+
+# =============================================================================
+# MIGRAÇÕES
+# =============================================================================
+
+# Colunas adicionadas à tabela 'livros' depois da versão original: (nome, tipo, índice?).
+COLUNAS_LIVROS = [
+    ("preco_centavos", "INTEGER", True),
+    ("nota", "INTEGER", True),
+    ("em_estoque", "BOOLEAN", True),
+    ("categoria_id", "INTEGER REFERENCES categorias (id)", True),
+    ("criado_em", "DATETIME", False),
+    ("atualizado_em", "DATETIME", False),
+    ("sequencia", "INTEGER", True),
+    ("upc", "TEXT", False),
+    ("descricao", "TEXT", False),
+    ("quantidade_estoque", "INTEGER", False),
+    ("quantidade_avaliacoes", "INTEGER", False),
+]
+
+# Colunas adicionadas à tabela 'estado_crawl' (só existe nos bancos da ingestão).
+COLUNAS_ESTADO_CRAWL = [
+    ("titulos", "TEXT", False),
+]
+
+# Tabela normalizada de categorias (a mesma que o 'create_all' da ingestão cria).
+DDL_CATEGORIAS = """
+    CREATE TABLE IF NOT EXISTS categorias (
+        id INTEGER NOT NULL PRIMARY KEY,
+        nome VARCHAR NOT NULL UNIQUE,
+        quantidade_livros INTEGER NOT NULL DEFAULT 0,
+        preco_minimo_centavos INTEGER,
+        preco_maximo_centavos INTEGER,
+        preco_medio_centavos FLOAT
+    )
+"""
+
+
+# Livros que sumiram do site (marcas de remoção para o feed de alterações).
+DDL_LIVROS_REMOVIDOS = [
+    """
+    CREATE TABLE IF NOT EXISTS livros_removidos (
+        id INTEGER NOT NULL PRIMARY KEY,
+        titulo VARCHAR,
+        categoria_id INTEGER,
+        sequencia INTEGER NOT NULL,
+        removido_em DATETIME
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_livros_removidos_sequencia ON livros_removidos (sequencia)",
+]
+
+
+# Vizinhos de cada livro calculados pela ingestão (ver semelhantes.py), em ordem de
+# similaridade: a chave primária (livro, posição) é o índice da consulta da API.
+DDL_LIVROS_SEMELHANTES = """
+    CREATE TABLE IF NOT EXISTS livros_semelhantes (
+        livro_id INTEGER NOT NULL,
+        posicao INTEGER NOT NULL,
+        semelhante_id INTEGER NOT NULL,
+        similaridade FLOAT NOT NULL,
+        PRIMARY KEY (livro_id, posicao)
+    ) WITHOUT ROWID
+"""
+
+
+def colunas_da_tabela(conexao, tabela):
+    return {linha[1] for linha in conexao.execute(text(f"PRAGMA table_info({tabela})"))}
+
+
+def _adicionar_colunas(conexao, tabela, colunas):
+    existentes = colunas_da_tabela(conexao, tabela)
+    for nome, tipo, indexada in colunas:
+        if nome not in existentes:
+            conexao.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {nome} {tipo}"))
+        if indexada:
+            conexao.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabela}_{nome} ON {tabela} ({nome})"))
+
+
+def garantir_esquema(conexao):
+    # Atualiza um banco criado por uma versão anterior: adiciona as colunas que faltam
+    # em 'livros' (com os mesmos índices que o 'create_all' criaria) e preenche os
+    # valores numéricos, a categoria normalizada e a sequência dos livros já gravados.
+    garantir_versao_catalogo(conexao)
+    if not existe_tabela(conexao, "livros"):
+        return
+
+    conexao.execute(text(DDL_CATEGORIAS))
+    for comando in DDL_LIVROS_REMOVIDOS:
+        conexao.execute(text(comando))
+    conexao.execute(text(DDL_LIVROS_SEMELHANTES))
+
+    _adicionar_colunas(conexao, "livros", COLUNAS_LIVROS)
+    if existe_tabela(conexao, "estado_crawl"):
+        _adicionar_colunas(conexao, "estado_crawl", COLUNAS_ESTADO_CRAWL)
+
+    pendentes = conexao.execute(text(
+        "SELECT id, preco, avaliacao, disponibilidade FROM livros WHERE preco_centavos IS NULL OR nota IS NULL"
+    )).mappings().all()
+    if pendentes:
+        conexao.execute(
+            text("UPDATE livros SET preco_centavos = :preco_centavos, nota = :nota, em_estoque = :em_estoque "
+                 "WHERE id = :id"),
+            [dict(campos_numericos(livro), id=livro["id"]) for livro in pendentes],
+        )
+
+    sem_categoria = conexao.execute(text(
+        "SELECT 1 FROM livros WHERE categoria_id IS NULL AND categoria IS NOT NULL LIMIT 1"
+    )).first()
+    if sem_categoria:
+        conexao.execute(text(
+            "INSERT OR IGNORE INTO categorias (nome) "
+            "SELECT DISTINCT categoria FROM livros WHERE categoria IS NOT NULL ORDER BY id"
+        ))
+        conexao.execute(text(
+            "UPDATE livros SET categoria_id = (SELECT id FROM categorias WHERE nome = livros.categoria) "
+            "WHERE categoria_id IS NULL"
+        ))
+        atualizar_categorias(conexao)
+
+    # Livros gravados antes do feed de alterações (ou fora da ingestão) entram no feed
+    # depois de tudo o que já foi publicado, na ordem dos IDs.
+    sem_sequencia = conexao.execute(text("SELECT 1 FROM livros WHERE sequencia IS NULL LIMIT 1")).first()
+    if sem_sequencia:
+        conexao.execute(
+            text("UPDATE livros SET sequencia = :base + id, "
+                 "criado_em = COALESCE(criado_em, CURRENT_TIMESTAMP), "
+                 "atualizado_em = COALESCE(atualizado_em, CURRENT_TIMESTAMP) "
+                 "WHERE sequencia IS NULL"),
+            {"base": ultima_sequencia(conexao)},
+        )
+
+
+def esquema_pendente(conexao):
+    # O que falta para o banco estar na versão atual ('livros.<coluna>' ou o nome da
+    # tabela), verificado só com leituras: a API não migra o banco (ele pode estar em um
+    # sistema de arquivos somente leitura), quem migra é a ingestão. Vazio se estiver em dia.
+    if not existe_tabela(conexao, "livros"):
+        return {"livros"}
+    pendente = {
+        tabela for tabela in ("versao_catalogo", "categorias", "livros_removidos", "livros_semelhantes")
+        if not existe_tabela(conexao, tabela)
+    }
+    colunas = colunas_da_tabela(conexao, "livros")
+    pendente.update(f"livros.{nome}" for nome, _, _ in COLUNAS_LIVROS if nome not in colunas)
+    return pendente
+
+
+# =============================================================================
+# FEED DE ALTERAÇÕES
+# =============================================================================
+
+# Cada livro gravado pela ingestão (novo, alterado ou removido) recebe o próximo número
+# de uma sequência crescente, compartilhada entre 'livros' e 'livros_removidos'. Um
+# cliente que guardou o último número visto pede só o que mudou depois dele.
+# A sequência é atribuída dentro da transação de escrita; como o SQLite tem um único
+# escritor por vez, os números ficam visíveis sempre em ordem.
+
+def ultima_sequencia(conexao):
+    return conexao.execute(text(
+        "SELECT MAX(COALESCE((SELECT MAX(sequencia) FROM livros), 0), "
+        "COALESCE((SELECT MAX(sequencia) FROM livros_removidos), 0))"
+    )).scalar()
+
+
+# =============================================================================
+# CATEGORIAS
+# =============================================================================
+
+def atualizar_categorias(conexao, ids=None):
+    # Recalcula a quantidade de livros e os preços mínimo, máximo e médio das categorias
+    # informadas (ou de todas). Cada categoria é agregada pelo índice de 'livros.categoria_id'.
+    comando = """
+        UPDATE categorias SET
+            (quantidade_livros, preco_minimo_centavos, preco_maximo_centavos, preco_medio_centavos) = (
+                SELECT COUNT(*), MIN(preco_centavos), MAX(preco_centavos), AVG(preco_centavos)
+                FROM livros WHERE livros.categoria_id = categorias.id
+            )
+    """
+    if ids is None:
+        conexao.execute(text(comando))
+    elif ids:
+        conexao.execute(
+            text(comando + " WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": sorted(ids)},
+        )
+
+
+# =============================================================================
+# VERSÃO DO CATÁLOGO
+# =============================================================================
+
+# Contador incrementado pela ingestão sempre que grava alterações no catálogo.
+# As respostas em cache da API são guardadas sob a versão em que foram geradas,
+# então uma nova versão invalida exatamente o que mudou, sem depender de TTL.
+
+def garantir_versao_catalogo(conexao):
+    conexao.execute(text(
+        "CREATE TABLE IF NOT EXISTS versao_catalogo (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)"
+    ))
+    conexao.execute(text("INSERT OR IGNORE INTO versao_catalogo (id, versao) VALUES (1, 1)"))
+
+
+def versao_catalogo(conexao):
+    linha = conexao.execute(text("SELECT versao FROM versao_catalogo WHERE id = 1")).first()
+    return linha[0] if linha else 0
+
+
+def incrementar_versao_catalogo(conexao):
+    conexao.execute(text("UPDATE versao_catalogo SET versao = versao + 1 WHERE id = 1"))
+
+
+# =============================================================================
+# BUSCA TEXTUAL (SQLite FTS5)
+# =============================================================================
+
+# Índice invertido sobre título e categoria, sincronizado com a tabela 'livros'
+# ("external content": o texto não é duplicado, só o índice).
+#   - 'unicode61 remove_diacritics 2': ignora maiúsculas/minúsculas e acentos;
+#   - 'prefix': índices extras para buscas por prefixo curto ("him*").
+DDL_BUSCA_TEXTUAL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS livros_fts USING fts5(
+        titulo, categoria,
+        content='livros', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    # Gatilhos que mantêm o índice em dia a cada INSERT/UPDATE/DELETE em 'livros'.
+    """
+    CREATE TRIGGER IF NOT EXISTS livros_fts_ai AFTER INSERT ON livros BEGIN
+        INSERT INTO livros_fts(rowid, titulo, categoria) VALUES (new.id, new.titulo, new.categoria);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS livros_fts_ad AFTER DELETE ON livros BEGIN
+        INSERT INTO livros_fts(livros_fts, rowid, titulo, categoria)
+        VALUES ('delete', old.id, old.titulo, old.categoria);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS livros_fts_au AFTER UPDATE OF titulo, categoria ON livros BEGIN
+        INSERT INTO livros_fts(livros_fts, rowid, titulo, categoria)
+        VALUES ('delete', old.id, old.titulo, old.categoria);
+        INSERT INTO livros_fts(rowid, titulo, categoria) VALUES (new.id, new.titulo, new.categoria);
+    END
+    """,
+]
+
+
+def existe_tabela(conexao, nome):
+    return conexao.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :nome"), {"nome": nome}
+    ).first() is not None
+
+
+def garantir_busca_textual(conexao):
+    # Cria o índice FTS5 e os gatilhos, caso ainda não existam. Na criação o índice
+    # é preenchido com os livros que já estão na base.
+    nova = not existe_tabela(conexao, "livros_fts")
+    for comando in DDL_BUSCA_TEXTUAL:
+        conexao.execute(text(comando))
+    if nova:
+        conexao.execute(text("INSERT INTO livros_fts(livros_fts) VALUES ('rebuild')"))
+
+
+def expressao_busca(termo, coluna):
+    # Converte o texto digitado em uma consulta FTS5 por prefixo restrita à coluna:
+    # "only himal" -> titulo : ("only"* "himal"*). Devolve None se não houver palavras.
+    palavras = re.findall(r"\w+", termo or "")
+    if not palavras:
+        return None
+    return f'{coluna} : (' + " ".join(f'"{p}"*' for p in palavras) + ')'
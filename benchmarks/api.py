@@ -0,0 +1,195 @@
+# Benchmark de carga da API (livros.py).
+#
+# Para cada escala pedida, gera um catálogo sintético direto no banco (os mesmos livros
+# da réplica do site em 'site_local.py', sem passar pelo raspador), sobe a API em outro
+# processo, obtém um token JWT por '/login' e exercita cada rota com várias threads
+# durante alguns segundos. Informa requisições/s, p50/p95/p99 e a taxa de acertos do
+# cache de respostas por rota, e grava tudo em JSON para comparar versões.
+#
+# Uso:
+#   python benchmarks/api.py --escalas 10000 100000 1000000 --concorrencia 16 --duracao 10 --json api.json
+#   python benchmarks/api.py --escalas 100000 --rotas livro busca --pasta-bancos /tmp/bancos
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+
+import alimenta_base  # noqa: E402
+from banco import (  # noqa: E402
+    atualizar_categorias, campos_numericos, configurar_sqlite, garantir_busca_textual, garantir_esquema,
+)
+from ingestao_concorrente import api_local, obter_token, percentil  # noqa: E402
+from site_local import PALAVRAS, Catalogo  # noqa: E402
+
+LOTE_INSERCAO = 10000
+
+
+# Rotas exercitadas: nome -> função que sorteia o caminho da próxima requisição.
+ROTAS = {
+    'livros': lambda s, n: f"/api/v1/books?limit=100&after={s.randrange(n)}",
+    'livros_filtrados': lambda s, n: f"/api/v1/books?limit=100&min_rating={s.randint(1, 5)}&sort=-preco",
+    'livro': lambda s, n: f"/api/v1/books/{s.randrange(1, n + 1)}",
+    'lote': lambda s, n: "/api/v1/books/batch?ids=" + ",".join(str(s.randrange(1, n + 1)) for _ in range(100)),
+    'busca': lambda s, n: f"/api/v1/books/search?titulo={s.choice(PALAVRAS)}&limit=20",
+    'busca_categoria': lambda s, n: f"/api/v1/books/search?categoria=Category {s.randint(1, 50)}&limit=20",
+    'categorias': lambda s, n: "/api/v1/categories",
+    'health': lambda s, n: "/health",
+}
+
+
+def semear(caminho, livros, categorias):
+    # Grava o catálogo sintético (com categorias normalizadas e índice de busca textual).
+    catalogo = Catalogo(livros, categorias)
+    engine = configurar_sqlite(alimenta_base.create_engine('sqlite:///' + caminho))
+    alimenta_base.Base.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        garantir_esquema(conexao)
+
+        tabela_categorias = alimenta_base.Categorias.__table__
+        conexao.execute(tabela_categorias.insert(), [
+            {'id': c + 1, 'nome': catalogo.nome_categoria(c)} for c in range(catalogo.categorias)
+        ])
+
+        tabela = alimenta_base.Livros.__table__
+        # Feed de alterações preenchido como na ingestão (a API não migra o banco): sem a
+        # sequência, o cache de JSON dos livros, '/changes' e os índices incrementais
+        # ficariam fora do caminho medido.
+        agora = alimenta_base._agora()
+        lote = []
+        for j in range(livros):
+            gerado = catalogo.livro(j)
+            livro = {
+                'id': j + 1,
+                'titulo': gerado['titulo'],
+                'preco': f"£{gerado['preco']}",
+                'avaliacao': gerado['avaliacao'],
+                'disponibilidade': 'In stock' if gerado['em_estoque'] else 'Out of stock',
+                'categoria': catalogo.nome_categoria(j % catalogo.categorias),
+                'imagem': f"../../../../media/cache/{gerado['imagem']}.jpg",
+                'categoria_id': j % catalogo.categorias + 1,
+                'sequencia': j + 1,
+                'criado_em': agora,
+                'atualizado_em': agora,
+            }
+            livro.update(campos_numericos(livro))
+            lote.append(livro)
+            if len(lote) >= LOTE_INSERCAO:
+                conexao.execute(tabela.insert(), lote)
+                lote = []
+        if lote:
+            conexao.execute(tabela.insert(), lote)
+
+        atualizar_categorias(conexao)
+        # Criado depois da carga: o índice é montado de uma vez, sem os gatilhos por linha.
+        garantir_busca_textual(conexao)
+    engine.dispose()
+
+
+def medir_rota(url, token, rota, livros, concorrencia, duracao):
+    latencias = []
+    erros = []
+    acertos_cache = [0]
+    trava = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def carregar(semente):
+        sorteio = random.Random(semente)
+        sessao = requests.Session()
+        sessao.headers['Authorization'] = 'Bearer ' + token
+        while time.perf_counter() < fim:
+            caminho = ROTAS[rota](sorteio, livros)
+            inicio = time.perf_counter()
+            try:
+                resposta = sessao.get(url + caminho, timeout=60)
+                resposta.content
+                erro = resposta.status_code >= 500 and f"{resposta.status_code} {caminho}"
+                acerto = resposta.headers.get('X-Cache') == 'HIT'
+            except requests.RequestException as excecao:
+                erro, acerto = f"{excecao} {caminho}", False
+            tempo = time.perf_counter() - inicio
+            with trava:
+                latencias.append(tempo)
+                acertos_cache[0] += acerto
+                if erro:
+                    erros.append(erro)
+
+    threads = [threading.Thread(target=carregar, args=(i,)) for i in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    decorrido = time.perf_counter() - inicio
+
+    return {
+        'requisicoes': len(latencias),
+        'requisicoes_por_s': round(len(latencias) / decorrido, 1),
+        'erros': len(erros),
+        'exemplos_de_erro': erros[:3],
+        'acertos_cache_pct': round(100 * acertos_cache[0] / (len(latencias) or 1), 1),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def imprimir(escala, resultados):
+    print(f"\n{escala} livros")
+    print(f"  {'rota':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cache':>7} {'erros':>6}")
+    for rota, r in resultados.items():
+        print(f"  {rota:<18} {r['requisicoes_por_s']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['acertos_cache_pct']:>6.1f}% {r['erros']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga das rotas da API.")
+    parser.add_argument('--escalas', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="Tamanhos do catálogo (quantidade de livros).")
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--rotas', nargs='+', choices=list(ROTAS), default=list(ROTAS))
+    parser.add_argument('--concorrencia', type=int, default=8, help="Threads fazendo requisições.")
+    parser.add_argument('--duracao', type=float, default=10.0, help="Segundos de carga por rota.")
+    parser.add_argument('--pasta-bancos', help="Pasta onde guardar (e reaproveitar) os bancos gerados.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy(), 'escalas': {}}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta_bancos or temporaria
+        os.makedirs(pasta, exist_ok=True)
+
+        for escala in args.escalas:
+            caminho = os.path.join(pasta, f"api_{escala}_{args.categorias}.db")
+            if not os.path.exists(caminho):
+                inicio = time.perf_counter()
+                semear(caminho, escala, args.categorias)
+                print(f"Catálogo de {escala} livros gerado em {time.perf_counter() - inicio:.1f}s")
+
+            with api_local(caminho) as url:
+                token = obter_token(url)
+                resultados = {
+                    rota: medir_rota(url, token, rota, escala, args.concorrencia, args.duracao)
+                    for rota in args.rotas
+                }
+            resultado['escalas'][str(escala)] = resultados
+            imprimir(escala, resultados)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
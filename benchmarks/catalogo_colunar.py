@@ -0,0 +1,139 @@
+# Benchmark do catálogo em memória (catalogo_colunar.py) contra o caminho em SQL nas
+# listas paginadas de '/api/v1/books'.
+#
+# Gera um catálogo sintético (o mesmo de 'api.py'), importa a API no próprio processo
+# com o cache de respostas desligado e faz as mesmas requisições (páginas por cursor,
+# filtros de preço/nota/estoque/categoria e ordenações) pelos dois caminhos, conferindo
+# que as respostas são idênticas. Informa o tempo de carga e o tamanho dos arrays do
+# catálogo em memória, e p50/p99 por tipo de consulta em cada caminho.
+#
+# Uso:
+#   python benchmarks/catalogo_colunar.py --livros 100000 --requisicoes 300
+#   python benchmarks/catalogo_colunar.py --livros 1000000 --pasta-bancos /tmp/bancos --json colunar.json
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from api import semear  # noqa: E402
+from ingestao_concorrente import percentil  # noqa: E402
+
+# Tipos de consulta: nome -> função que sorteia os parâmetros da próxima requisição.
+CONSULTAS = {
+    'pagina': lambda s, n, c: f"limit=100&after={s.randrange(n)}",
+    'filtros': lambda s, n, c: (f"limit=100&min_price={s.randint(10, 40)}&max_price={s.randint(41, 60)}"
+                                f"&min_rating={s.randint(1, 5)}&in_stock=true"),
+    'ordenado': lambda s, n, c: f"limit=100&sort={s.choice(['preco', '-preco', '-avaliacao'])}&min_rating={s.randint(1, 5)}",
+    'categoria': lambda s, n, c: f"limit=100&categoria_id={s.randint(1, c)}&sort=titulo",
+    'campos': lambda s, n, c: f"limit=1000&after={s.randrange(n)}&fields=id,preco_centavos,nota",
+}
+
+
+def medir(cliente, cabecalhos, livros, categorias, consulta, requisicoes):
+    # Mesmas URLs pelos dois caminhos, alternando a ordem para não favorecer nenhum.
+    from livros import app
+
+    sorteio = random.Random(consulta)
+    tempos = {'sql': [], 'memoria': []}
+    divergencias = 0
+    for i in range(requisicoes):
+        url = "/api/v1/books?" + CONSULTAS[consulta](sorteio, livros, categorias)
+        respostas = {}
+        for caminho in (('sql', 'memoria') if i % 2 else ('memoria', 'sql')):
+            app.config['CATALOGO_EM_MEMORIA'] = caminho == 'memoria'
+            inicio = time.perf_counter()
+            resposta = cliente.get(url, headers=cabecalhos)
+            tempos[caminho].append(time.perf_counter() - inicio)
+            respostas[caminho] = resposta.get_data()
+        divergencias += respostas['sql'] != respostas['memoria']
+
+    resultado = {'divergencias': divergencias}
+    for caminho, valores in tempos.items():
+        resultado[caminho] = {
+            'p50_ms': round(percentil(valores, 50) * 1000, 2),
+            'p99_ms': round(percentil(valores, 99) * 1000, 2),
+        }
+    resultado['aceleracao_p50'] = round(resultado['sql']['p50_ms'] / max(resultado['memoria']['p50_ms'], 1e-6), 1)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catálogo em memória (NumPy) x SQL nas listas de livros.")
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--requisicoes', type=int, default=200, help="Requisições por tipo de consulta e caminho.")
+    parser.add_argument('--consultas', nargs='+', choices=list(CONSULTAS), default=list(CONSULTAS))
+    parser.add_argument('--pasta-bancos', help="Pasta onde guardar (e reaproveitar) os bancos gerados.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy(), 'consultas': {}}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta_bancos or temporaria
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"api_{args.livros}_{args.categorias}.db")
+        if not os.path.exists(caminho):
+            inicio = time.perf_counter()
+            semear(caminho, args.livros, args.categorias)
+            print(f"Catálogo de {args.livros} livros gerado em {time.perf_counter() - inicio:.1f}s")
+
+        # A API lê DATABASE_URL na importação.
+        os.environ['DATABASE_URL'] = 'sqlite:///' + caminho
+        import catalogo_colunar
+        import livros
+        from cache_respostas import SemCache
+
+        if not catalogo_colunar.DISPONIVEL:
+            raise SystemExit("O NumPy não está instalado: pip install numpy")
+
+        livros.cache_respostas = SemCache()
+        cliente = livros.app.test_client()
+        usuario = {'nome_usuario': 'benchmark', 'senha': 'benchmark'}
+        cliente.post('/registro', json=usuario)
+        cabecalhos = {'Authorization': 'Bearer ' + cliente.post('/login', json=usuario).get_json()['token']}
+
+        # Primeira requisição: prepara o banco e inicia a carga do catálogo em memória.
+        livros.app.config['CATALOGO_EM_MEMORIA'] = True
+        cliente.get('/api/v1/books?limit=1', headers=cabecalhos)
+        instantaneo = livros._catalogo_em_memoria['instantaneo']
+        with livros.app.app_context():
+            versao = livros.versao_catalogo(livros.db.session)
+        catalogo = instantaneo.aguardar(versao)
+        tamanho = sum(
+            array.nbytes for array in [catalogo.ids]
+            + [codigos for codigos, _ in catalogo._codificadas.values()]
+            + [array for array, _ in catalogo._numericas.values()]
+        )
+        resultado['carga_s'] = round(instantaneo.tempo_carga, 2)
+        resultado['arrays_mb'] = round(tamanho / 1e6, 1)
+        print(f"Catálogo em memória: {len(catalogo)} livros carregados em {instantaneo.tempo_carga:.2f}s "
+              f"(arrays numéricos: {tamanho / 1e6:.1f} MB)")
+
+        print(f"\n  {'consulta':<12} {'SQL p50':>9} {'SQL p99':>9} {'mem p50':>9} {'mem p99':>9} {'x p50':>7} {'difs':>5}")
+        for consulta in args.consultas:
+            r = medir(cliente, cabecalhos, args.livros, args.categorias, consulta, args.requisicoes)
+            resultado['consultas'][consulta] = r
+            print(f"  {consulta:<12} {r['sql']['p50_ms']:>9.2f} {r['sql']['p99_ms']:>9.2f} "
+                  f"{r['memoria']['p50_ms']:>9.2f} {r['memoria']['p99_ms']:>9.2f} "
+                  f"{r['aceleracao_p50']:>7.1f} {r['divergencias']:>5}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    if any(r['divergencias'] for r in resultado['consultas'].values()):
+        raise SystemExit("FALHOU: respostas diferentes entre o SQL e o catálogo em memória.")
+
+
+if __name__ == "__main__":
+    main()
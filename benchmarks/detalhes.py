@@ -0,0 +1,146 @@
+# Benchmark da etapa de detalhes da ingestão ('--detalhes', EtapaDetalhes em alimenta_base.py).
+#
+# Sobe a réplica local do site e executa uma ingestão completa em um banco temporário
+# para cada configuração:
+#   - listagens:  sem a etapa de detalhes (a linha de base);
+#   - sequencial: uma página de livro por vez e filas de 1 item (download, análise e
+#                 gravação praticamente em série);
+#   - pipeline:   '--concorrencia-detalhes' downloads em paralelo e filas de '--fila' itens;
+#   - sem_limite: como o pipeline, mas com filas sem limite (sem contrapressão).
+# Cada execução roda em um processo separado, para medir o pico de memória (RSS) de cada
+# uma; informa a duração, páginas de livro por segundo, o tempo de cada etapa e a maior
+# ocupação das filas.
+#
+# Uso:
+#   python benchmarks/detalhes.py --livros 5000 --categorias 50 --latencia 0.02
+#   python benchmarks/detalhes.py --configuracoes pipeline,sem_limite --json detalhes.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+import alimenta_base  # noqa: E402
+from scraper import site_local  # noqa: E402
+
+CONFIGURACOES = ('listagens', 'sequencial', 'pipeline', 'sem_limite')
+
+
+def parametros(configuracao, args):
+    if configuracao == 'listagens':
+        return {'detalhes': False}
+    if configuracao == 'sequencial':
+        return {'detalhes': True, 'concorrencia_detalhes': 1, 'fila_detalhes': 1}
+    # queue.Queue(maxsize=0) não tem limite.
+    fila = 0 if configuracao == 'sem_limite' else args.fila
+    return {'detalhes': True, 'concorrencia_detalhes': args.concorrencia_detalhes, 'fila_detalhes': fila}
+
+
+def rss_mb():
+    # Memória residente do processo (Linux).
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        return 0.0
+
+
+def uma_execucao(url, banco, configuracao, args):
+    # Executada no processo filho: uma ingestão, com o RSS amostrado a cada 50 ms.
+    inicial = rss_mb()
+    pico = [inicial]
+    parar = threading.Event()
+
+    def amostrar():
+        while not parar.wait(0.05):
+            pico[0] = max(pico[0], rss_mb())
+
+    threading.Thread(target=amostrar, daemon=True).start()
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        estatisticas = alimenta_base.executar_ingestao(
+            url=url, banco=banco, concorrencia=args.concorrencia, limite_por_host=args.limite_por_host,
+            calcular_semelhantes=False, **parametros(configuracao, args),
+        )
+    duracao = time.perf_counter() - inicio
+    parar.set()
+
+    resultado = {
+        'duracao_s': round(duracao, 2),
+        'livros': estatisticas['inseridos'],
+        'detalhes': estatisticas['detalhes_baixados'],
+        'detalhes_por_s': round(estatisticas['detalhes_baixados'] / duracao, 1),
+        'detalhes_com_falha': estatisticas['detalhes_com_falha'],
+        'etapas_detalhes_s': {
+            etapa: round(estatisticas[f'tempo_{etapa}_detalhes'], 2) for etapa in ('download', 'analise', 'gravacao')
+        },
+        'maximos_filas': estatisticas.get('maximos_filas_detalhes'),
+        'rss_inicial_mb': round(inicial, 1),
+        'rss_pico_mb': round(pico[0], 1),
+    }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Etapa de detalhes da ingestão: em série x pipeline com filas limitadas.")
+    parser.add_argument('--livros', type=int, default=5000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--latencia', type=float, default=0.02, help="Atraso artificial por requisição, em segundos.")
+    parser.add_argument('--concorrencia', type=int, default=alimenta_base.CONCORRENCIA_PADRAO)
+    parser.add_argument('--limite-por-host', type=int, default=16)
+    parser.add_argument('--concorrencia-detalhes', type=int, default=alimenta_base.CONCORRENCIA_DETALHES_PADRAO)
+    parser.add_argument('--fila', type=int, default=alimenta_base.FILA_DETALHES_PADRAO)
+    parser.add_argument('--configuracoes', default=",".join(CONFIGURACOES),
+                        help=f"Configurações a medir, separadas por vírgula ({', '.join(CONFIGURACOES)}).")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    # Uso interno: uma única execução, no processo filho.
+    parser.add_argument('--uma-execucao', nargs=3, metavar=('URL', 'BANCO', 'CONFIGURACAO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.uma_execucao:
+        print(json.dumps(uma_execucao(*args.uma_execucao, args)))
+        return
+
+    resultado = {'parametros': vars(args).copy(), 'configuracoes': {}}
+    resultado['parametros'].pop('json')
+    resultado['parametros'].pop('uma_execucao')
+    repassados = [
+        '--concorrencia', str(args.concorrencia), '--limite-por-host', str(args.limite_por_host),
+        '--concorrencia-detalhes', str(args.concorrencia_detalhes), '--fila', str(args.fila),
+    ]
+
+    with tempfile.TemporaryDirectory() as pasta, site_local(args.livros, args.categorias, args.latencia) as url:
+        print(f"\n  {'configuração':<12} {'duração':>9} {'detalhes/s':>11} {'download':>9} {'análise':>8} "
+              f"{'gravação':>9} {'filas (urls/html/campos)':>25} {'RSS pico':>9}")
+        for configuracao in args.configuracoes.split(','):
+            banco = 'sqlite:///' + os.path.join(pasta, f'{configuracao}.db')
+            saida = subprocess.run(
+                [sys.executable, __file__, *repassados, '--uma-execucao', url, banco, configuracao],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            medida = json.loads(saida.strip().splitlines()[-1])
+            resultado['configuracoes'][configuracao] = medida
+            etapas = medida['etapas_detalhes_s']
+            filas = medida['maximos_filas']
+            filas = f"{filas['urls']}/{filas['paginas']}/{filas['campos']}" if filas else '-'
+            print(f"  {configuracao:<12} {medida['duracao_s']:>8.1f}s {medida['detalhes_por_s']:>11.1f} "
+                  f"{etapas['download']:>8.1f}s {etapas['analise']:>7.1f}s {etapas['gravacao']:>8.1f}s "
+                  f"{filas:>25} {medida['rss_pico_mb']:>7.1f}MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
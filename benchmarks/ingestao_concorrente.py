@@ -0,0 +1,224 @@
+# Verificação da API servindo leituras enquanto a ingestão grava no mesmo banco SQLite.
+#
+# Sobe a réplica local do site, a API (livros.py) e a ingestão (alimenta_base.py), cada
+# uma em seu processo e todas apontando para um banco temporário. Enquanto a ingestão
+# roda, várias threads consultam a API (listas paginadas, livro por ID, busca e
+# categorias, com parâmetros variados para não cair sempre no cache de respostas).
+# Ao final informa as latências e falha (código de saída 1) se houver erros, como
+# "database is locked", ou se o p99 das leituras durante a ingestão passar do limite.
+#
+# Uso:
+#   python benchmarks/ingestao_concorrente.py --livros 20000 --categorias 100 --leitores 8 --limite-p99-ms 250
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+RAIZ = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, RAIZ)
+
+import alimenta_base  # noqa: E402
+from banco import ativar_wal, configurar_sqlite, garantir_esquema  # noqa: E402
+from scraper import porta_livre, site_local  # noqa: E402
+from site_local import PALAVRAS  # noqa: E402
+
+
+def criar_banco(caminho):
+    # Cria as tabelas (inclusive 'usuario') antes de subir a API, já com o journal em WAL.
+    engine = configurar_sqlite(alimenta_base.create_engine('sqlite:///' + caminho))
+    ativar_wal(engine)
+    alimenta_base.Base.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        garantir_esquema(conexao)
+    engine.dispose()
+
+
+@contextlib.contextmanager
+def api_local(caminho_banco):
+    porta = porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-c', f"import livros; livros.app.run(port={porta}, threaded=True)"],
+        cwd=RAIZ, env=dict(os.environ, DATABASE_URL='sqlite:///' + caminho_banco),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{porta}"
+    try:
+        for _ in range(200):
+            try:
+                requests.get(url + '/health', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        yield url
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def obter_token(url):
+    usuario = {'nome_usuario': 'benchmark', 'senha': 'benchmark'}
+    requests.post(url + '/registro', json=usuario)
+    return requests.post(url + '/login', json=usuario).json()['token']
+
+
+def caminho_aleatorio(sorteio, livros):
+    tipo = sorteio.random()
+    if tipo < 0.4:
+        return f"/api/v1/books?limit=20&after={sorteio.randrange(livros)}"
+    if tipo < 0.7:
+        return f"/api/v1/books/{sorteio.randrange(1, livros + 1)}"
+    if tipo < 0.9:
+        return f"/api/v1/books/search?titulo={sorteio.choice(PALAVRAS)}&limit=20&min_rating={sorteio.randint(1, 5)}"
+    return "/api/v1/categories?detalhes=1"
+
+
+class Leitores:
+    # Threads que consultam a API sem parar, registrando latência e erros de cada requisição.
+    def __init__(self, url, token, quantidade, livros):
+        self.url = url
+        self.token = token
+        self.quantidade = quantidade
+        self.livros = livros
+        self.latencias = []
+        self.erros = []
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._threads = []
+
+    def _ler(self, semente):
+        sorteio = random.Random(semente)
+        sessao = requests.Session()
+        sessao.headers['Authorization'] = 'Bearer ' + self.token
+        while not self._parar.is_set():
+            caminho = caminho_aleatorio(sorteio, self.livros)
+            inicio = time.perf_counter()
+            try:
+                resposta = sessao.get(self.url + caminho, timeout=30)
+                erro = resposta.status_code >= 500 and f"{resposta.status_code} {caminho}"
+            except requests.RequestException as excecao:
+                erro = f"{excecao} {caminho}"
+            duracao = time.perf_counter() - inicio
+            with self._trava:
+                self.latencias.append(duracao)
+                if erro:
+                    self.erros.append(erro)
+
+    def __enter__(self):
+        for i in range(self.quantidade):
+            thread = threading.Thread(target=self._ler, args=(i,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *args):
+        self._parar.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def resumo(leitores, duracao):
+    return {
+        'requisicoes': len(leitores.latencias),
+        'requisicoes_por_s': round(len(leitores.latencias) / duracao, 1),
+        'erros': len(leitores.erros),
+        'exemplos_de_erro': leitores.erros[:5],
+        'p50_ms': round(percentil(leitores.latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(leitores.latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(leitores.latencias, 99) * 1000, 2),
+        'max_ms': round(max(leitores.latencias, default=0) * 1000, 2),
+    }
+
+
+def imprimir(nome, resultado):
+    print(f"\n{nome}")
+    print(f"  requisições: {resultado['requisicoes']} ({resultado['requisicoes_por_s']:.1f}/s), "
+          f"erros: {resultado['erros']}")
+    print(f"  latência: p50 {resultado['p50_ms']:.1f}ms  p95 {resultado['p95_ms']:.1f}ms  "
+          f"p99 {resultado['p99_ms']:.1f}ms  máx {resultado['max_ms']:.1f}ms")
+    for erro in resultado['exemplos_de_erro']:
+        print(f"    {erro}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leituras da API durante uma ingestão no mesmo banco SQLite.")
+    parser.add_argument('--livros', type=int, default=20000)
+    parser.add_argument('--categorias', type=int, default=100)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Atraso artificial por página do site local.")
+    parser.add_argument('--concorrencia', type=int, default=alimenta_base.CONCORRENCIA_PADRAO)
+    parser.add_argument('--leitores', type=int, default=8, help="Threads consultando a API.")
+    parser.add_argument('--aquecimento', type=float, default=3.0,
+                        help="Segundos de leitura sem ingestão, para a linha de base.")
+    parser.add_argument('--limite-p99-ms', type=float, default=250.0,
+                        help="p99 máximo aceito para as leituras durante a ingestão.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy()}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as pasta, site_local(args.livros, args.categorias, args.latencia) as url_site:
+        caminho_banco = os.path.join(pasta, 'concorrente.db')
+        criar_banco(caminho_banco)
+
+        with api_local(caminho_banco) as url_api:
+            token = obter_token(url_api)
+
+            inicio = time.perf_counter()
+            with Leitores(url_api, token, args.leitores, args.livros) as leitores:
+                time.sleep(args.aquecimento)
+            resultado['sem_ingestao'] = resumo(leitores, time.perf_counter() - inicio)
+            imprimir("Leituras sem ingestão", resultado['sem_ingestao'])
+
+            inicio = time.perf_counter()
+            with Leitores(url_api, token, args.leitores, args.livros) as leitores:
+                ingestao = subprocess.run(
+                    [sys.executable, os.path.join(RAIZ, 'alimenta_base.py'), '--url', url_site,
+                     '--banco', 'sqlite:///' + caminho_banco, '--concorrencia', str(args.concorrencia)],
+                    stdout=subprocess.DEVNULL,
+                )
+            duracao = time.perf_counter() - inicio
+            resultado['durante_ingestao'] = resumo(leitores, duracao)
+            resultado['durante_ingestao']['duracao_ingestao_s'] = round(duracao, 2)
+            imprimir(f"Leituras durante a ingestão ({duracao:.1f}s)", resultado['durante_ingestao'])
+
+    falhas = []
+    if ingestao.returncode != 0:
+        falhas.append(f"a ingestão terminou com o código {ingestao.returncode}")
+    if resultado['durante_ingestao']['erros']:
+        falhas.append(f"{resultado['durante_ingestao']['erros']} leituras com erro")
+    if resultado['durante_ingestao']['p99_ms'] > args.limite_p99_ms:
+        falhas.append(f"p99 de {resultado['durante_ingestao']['p99_ms']:.1f}ms acima do limite de "
+                      f"{args.limite_p99_ms:.0f}ms")
+    resultado['falhas'] = falhas
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    print()
+    if falhas:
+        for falha in falhas:
+            print(f"FALHOU: {falha}")
+        raise SystemExit(1)
+    print(f"OK: p99 das leituras durante a ingestão dentro de {args.limite_p99_ms:.0f}ms, sem erros.")
+
+
+if __name__ == "__main__":
+    main()
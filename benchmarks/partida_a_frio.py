@@ -0,0 +1,127 @@
+# Benchmark da partida a frio da API (livros.py), o que domina a latência de cauda no
+# Vercel, onde cada instância nova importa o módulo antes de atender a primeira requisição.
+#
+# Cada medição roda em um processo Python novo e informa:
+#   - processo:            tempo total do processo (interpretador + importação + requisições);
+#   - importacao:          'import livros';
+#   - primeira_requisicao: a primeira requisição ('/health'), que verifica o esquema do banco;
+#   - documentacao:        a primeira visita a '/apidocs/' e '/apispec_1.json'.
+# Com '--comparar <revisão do git>', a mesma medição é feita em uma cópia do projeto
+# naquela revisão (ex: antes da otimização), lado a lado com a versão atual.
+#
+# Uso:
+#   python benchmarks/partida_a_frio.py --repeticoes 10
+#   python benchmarks/partida_a_frio.py --comparar HEAD~1 --json partida.json
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+RAIZ = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from ingestao_concorrente import percentil  # noqa: E402
+
+# Executado em cada processo novo, com a pasta do projeto como diretório atual.
+MEDICAO = """
+import json, time
+inicio = time.perf_counter()
+import livros
+importado = time.perf_counter()
+cliente = livros.app.test_client()
+cliente.get('/health')
+respondido = time.perf_counter()
+cliente.get('/apidocs/', follow_redirects=True)
+cliente.get('/apispec_1.json')
+documentado = time.perf_counter()
+print(json.dumps({
+    'importacao': importado - inicio,
+    'primeira_requisicao': respondido - importado,
+    'documentacao': documentado - respondido,
+}))
+"""
+
+ETAPAS = ('processo', 'importacao', 'primeira_requisicao', 'documentacao')
+
+
+def copiar_revisao(revisao, destino):
+    # Extrai os arquivos da revisão pedida (sem mexer na árvore de trabalho atual).
+    arquivo = subprocess.run(['git', 'archive', revisao], cwd=RAIZ, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', destino], input=arquivo, check=True)
+
+
+def medir(pasta, banco, repeticoes):
+    ambiente = dict(os.environ, DATABASE_URL='sqlite:///' + banco)
+    # A primeira execução aquece o cache de disco; as medidas são das partidas seguintes.
+    subprocess.run([sys.executable, '-c', MEDICAO], cwd=pasta, env=ambiente, check=True, capture_output=True)
+
+    medidas = {etapa: [] for etapa in ETAPAS}
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run([sys.executable, '-c', MEDICAO], cwd=pasta, env=ambiente, check=True,
+                               capture_output=True, text=True).stdout
+        medidas['processo'].append(time.perf_counter() - inicio)
+        for etapa, valor in json.loads(saida.strip().splitlines()[-1]).items():
+            medidas[etapa].append(valor)
+
+    return {
+        etapa: {
+            'p50_ms': round(percentil(valores, 50) * 1000, 1),
+            'min_ms': round(min(valores) * 1000, 1),
+            'max_ms': round(max(valores) * 1000, 1),
+        }
+        for etapa, valores in medidas.items()
+    }
+
+
+def imprimir(resultados):
+    nomes = list(resultados)
+    print(f"\n  {'etapa (p50, ms)':<22}" + "".join(f"{nome:>14}" for nome in nomes))
+    for etapa in ETAPAS:
+        print(f"  {etapa:<22}" + "".join(f"{resultados[nome][etapa]['p50_ms']:>14.1f}" for nome in nomes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de partida a frio da API.")
+    parser.add_argument('--repeticoes', type=int, default=10, help="Processos medidos por versão.")
+    parser.add_argument('--comparar', metavar='REVISAO',
+                        help="Revisão do git medida lado a lado com a versão atual (ex: HEAD~1).")
+    parser.add_argument('--banco', default=os.path.join(RAIZ, 'instance', 'base.db'),
+                        help="Banco copiado para as medições (o original não é alterado).")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy(), 'versoes': {}}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        versoes = {'atual': RAIZ}
+        if args.comparar:
+            pasta = os.path.join(temporaria, 'revisao')
+            os.makedirs(pasta)
+            copiar_revisao(args.comparar, pasta)
+            versoes = {args.comparar: pasta, 'atual': RAIZ}
+
+        for nome, pasta in versoes.items():
+            banco = os.path.join(temporaria, f"banco_{len(resultado['versoes'])}.db")
+            shutil.copyfile(args.banco, banco)
+            # A API não migra o banco: a cópia é migrada antes, pela ingestão da versão atual.
+            subprocess.run([sys.executable, os.path.join(RAIZ, 'alimenta_base.py'), '--migrar',
+                            '--banco', 'sqlite:///' + banco], check=True, capture_output=True)
+            resultado['versoes'][nome] = medir(pasta, banco, max(1, args.repeticoes))
+
+    imprimir(resultado['versoes'])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Benchmark de ponta a ponta do raspador (alimenta_base.py) contra a réplica local do site.
+#
+# Sobe 'site_local.py' em outro processo (para não disputar o GIL com o raspador),
+# executa uma ingestão completa em um banco temporário e informa páginas/s, livros/s
+# e a divisão do tempo entre download, análise do HTML e gravação no banco.
+#
+# Uso:
+#   python benchmarks/scraper.py --livros 20000 --categorias 200 --concorrencia 16 --latencia 0.02
+#   python benchmarks/scraper.py --incremental --json resultado.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+
+import alimenta_base  # noqa: E402
+from extracao import BACKEND_PADRAO, BACKENDS_DISPONIVEIS  # noqa: E402
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def site_local(livros, categorias, latencia):
+    porta = porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, os.path.join(PASTA_BENCHMARKS, 'site_local.py'),
+         '--livros', str(livros), '--categorias', str(categorias),
+         '--latencia', str(latencia), '--porta', str(porta)],
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{porta}/"
+    try:
+        # Aguarda o servidor aceitar conexões.
+        for _ in range(100):
+            try:
+                requests.get(url, timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        yield url
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def medir(url, banco, args):
+    inicio = time.perf_counter()
+    # Os 'print' do raspador ficam fora da medição do terminal.
+    with contextlib.redirect_stdout(io.StringIO()):
+        estatisticas = alimenta_base.executar_ingestao(
+            url=url, banco=banco, concorrencia=args.concorrencia, limite_por_host=args.concorrencia,
+            lote=args.lote, backend=args.parser,
+        )
+    duracao = time.perf_counter() - inicio
+
+    paginas = estatisticas['paginas_processadas'] + estatisticas['paginas_ignoradas']
+    livros = estatisticas['inseridos'] + estatisticas['atualizados'] + estatisticas['inalterados']
+    etapas = {
+        'download': estatisticas['tempo_download'],
+        'analise': estatisticas['tempo_analise'],
+        'gravacao': estatisticas['tempo_gravacao'],
+    }
+    return {
+        'duracao_s': round(duracao, 3),
+        'paginas': paginas,
+        'paginas_ignoradas': estatisticas['paginas_ignoradas'],
+        'livros': livros,
+        'paginas_por_s': round(paginas / duracao, 1),
+        'livros_por_s': round(livros / duracao, 1),
+        'etapas_s': {nome: round(valor, 3) for nome, valor in etapas.items()},
+        'etapas_pct': {nome: round(100 * valor / (sum(etapas.values()) or 1), 1) for nome, valor in etapas.items()},
+    }
+
+
+def imprimir(nome, resultado):
+    print(f"\n{nome}")
+    print(f"  duração:        {resultado['duracao_s']:.2f}s")
+    print(f"  páginas:        {resultado['paginas']} ({resultado['paginas_ignoradas']} sem alterações)"
+          f"  -> {resultado['paginas_por_s']:.1f} páginas/s")
+    print(f"  livros:         {resultado['livros']}  -> {resultado['livros_por_s']:.1f} livros/s")
+    print("  tempo por etapa (somado entre as threads):")
+    for etapa, segundos in resultado['etapas_s'].items():
+        print(f"    {etapa:<10} {segundos:8.3f}s  {resultado['etapas_pct'][etapa]:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do raspador contra a réplica local do site.")
+    parser.add_argument('--livros', type=int, default=10000)
+    parser.add_argument('--categorias', type=int, default=100)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Atraso artificial por requisição, em segundos.")
+    parser.add_argument('--concorrencia', type=int, default=alimenta_base.CONCORRENCIA_PADRAO)
+    parser.add_argument('--lote', type=int, default=alimenta_base.LOTE_PADRAO)
+    parser.add_argument('--parser', choices=BACKENDS_DISPONIVEIS, default=BACKEND_PADRAO)
+    parser.add_argument('--incremental', action='store_true',
+                        help="Mede também uma segunda execução, com o catálogo inalterado.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy()}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as pasta, site_local(args.livros, args.categorias, args.latencia) as url:
+        banco = 'sqlite:///' + os.path.join(pasta, 'benchmark.db')
+
+        resultado['completa'] = medir(url, banco, args)
+        imprimir("Ingestão completa", resultado['completa'])
+
+        if args.incremental:
+            resultado['incremental'] = medir(url, banco, args)
+            imprimir("Ingestão incremental (sem alterações)", resultado['incremental'])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
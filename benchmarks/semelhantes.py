@@ -0,0 +1,103 @@
+# Benchmark dos livros semelhantes (semelhantes.py e '/api/v1/books/<id>/similar').
+#
+# Gera um catálogo sintético (o mesmo de 'api.py'), recalcula os vizinhos de todos os
+# livros como no fim de uma ingestão e informa o tempo de cada etapa (vetores, vizinhos
+# e gravação). Depois importa a API no próprio processo, com o cache de respostas
+# desligado, e mede p50/p99 de '/api/v1/books/<id>/similar' para IDs sorteados.
+#
+# Uso:
+#   python benchmarks/semelhantes.py --livros 100000 --requisicoes 300
+#   python benchmarks/semelhantes.py --livros 10000 --pasta-bancos /tmp/bancos --json semelhantes.json
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from api import semear  # noqa: E402
+from ingestao_concorrente import percentil  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cálculo dos livros semelhantes e latência de '/similar'.")
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--requisicoes', type=int, default=300, help="Requisições a '/similar'.")
+    parser.add_argument('--pasta-bancos', help="Pasta onde guardar (e reaproveitar) os bancos gerados.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy()}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta_bancos or temporaria
+        os.makedirs(pasta, exist_ok=True)
+        origem = os.path.join(pasta, f"api_{args.livros}_{args.categorias}.db")
+        if not os.path.exists(origem):
+            semear(origem, args.livros, args.categorias)
+        # Os vizinhos são gravados em uma cópia: o banco guardado continua igual.
+        caminho = os.path.join(temporaria, "semelhantes.db")
+        shutil.copyfile(origem, caminho)
+
+        import semelhantes
+        from banco import configurar_sqlite, garantir_esquema
+        from sqlalchemy import create_engine
+
+        if not semelhantes.DISPONIVEL:
+            raise SystemExit("O NumPy não está instalado: pip install numpy")
+
+        engine = configurar_sqlite(create_engine('sqlite:///' + caminho))
+        with engine.begin() as conexao:
+            garantir_esquema(conexao)
+        inicio = time.perf_counter()
+        tempos = semelhantes.calcular_semelhantes(engine)
+        resultado['recalculo_s'] = round(time.perf_counter() - inicio, 2)
+        resultado['etapas_s'] = {etapa: round(valor, 2) for etapa, valor in tempos.items() if etapa.endswith('_s')}
+        engine.dispose()
+        print(f"Vizinhos de {tempos['livros']} livros recalculados em {resultado['recalculo_s']:.1f}s "
+              f"(vetores {tempos['vetores_s']:.1f}s | vizinhos {tempos['vizinhos_s']:.1f}s | "
+              f"gravação {tempos['gravacao_s']:.1f}s)")
+
+        # A API lê DATABASE_URL na importação.
+        os.environ['DATABASE_URL'] = 'sqlite:///' + caminho
+        import livros
+        from cache_respostas import SemCache
+
+        livros.cache_respostas = SemCache()
+        cliente = livros.app.test_client()
+        usuario = {'nome_usuario': 'benchmark', 'senha': 'benchmark'}
+        cliente.post('/registro', json=usuario)
+        cabecalhos = {'Authorization': 'Bearer ' + cliente.post('/login', json=usuario).get_json()['token']}
+        cliente.get('/health')
+
+        sorteio = random.Random(1)
+        valores = []
+        for _ in range(args.requisicoes):
+            url = f"/api/v1/books/{sorteio.randint(1, args.livros)}/similar"
+            inicio = time.perf_counter()
+            resposta = cliente.get(url, headers=cabecalhos)
+            valores.append(time.perf_counter() - inicio)
+            if resposta.status_code != 200:
+                raise SystemExit(f"FALHOU: {url} respondeu {resposta.status_code}")
+        resultado['similar_ms'] = {
+            'p50': round(percentil(valores, 50) * 1000, 2),
+            'p99': round(percentil(valores, 99) * 1000, 2),
+        }
+        print(f"  /similar (ms): p50 {resultado['similar_ms']['p50']:.2f}  p99 {resultado['similar_ms']['p99']:.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
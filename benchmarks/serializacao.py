@@ -0,0 +1,116 @@
+# Benchmark da serialização das respostas de livros (serializacao.py).
+#
+# Gera um catálogo sintético (o mesmo de 'api.py'), importa a API no próprio processo com
+# o cache de respostas desligado e mede as listas grandes de '/api/v1/books' em três
+# situações:
+#   - jsonify: o caminho anterior (um dicionário por livro codificado pelo Flask);
+#   - frio:    o serializador com o cache de JSON dos livros vazio a cada requisição;
+#   - quente:  o serializador reaproveitando o JSON já guardado de cada livro.
+# Informa também o codificador em uso (orjson ou json da biblioteca padrão). Para comparar
+# os dois, rode de novo com '--sem-orjson'.
+#
+# Uso:
+#   python benchmarks/serializacao.py --livros 100000 --requisicoes 10
+#   python benchmarks/serializacao.py --livros 100000 --sem-orjson
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from api import semear  # noqa: E402
+from ingestao_concorrente import percentil  # noqa: E402
+
+URLS = {
+    'pagina_1000': "/api/v1/books?limit=1000&after=1000",
+    'pagina_1000_campos': "/api/v1/books?limit=1000&after=1000&fields=id,titulo,preco_centavos,nota",
+    'lote_1000': "/api/v1/books/batch?ids=" + ",".join(str(i) for i in range(1, 2001, 2)),
+    'catalogo_inteiro': "/api/v1/books",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialização das listas de livros: jsonify x fragmentos em cache.")
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--requisicoes', type=int, default=10, help="Requisições por URL e situação.")
+    parser.add_argument('--sem-orjson', action='store_true', help="Usa o 'json' da biblioteca padrão.")
+    parser.add_argument('--pasta-bancos', help="Pasta onde guardar (e reaproveitar) os bancos gerados.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    if args.sem_orjson:
+        sys.modules['orjson'] = None
+
+    resultado = {'parametros': vars(args).copy(), 'urls': {}}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta_bancos or temporaria
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"api_{args.livros}_{args.categorias}.db")
+        if not os.path.exists(caminho):
+            semear(caminho, args.livros, args.categorias)
+
+        # A API lê DATABASE_URL na importação.
+        os.environ['DATABASE_URL'] = 'sqlite:///' + caminho
+        import livros
+        import serializacao
+        from cache_respostas import SemCache
+
+        livros.cache_respostas = SemCache()
+        cliente = livros.app.test_client()
+        usuario = {'nome_usuario': 'benchmark', 'senha': 'benchmark'}
+        cliente.post('/registro', json=usuario)
+        cabecalhos = {'Authorization': 'Bearer ' + cliente.post('/login', json=usuario).get_json()['token']}
+        cliente.get('/health')
+
+        codificador = 'json' if serializacao.orjson is None else 'orjson'
+        resultado['codificador'] = codificador
+        print(f"Codificador: {codificador}")
+
+        def jsonify_livros(linhas, campos):
+            # O caminho anterior: um dicionário por livro, codificado pelo provedor JSON do Flask.
+            return [livros.app.json.dumps(livros._livro_para_dict(l, campos)).encode() for l in linhas]
+
+        original = livros._livros_json
+        situacoes = {
+            'jsonify': lambda: setattr(livros, '_livros_json', jsonify_livros),
+            'frio': lambda: (setattr(livros, '_livros_json', original), livros.serializador_livros.limpar()),
+            'quente': lambda: setattr(livros, '_livros_json', original),
+        }
+
+        print(f"\n  {'url':<20}" + "".join(f"{s + ' p50':>14}" for s in situacoes) + f"{'x quente':>10}")
+        for nome, url in URLS.items():
+            tempos = {}
+            for situacao, preparar in situacoes.items():
+                valores = []
+                cliente.get(url, headers=cabecalhos)
+                # Livros sem 'sequencia' não entram no cache: sem esta conferência a coluna
+                # "quente" poderia repetir o caminho frio sem que ninguém notasse.
+                if situacao == 'quente' and not len(livros.serializador_livros):
+                    raise SystemExit(f"FALHOU: {url} não guardou nenhum livro no cache de JSON.")
+                for _ in range(args.requisicoes):
+                    preparar()
+                    inicio = time.perf_counter()
+                    cliente.get(url, headers=cabecalhos).get_data()
+                    valores.append(time.perf_counter() - inicio)
+                tempos[situacao] = round(percentil(valores, 50) * 1000, 2)
+            livros._livros_json = original
+            tempos['aceleracao'] = round(tempos['jsonify'] / tempos['quente'], 1)
+            resultado['urls'][nome] = tempos
+            print(f"  {nome:<20}" + "".join(f"{tempos[s]:>14.2f}" for s in situacoes) + f"{tempos['aceleracao']:>10.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+# Réplica local do 'books.toscrape.com' para medir o raspador sem acessar o site real.
+#
+# O catálogo é gerado de forma determinística a partir do índice de cada livro, sem
+# ser guardado em memória, então escalas como 100 mil livros em 500 categorias não
+# custam nada para subir. A marcação é a mesma do site original: barra lateral de
+# categorias, 'article.product_pod' e paginação com 'li.current' e 'li.next', e a página
+# de cada livro com a descrição e a tabela "Product Information" (UPC, estoque, avaliações).
+# Como o site original, as respostas não informam o charset e trazem ETag e
+# Last-Modified (com suporte a requisições condicionais).
+#
+# Uso:
+#   python benchmarks/site_local.py --livros 100000 --categorias 500 --latencia 0.05
+
+import argparse
+import hashlib
+import html
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LIVROS_POR_PAGINA = 20
+AVALIACOES = ["One", "Two", "Three", "Four", "Five"]
+PALAVRAS = [
+    "Himalayas", "Moon", "Noah’s", "Ark", "America", "Guide", "Travel", "Sun", "Murder", "Time",
+    "Dark", "Wood", "Objects", "Patriarchs", "Empire", "Fear", "Light", "Attic", "Secret", "River",
+    "Garden", "Night", "Storm", "Crown", "Winter", "Letters", "Ghost", "Island", "Silence", "Fire",
+]
+
+# Data fixa de "última modificação" do catálogo gerado.
+ULTIMA_MODIFICACAO = formatdate(1466760540, usegmt=True)
+
+CABECALHO = '''<!DOCTYPE html>
+<html lang="en-us" class="no-js">
+    <head>
+        <title>
+    {titulo} | Books to Scrape - Sandbox
+</title>
+        <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+        <link rel="stylesheet" type="text/css" href="{raiz}static/oscar/css/styles.css" />
+    </head>
+    <body id="default" class="default">
+        <header class="header container-fluid">
+            <div class="page_inner">
+                <div class="row">
+                    <div class="col-sm-8 h1"><a href="{raiz}index.html">Books to Scrape</a><small> We love being scraped!</small>
+</div>
+                </div>
+            </div>
+        </header>
+        <div class="container-fluid page">
+            <div class="page_inner">
+                <div class="row">
+                    <aside class="sidebar col-sm-4 col-md-3">
+                        <div class="side_categories">
+                            <ul class="nav nav-list">
+                                <li>
+                                    <a href="{prefixo}books_1/index.html">
+                                        Books
+                                    </a>
+                                    <ul>
+{categorias}
+                                    </ul>
+                                </li>
+                            </ul>
+                        </div>
+                    </aside>
+                    <div class="col-sm-8 col-md-9">
+                        <div class="page-header action">
+                            <h1>{h1}</h1>
+                        </div>
+                        <section>
+                            <div>
+                                <ol class="row">
+{livros}
+                                </ol>
+{paginacao}
+                            </div>
+                        </section>
+                    </div>
+                </div>
+            </div>
+        </div>
+    </body>
+</html>
+'''
+
+PRODUTO = '''                                        <li class="col-xs-6 col-sm-4 col-md-3 col-lg-3">
+    <article class="product_pod">
+            <div class="image_container">
+                    <a href="{link}"><img src="../../../../media/cache/{imagem}.jpg" alt="{titulo}" class="thumbnail"></a>
+            </div>
+                <p class="star-rating {avaliacao}">
+                    <i class="icon-star"></i>
+                </p>
+            <h3><a href="{link}" title="{titulo}">{titulo}</a></h3>
+            <div class="product_price">
+        <p class="price_color">£{preco}</p>
+<p class="instock availability">
+    <i class="{icone}"></i>
+
+        {estoque}
+
+</p>
+            </div>
+    </article>
+</li>'''
+
+PAGINA_LIVRO = '''<!DOCTYPE html>
+<html lang="en-us" class="no-js">
+    <head>
+        <title>
+    {titulo} | Books to Scrape - Sandbox
+</title>
+        <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+        <link rel="stylesheet" type="text/css" href="../../static/oscar/css/styles.css" />
+    </head>
+    <body id="default" class="default">
+        <div class="container-fluid page">
+            <div class="page_inner">
+                <div class="content">
+                    <div id="content_inner">
+<article class="product_page"><!-- Start of product page -->
+    <div class="row">
+        <div class="col-sm-6">
+            <div id="product_gallery" class="carousel">
+                <div class="thumbnail">
+                    <div class="carousel-inner">
+                        <div class="item active">
+                            <img src="../../media/cache/{imagem}.jpg" alt="{titulo}" />
+                        </div>
+                    </div>
+                </div>
+            </div>
+        </div>
+        <div class="col-sm-6 product_main">
+            <h1>{titulo}</h1>
+            <p class="price_color">£{preco}</p>
+<p class="instock availability">
+    <i class="{icone}"></i>
+
+        {estoque}
+
+</p>
+            <p class="star-rating {avaliacao}">
+                <i class="icon-star"></i>
+            </p>
+        </div><!-- /col-sm-6 -->
+    </div><!-- /row -->
+{descricao}
+    <div class="sub-header">
+        <h2>Product Information</h2>
+    </div>
+    <table class="table table-striped">
+        <tr>
+            <th>UPC</th><td>{upc}</td>
+        </tr>
+        <tr>
+            <th>Product Type</th><td>Books</td>
+        </tr>
+        <tr>
+            <th>Price (excl. tax)</th><td>£{preco}</td>
+        </tr>
+        <tr>
+            <th>Availability</th>
+            <td>{estoque}</td>
+        </tr>
+        <tr>
+            <th>Number of reviews</th>
+            <td>0</td>
+        </tr>
+    </table>
+</article><!-- End of product page -->
+                    </div>
+                </div>
+            </div>
+        </div>
+    </body>
+</html>
+'''
+
+DESCRICAO = '''    <div id="product_description" class="sub-header">
+        <h2>Product Description</h2>
+    </div>
+    <p>{texto} ...more</p>'''
+
+
+class Catalogo:
+    # Catálogo sintético: o livro 'j' pertence à categoria 'j % categorias'.
+    def __init__(self, livros, categorias, semente=42):
+        self.livros = livros
+        self.categorias = max(1, min(categorias, livros))
+        self.semente = semente
+
+    def nome_categoria(self, c):
+        return f"Category {c + 1}"
+
+    def slug_categoria(self, c):
+        return f"category-{c + 1}_{c + 2}"
+
+    def quantidade(self, c):
+        return self.livros // self.categorias + (1 if c < self.livros % self.categorias else 0)
+
+    def total_paginas(self, c):
+        return max(1, -(-self.quantidade(c) // LIVROS_POR_PAGINA))
+
+    def livro(self, j):
+        sorteio = random.Random(self.semente * 1_000_003 + j)
+        titulo = " ".join(sorteio.sample(PALAVRAS, sorteio.randint(2, 4)))
+        return {
+            'titulo': f"{titulo} #{j + 1}",
+            'slug': f"book-{j + 1}_{j + 1}",
+            'preco': f"{sorteio.randint(1000, 5999) / 100:.2f}",
+            'avaliacao': sorteio.choice(AVALIACOES),
+            'em_estoque': sorteio.random() > 0.1,
+            'imagem': hashlib.md5(str(j).encode()).hexdigest(),
+            'upc': hashlib.md5(f"upc-{j}".encode()).hexdigest()[:16],
+            'quantidade_estoque': sorteio.randint(1, 22),
+            # Como no site original, alguns livros não têm descrição.
+            'descricao': None if sorteio.random() < 0.05 else " ".join(
+                sorteio.choice(PALAVRAS).lower() for _ in range(sorteio.randint(60, 180))
+            ).capitalize() + ".",
+        }
+
+    def _barra_lateral(self, prefixo):
+        return "\n".join(
+            f'''                                        <li>
+                                            <a href="{prefixo}{self.slug_categoria(c)}/index.html">
+                                                {self.nome_categoria(c)}
+                                            </a>
+                                        </li>''' for c in range(self.categorias)
+        )
+
+    def pagina_inicial(self):
+        return CABECALHO.format(
+            titulo="All products", raiz="", prefixo="catalogue/category/books/", h1="All products",
+            categorias=self._barra_lateral("catalogue/category/books/"), livros="", paginacao="",
+        ).replace('href="catalogue/category/books/books_1/', 'href="catalogue/category/books_1/')
+
+    def pagina_categoria(self, c, numero):
+        total = self.total_paginas(c)
+        inicio = (numero - 1) * LIVROS_POR_PAGINA
+        fim = min(numero * LIVROS_POR_PAGINA, self.quantidade(c))
+
+        produtos = []
+        for i in range(inicio, fim):
+            livro = self.livro(c + i * self.categorias)
+            titulo = html.escape(livro['titulo'])
+            produtos.append(PRODUTO.format(
+                link=f"../../../{livro['slug']}/index.html", titulo=titulo, imagem=livro['imagem'],
+                avaliacao=livro['avaliacao'], preco=livro['preco'],
+                icone='icon-ok' if livro['em_estoque'] else 'icon-remove',
+                estoque='In stock' if livro['em_estoque'] else 'Out of stock',
+            ))
+
+        paginacao = ''
+        if total > 1:
+            itens = []
+            if numero > 1:
+                anterior = 'index.html' if numero == 2 else f'page-{numero - 1}.html'
+                itens.append(f'<li class="previous"><a href="{anterior}">previous</a></li>')
+            itens.append(f'<li class="current">\n    Page {numero} of {total}\n</li>')
+            if numero < total:
+                itens.append(f'<li class="next"><a href="page-{numero + 1}.html">next</a></li>')
+            paginacao = '<div>\n<ul class="pager">\n' + "\n".join(itens) + '\n</ul>\n</div>'
+
+        return CABECALHO.format(
+            titulo=self.nome_categoria(c), raiz="../../../../", prefixo="../", h1=self.nome_categoria(c),
+            categorias=self._barra_lateral("../"), livros="\n".join(produtos), paginacao=paginacao,
+        )
+
+    def pagina_livro(self, j):
+        livro = self.livro(j)
+        estoque = f"In stock ({livro['quantidade_estoque']} available)" if livro['em_estoque'] else 'Out of stock'
+        descricao = '' if livro['descricao'] is None else DESCRICAO.format(texto=html.escape(livro['descricao']))
+        return PAGINA_LIVRO.format(
+            titulo=html.escape(livro['titulo']), imagem=livro['imagem'], preco=livro['preco'],
+            icone='icon-ok' if livro['em_estoque'] else 'icon-remove', estoque=estoque,
+            avaliacao=livro['avaliacao'], descricao=descricao, upc=livro['upc'],
+        )
+
+    def resolver(self, caminho):
+        # Devolve o HTML de um caminho do site, ou None (404).
+        if caminho in ('/', '/index.html'):
+            return self.pagina_inicial()
+
+        encontrado = re.fullmatch(r'/catalogue/book-(\d+)_\d+/index\.html', caminho)
+        if encontrado:
+            j = int(encontrado.group(1)) - 1
+            return self.pagina_livro(j) if 0 <= j < self.livros else None
+
+        encontrado = re.fullmatch(r'/catalogue/category/books/category-(\d+)_\d+/(?:index|page-(\d+))\.html', caminho)
+        if encontrado:
+            c = int(encontrado.group(1)) - 1
+            numero = int(encontrado.group(2) or 1)
+            if 0 <= c < self.categorias and 1 <= numero <= self.total_paginas(c):
+                if numero == 1 and encontrado.group(2):
+                    return None
+                return self.pagina_categoria(c, numero)
+        return None
+
+
+def criar_servidor(catalogo, porta=0, latencia=0.0, host='127.0.0.1'):
+    # Cria o servidor HTTP (porta 0 = porta livre escolhida pelo sistema).
+    class Manipulador(BaseHTTPRequestHandler):
+        # HTTP/1.1 para que o cliente possa reaproveitar as conexões (keep-alive).
+        protocol_version = "HTTP/1.1"
+        # Cabeçalhos e corpo vão em duas escritas: com o algoritmo de Nagle, a segunda
+        # esperaria o ACK atrasado do cliente (~40 ms a mais por requisição keep-alive).
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if latencia:
+                time.sleep(latencia)
+
+            conteudo = catalogo.resolver(self.path)
+            if conteudo is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            corpo = conteudo.encode('utf-8')
+            etag = '"' + hashlib.md5(corpo).hexdigest() + '"'
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            # Sem charset, como no site original.
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", ULTIMA_MODIFICACAO)
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    servidor = ThreadingHTTPServer((host, porta), Manipulador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def iniciar_em_thread(catalogo, porta=0, latencia=0.0):
+    # Sobe o servidor em segundo plano e devolve (servidor, url_base).
+    servidor = criar_servidor(catalogo, porta, latencia)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réplica local do 'books.toscrape.com' com catálogo gerado.")
+    parser.add_argument('--livros', type=int, default=1000, help="Quantidade de livros do catálogo.")
+    parser.add_argument('--categorias', type=int, default=50, help="Quantidade de categorias.")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Atraso artificial por requisição, em segundos.")
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--semente', type=int, default=42, help="Semente do gerador do catálogo.")
+    args = parser.parse_args()
+
+    catalogo = Catalogo(args.livros, args.categorias, args.semente)
+    servidor = criar_servidor(catalogo, args.porta, args.latencia)
+    print(f"Servindo {catalogo.livros} livros em {catalogo.categorias} categorias em "
+          f"http://127.0.0.1:{servidor.server_address[1]}/ (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
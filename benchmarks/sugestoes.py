@@ -0,0 +1,147 @@
+# Benchmark das sugestões de títulos ('/api/v1/books/suggest', indice_titulos.py).
+#
+# Gera um catálogo sintético (o mesmo de 'api.py') e mede:
+#   - a montagem do índice de prefixos a partir da tabela 'livros';
+#   - a consulta ao índice (p50/p99 em microssegundos), com o texto digitado letra a letra;
+#   - a requisição completa a '/api/v1/books/suggest' e, para comparar, a mesma lista
+#     (maiores notas primeiro) por '/api/v1/books/search?modo=substring&sort=-avaliacao'
+#     (o 'ilike'), com o cache de respostas desligado;
+#   - a atualização incremental do índice depois de uma ingestão que altera 'alterados' livros.
+#
+# Uso:
+#   python benchmarks/sugestoes.py --livros 100000 --requisicoes 300
+#   python benchmarks/sugestoes.py --livros 1000000 --pasta-bancos /tmp/bancos --json sugestoes.json
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+PASTA_BENCHMARKS = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from api import semear  # noqa: E402
+from ingestao_concorrente import percentil  # noqa: E402
+from site_local import PALAVRAS  # noqa: E402
+
+
+def digitados(sorteio, quantidade):
+    # Textos como digitados em uma caixa de busca: cada prefixo de 1 a 2 palavras.
+    textos = []
+    while len(textos) < quantidade:
+        frase = " ".join(sorteio.sample(PALAVRAS, sorteio.randint(1, 2)))
+        textos.extend(frase[:tamanho] for tamanho in range(1, len(frase) + 1))
+    return textos[:quantidade]
+
+
+def resumo(valores, escala):
+    return {'p50': round(percentil(valores, 50) * escala, 1), 'p99': round(percentil(valores, 99) * escala, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugestões de títulos: índice de prefixos x busca por substring.")
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--categorias', type=int, default=50)
+    parser.add_argument('--requisicoes', type=int, default=300, help="Textos consultados em cada caminho.")
+    parser.add_argument('--alterados', type=int, default=500, help="Livros alterados na atualização incremental.")
+    parser.add_argument('--pasta-bancos', help="Pasta onde guardar (e reaproveitar) os bancos gerados.")
+    parser.add_argument('--json', help="Arquivo onde gravar o resultado em JSON.")
+    args = parser.parse_args()
+
+    resultado = {'parametros': vars(args).copy()}
+    resultado['parametros'].pop('json')
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta_bancos or temporaria
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"api_{args.livros}_{args.categorias}.db")
+        if not os.path.exists(caminho):
+            semear(caminho, args.livros, args.categorias)
+
+        # A API lê DATABASE_URL na importação.
+        os.environ['DATABASE_URL'] = 'sqlite:///' + caminho
+        import livros
+        from cache_respostas import SemCache
+        from indice_titulos import IndiceTitulos
+        from sqlalchemy import create_engine, text
+
+        livros.cache_respostas = SemCache()
+        cliente = livros.app.test_client()
+        usuario = {'nome_usuario': 'benchmark', 'senha': 'benchmark'}
+        cliente.post('/registro', json=usuario)
+        cabecalhos = {'Authorization': 'Bearer ' + cliente.post('/login', json=usuario).get_json()['token']}
+        cliente.get('/health')
+
+        # A primeira sugestão monta o índice da API.
+        inicio = time.perf_counter()
+        cliente.get("/api/v1/books/suggest?q=a", headers=cabecalhos)
+        indice = livros.indice_titulos
+        resultado['montagem_s'] = round(time.perf_counter() - inicio, 2)
+        print(f"Índice de {len(indice)} títulos montado em {resultado['montagem_s']:.2f}s")
+
+        textos = digitados(random.Random(1), args.requisicoes)
+        tempos = []
+        for texto in textos:
+            inicio = time.perf_counter()
+            indice.consultar(texto, 10)
+            tempos.append(time.perf_counter() - inicio)
+        resultado['consulta_indice_us'] = resumo(tempos, 1e6)
+
+        for nome, url in (('suggest', "/api/v1/books/suggest?limit=10&q="),
+                          ('search_substring', "/api/v1/books/search?modo=substring&sort=-avaliacao&limit=10&titulo=")):
+            cliente.get(url + "b", headers=cabecalhos)
+            tempos = []
+            for texto in textos:
+                inicio = time.perf_counter()
+                cliente.get(url + quote(texto), headers=cabecalhos).get_data()
+                tempos.append(time.perf_counter() - inicio)
+            resultado[nome + '_ms'] = resumo(tempos, 1000)
+
+        # Ingestão simulada (em uma cópia do banco): títulos alterados com as sequências
+        # seguintes, como grava alimenta_base.py.
+        copia = os.path.join(temporaria, "alterado.db")
+        shutil.copyfile(caminho, copia)
+        engine = create_engine('sqlite:///' + copia)
+        indice = IndiceTitulos()
+        indice.sincronizar(engine, 0)
+        with engine.begin() as conexao:
+            sequencia = conexao.execute(text("SELECT MAX(sequencia) FROM livros")).scalar()
+            conexao.execute(text("UPDATE livros SET titulo = titulo || ' (2a edição)', sequencia = :sequencia + id "
+                                 "WHERE id <= :alterados"), {'sequencia': sequencia, 'alterados': args.alterados})
+        inicio = time.perf_counter()
+        indice.sincronizar(engine, 1)
+        resultado['incremental_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+
+        # Sem sequências no banco a sincronização não veria nada: o índice tem de devolver
+        # os títulos novos, e não os antigos.
+        with engine.connect() as conexao:
+            renomeados = conexao.execute(text("SELECT id, titulo FROM livros WHERE id <= :alterados"),
+                                         {'alterados': args.alterados}).all()
+        engine.dispose()
+        for id_livro, titulo in random.sample(renomeados, min(len(renomeados), 50)):
+            if (id_livro, titulo) not in {(id_indice, titulo_indice) for id_indice, titulo_indice, _
+                                          in indice.consultar(titulo, len(renomeados) + 1)}:
+                raise SystemExit(f"FALHOU: o índice não devolveu '{titulo}' (Id {id_livro}) depois da "
+                                 f"sincronização incremental.")
+
+    print(f"  consulta ao índice (us):        p50 {resultado['consulta_indice_us']['p50']:>8.1f}"
+          f"  p99 {resultado['consulta_indice_us']['p99']:>8.1f}")
+    print(f"  /suggest (ms):                  p50 {resultado['suggest_ms']['p50']:>8.1f}"
+          f"  p99 {resultado['suggest_ms']['p99']:>8.1f}")
+    print(f"  /search modo=substring (ms):    p50 {resultado['search_substring_ms']['p50']:>8.1f}"
+          f"  p99 {resultado['search_substring_ms']['p99']:>8.1f}")
+    print(f"  atualização com {args.alterados} livros alterados: {resultado['incremental_ms']:.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Cache das respostas da API para as rotas de leitura do catálogo.
+#
+# As chaves incluem a versão do catálogo (tabela 'versao_catalogo', incrementada pela
+# ingestão a cada gravação), então uma ingestão invalida exatamente as respostas
+# antigas: elas deixam de ser pedidas e saem do cache pela política LRU.
+#
+# Dois armazenamentos, escolhidos por CACHE_TYPE no config.py:
+#   - 'simple': memória do próprio processo (OrderedDict), o mais rápido;
+#   - 'sqlite': arquivo SQLite local, compartilhado entre os processos (workers) do servidor;
+#   - 'null':   sem cache.
+# Nos dois casos o tamanho é limitado pela soma dos corpos (CACHE_LIMITE_BYTES) e pela
+# quantidade de respostas (CACHE_LIMITE_ITENS), removendo as usadas há mais tempo.
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheMemoria:
+    def __init__(self, limite_bytes, limite_itens):
+        self.limite_bytes = limite_bytes
+        self.limite_itens = limite_itens
+        self._itens = OrderedDict()
+        self._tamanho = 0
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            resposta = self._itens.get(chave)
+            if resposta is not None:
+                self._itens.move_to_end(chave)
+            return resposta
+
+    def guardar(self, chave, status, mimetype, corpo):
+        if len(corpo) > self.limite_bytes:
+            return
+        with self._trava:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self._tamanho -= len(anterior[2])
+            self._itens[chave] = (status, mimetype, corpo)
+            self._tamanho += len(corpo)
+            while self._tamanho > self.limite_bytes or len(self._itens) > self.limite_itens:
+                _, removida = self._itens.popitem(last=False)
+                self._tamanho -= len(removida[2])
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self._tamanho = 0
+
+
+class CacheSQLite:
+    # O horário de acesso só é regravado se a última leitura tiver mais de um segundo,
+    # para que os acertos não virem uma escrita (e uma disputa pela trava do arquivo) cada.
+    RESOLUCAO_ACESSO = 1.0
+
+    def __init__(self, arquivo, limite_bytes, limite_itens):
+        self.arquivo = arquivo
+        self.limite_bytes = limite_bytes
+        self.limite_itens = limite_itens
+        self._local = threading.local()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY, status INTEGER, mimetype TEXT, corpo BLOB,"
+                " tamanho INTEGER, acesso REAL)"
+            )
+            conexao.execute("CREATE INDEX IF NOT EXISTS ix_respostas_acesso ON respostas (acesso)")
+
+    def _conexao(self):
+        # Uma conexão por thread; o modo WAL permite leituras enquanto outro processo grava.
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.arquivo, timeout=5)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def obter(self, chave):
+        try:
+            conexao = self._conexao()
+            linha = conexao.execute(
+                "SELECT status, mimetype, corpo, acesso FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None:
+                return None
+            agora = time.time()
+            if agora - linha[3] > self.RESOLUCAO_ACESSO:
+                with conexao:
+                    conexao.execute("UPDATE respostas SET acesso = ? WHERE chave = ?", (agora, chave))
+            return linha[0], linha[1], linha[2]
+        except sqlite3.Error:
+            # O cache nunca derruba a requisição: em caso de erro, a resposta é gerada de novo.
+            return None
+
+    def guardar(self, chave, status, mimetype, corpo):
+        if len(corpo) > self.limite_bytes:
+            return
+        try:
+            with self._conexao() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO respostas (chave, status, mimetype, corpo, tamanho, acesso)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (chave, status, mimetype, corpo, len(corpo), time.time()),
+                )
+                itens, tamanho = conexao.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()
+                if tamanho > self.limite_bytes or itens > self.limite_itens:
+                    self._remover_antigas(conexao, itens, tamanho)
+        except sqlite3.Error:
+            pass
+
+    def _remover_antigas(self, conexao, itens, tamanho):
+        removidas = []
+        for chave, tamanho_item in conexao.execute("SELECT chave, tamanho FROM respostas ORDER BY acesso"):
+            if tamanho <= self.limite_bytes and itens <= self.limite_itens:
+                break
+            removidas.append((chave,))
+            itens -= 1
+            tamanho -= tamanho_item
+        conexao.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+
+    def limpar(self):
+        with self._conexao() as conexao:
+            conexao.execute("DELETE FROM respostas")
+
+
+class SemCache:
+    def obter(self, chave):
+        return None
+
+    def guardar(self, chave, status, mimetype, corpo):
+        pass
+
+    def limpar(self):
+        pass
+
+
+def criar_cache(config, pasta_instancia):
+    tipo = config.get("CACHE_TYPE", "simple")
+    limite_bytes = config.get("CACHE_LIMITE_BYTES", 64 * 1024 * 1024)
+    limite_itens = config.get("CACHE_LIMITE_ITENS", 10000)
+
+    if tipo == "simple":
+        return CacheMemoria(limite_bytes, limite_itens)
+    if tipo == "sqlite":
+        # Caminho relativo fica na pasta 'instance', como o banco do catálogo.
+        arquivo = os.path.join(pasta_instancia, config.get("CACHE_ARQUIVO_SQLITE", "cache_respostas.db"))
+        os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+        return CacheSQLite(arquivo, limite_bytes, limite_itens)
+    if tipo == "null":
+        return SemCache()
+    raise ValueError(f"CACHE_TYPE inválido: '{tipo}'. Opções: simple, sqlite, null")
@@ -0,0 +1,309 @@
+# Catálogo em memória, em colunas, para as listas paginadas de '/api/v1/books'.
+#
+# Com CATALOGO_EM_MEMORIA ligado no config.py (e o NumPy instalado), a API carrega a
+# tabela 'livros' em arrays do NumPy: IDs, preço em centavos, nota, estoque e categoria,
+# e os textos repetidos (categoria, preço, avaliação, disponibilidade) codificados como
+# índices de um vocabulário. Filtros, ordenação e paginação por cursor viram operações
+# vetorizadas sobre esses arrays, e só os livros da página são montados em Python.
+#
+# As respostas são as mesmas do caminho em SQL (inclusive os cursores). O que este
+# módulo não sabe responder exatamente igual (ex: ordenar por títulos nulos) devolve
+# None e a API segue pelo SQL.
+#
+# O instantâneo corresponde a uma versão do catálogo ('versao_catalogo'). Quando uma
+# ingestão muda a versão, um novo é montado em segundo plano e trocado de uma vez; até
+# lá as requisições seguem pelo SQL, sem nunca servir dados de uma versão antiga.
+
+import threading
+import time
+
+from sqlalchemy import text
+
+from banco import versao_catalogo
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DISPONIVEL = numpy is not None
+
+# Colunas de texto guardadas como códigos de um vocabulário (poucos valores distintos).
+COLUNAS_CODIFICADAS = ("categoria", "preco", "avaliacao", "disponibilidade")
+# Colunas de texto com um valor por livro, guardadas em listas.
+COLUNAS_TEXTO = ("titulo", "imagem")
+# Colunas numéricas (arrays int64, com uma máscara para os valores nulos).
+COLUNAS_NUMERICAS = ("preco_centavos", "nota", "em_estoque", "categoria_id", "sequencia")
+# Todas as colunas guardadas; as demais (ex: a descrição, da etapa de detalhes da
+# ingestão) ficam só no banco.
+COLUNAS = frozenset(("id",) + COLUNAS_CODIFICADAS + COLUNAS_TEXTO + COLUNAS_NUMERICAS)
+
+# Valores de 'sort=' -> coluna usada na ordenação.
+ORDENACOES = {"id": "id", "preco": "preco_centavos", "avaliacao": "nota", "titulo": "titulo"}
+
+CONSULTA = text(
+    "SELECT id, " + ", ".join(COLUNAS_CODIFICADAS + COLUNAS_TEXTO + COLUNAS_NUMERICAS) + " FROM livros ORDER BY id"
+)
+
+# Tentativas de ler os livros sem que a versão do catálogo mude durante a leitura.
+TENTATIVAS_CARGA = 3
+
+
+class CatalogoColunar:
+    def __init__(self, versao, linhas):
+        self.versao = versao
+        quantidade = len(linhas)
+        colunas = list(zip(*linhas)) or [()] * (1 + len(COLUNAS_CODIFICADAS + COLUNAS_TEXTO + COLUNAS_NUMERICAS))
+        posicao = iter(colunas)
+
+        self.ids = numpy.fromiter(next(posicao), dtype=numpy.int64, count=quantidade)
+
+        # Texto repetido -> (códigos int32, vocabulário); cada valor distinto existe uma vez.
+        self._codificadas = {}
+        for nome in COLUNAS_CODIFICADAS:
+            vocabulario = {}
+            codigos = numpy.fromiter(
+                (vocabulario.setdefault(valor, len(vocabulario)) for valor in next(posicao)),
+                dtype=numpy.int32, count=quantidade,
+            )
+            self._codificadas[nome] = (codigos, list(vocabulario))
+
+        self._textos = {nome: list(next(posicao)) for nome in COLUNAS_TEXTO}
+
+        self._numericas = {}
+        for nome in COLUNAS_NUMERICAS:
+            valores = next(posicao)
+            nulos = numpy.fromiter((valor is None for valor in valores), dtype=bool, count=quantidade)
+            array = numpy.fromiter((0 if valor is None else valor for valor in valores), dtype=numpy.int64,
+                                   count=quantidade)
+            self._numericas[nome] = (array, nulos if nulos.any() else None)
+
+        # Ordenações já calculadas: (coluna, decrescente) -> permutação dos livros.
+        self._ordens = {}
+        # Títulos distintos em ordem e a posição de cada livro nela, para ordenar por título.
+        self._titulos_ordenados = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- filtros -----------------------------------------------------------------
+
+    def _mascara(self, filtros):
+        # filtros: os valores de min_price/max_price (centavos), min_rating, in_stock e
+        # categoria_id já validados; None = filtro ausente. Nulos nunca passam, como no SQL.
+        mascara = numpy.ones(len(self), dtype=bool)
+        for nome, coluna, comparar in (
+            ("preco_minimo", "preco_centavos", numpy.greater_equal),
+            ("preco_maximo", "preco_centavos", numpy.less_equal),
+            ("nota_minima", "nota", numpy.greater_equal),
+            ("em_estoque", "em_estoque", numpy.equal),
+            ("categoria_id", "categoria_id", numpy.equal),
+        ):
+            valor = filtros.get(nome)
+            if valor is None:
+                continue
+            array, nulos = self._numericas[coluna]
+            mascara &= comparar(array, int(valor))
+            if nulos is not None:
+                mascara &= ~nulos
+        return mascara
+
+    # ---- ordenação ---------------------------------------------------------------
+
+    def _chave(self, coluna):
+        # (valores inteiros usados na ordenação, máscara dos nulos ou None), ou None se a
+        # coluna não puder ser ordenada aqui.
+        if coluna == "id":
+            return self.ids, None
+        if coluna == "titulo":
+            posicoes = self._posicoes_titulos()
+            return None if posicoes is None else (posicoes[1], None)
+        return self._numericas[coluna]
+
+    def _posicoes_titulos(self):
+        # (títulos distintos em ordem, posição do título de cada livro), ou None se houver
+        # livros sem título.
+        if self._titulos_ordenados is None:
+            titulos = self._textos["titulo"]
+            if any(titulo is None for titulo in titulos):
+                self._titulos_ordenados = False
+            else:
+                self._titulos_ordenados = numpy.unique(numpy.array(titulos, dtype=object), return_inverse=True)
+        return self._titulos_ordenados or None
+
+    def _ordem(self, coluna, decrescente):
+        # Mesma ordem do SQL: pela coluna (crescente ou decrescente) e depois pelo Id crescente.
+        chave = (coluna, decrescente)
+        ordem = self._ordens.get(chave)
+        if ordem is None:
+            valores, nulos = self._chave(coluna)
+            chaves = [self.ids, -valores if decrescente else valores]
+            if nulos is not None:
+                # Como no SQLite: nulos antes dos valores na ordem crescente, depois na decrescente.
+                chaves.append(nulos if decrescente else ~nulos)
+            ordem = numpy.lexsort(chaves)
+            self._ordens[chave] = ordem
+        return ordem
+
+    def _depois_do_cursor(self, coluna, decrescente, valores, nulos, ids, cursor):
+        # Livros que vêm depois de (valor, id) na ordem pedida (valor None = livro com a
+        # coluna nula), ou None se o valor do cursor não for do tipo da coluna.
+        valor, id_livro = cursor
+        if coluna == "titulo":
+            if not isinstance(valor, str):
+                return None
+            unicos = self._posicoes_titulos()[0]
+            posicao = int(numpy.searchsorted(unicos, valor))
+            existe = posicao < len(unicos) and unicos[posicao] == valor
+            if decrescente:
+                depois = valores < posicao
+            else:
+                depois = valores > posicao if existe else valores >= posicao
+            if not existe:
+                return depois
+            valor = posicao
+        elif valor is None:
+            # Só os nulos empatam com o cursor; na ordem crescente os valores vêm todos depois.
+            if nulos is None:
+                nulos = numpy.zeros(len(valores), dtype=bool)
+            mesmo_valor = nulos & (ids > id_livro)
+            return mesmo_valor if decrescente else ~nulos | mesmo_valor
+        elif isinstance(valor, bool) or not isinstance(valor, int):
+            return None
+        else:
+            depois = valores < valor if decrescente else valores > valor
+        depois = depois | ((valores == valor) & (ids > id_livro))
+        if nulos is None:
+            return depois
+        depois &= ~nulos
+        return depois | nulos if decrescente else depois
+
+    # ---- consulta ----------------------------------------------------------------
+
+    def consultar(self, filtros, limite, cursor=None, ordenacao=None, decrescente=False):
+        # Devolve as posições dos livros da página (até 'limite' + 1, o excedente indica
+        # que existe próxima página) ou None se a consulta deve seguir pelo SQL.
+        #   - sem 'ordenacao': ordem de Id e 'cursor' é o último Id devolvido;
+        #   - com 'ordenacao' (valor de 'sort=' sem o '-'): 'cursor' é (valor, Id).
+        # Os parâmetros já chegam validados pela API dentro do intervalo de int64.
+        mascara = self._mascara(filtros)
+
+        if ordenacao is None:
+            inicio = 0 if cursor is None else int(numpy.searchsorted(self.ids, cursor, side="right"))
+            return numpy.flatnonzero(mascara[inicio:])[:limite + 1] + inicio
+
+        coluna = ORDENACOES[ordenacao]
+        chave = self._chave(coluna)
+        if chave is None:
+            return None
+        ordem = self._ordem(coluna, decrescente)
+        selecionados = ordem[mascara[ordem]]
+        if cursor is not None:
+            valores, nulos = chave
+            depois = self._depois_do_cursor(
+                coluna, decrescente, valores[selecionados], None if nulos is None else nulos[selecionados],
+                self.ids[selecionados], cursor,
+            )
+            if depois is None:
+                return None
+            selecionados = selecionados[depois]
+        return selecionados[:limite + 1]
+
+    def valor_ordenacao(self, ordenacao, posicao):
+        # Valor de 'sort=' do livro na posição informada, como no banco (para o cursor).
+        coluna = ORDENACOES[ordenacao]
+        if coluna == "id":
+            return int(self.ids[posicao])
+        if coluna == "titulo":
+            return self._textos["titulo"][posicao]
+        array, nulos = self._numericas[coluna]
+        if nulos is not None and nulos[posicao]:
+            return None
+        return int(array[posicao])
+
+    def id_livro(self, posicao):
+        return int(self.ids[posicao])
+
+    def tem_colunas(self, colunas):
+        return all(coluna in COLUNAS for coluna in colunas)
+
+    def linhas(self, posicoes, colunas):
+        # Tuplas com os valores das colunas pedidas (nomes das colunas no banco) para os
+        # livros das posições informadas, com os mesmos tipos do SQLAlchemy.
+        valores = [self._valores(coluna, posicoes) for coluna in colunas]
+        return list(zip(*valores))
+
+    def _valores(self, coluna, posicoes):
+        if coluna == "id":
+            return self.ids[posicoes].tolist()
+        if coluna in self._codificadas:
+            codigos, vocabulario = self._codificadas[coluna]
+            return [vocabulario[codigo] for codigo in codigos[posicoes].tolist()]
+        if coluna in self._textos:
+            lista = self._textos[coluna]
+            return [lista[posicao] for posicao in posicoes.tolist()]
+
+        array, nulos = self._numericas[coluna]
+        valores = array[posicoes].tolist()
+        if coluna == "em_estoque":
+            valores = [bool(valor) for valor in valores]
+        if nulos is not None:
+            valores = [None if nulo else valor for valor, nulo in zip(valores, nulos[posicoes].tolist())]
+        return valores
+
+
+def carregar(engine):
+    # Lê a tabela 'livros' e a versão do catálogo. A versão é lida antes e depois dos
+    # livros: se uma ingestão gravou no meio da leitura, a carga é repetida.
+    for _ in range(TENTATIVAS_CARGA):
+        with engine.connect() as conexao:
+            versao = versao_catalogo(conexao)
+            linhas = conexao.execute(CONSULTA).all()
+            if versao_catalogo(conexao) == versao:
+                return CatalogoColunar(versao, linhas)
+    return None
+
+
+class InstantaneoCatalogo:
+    # Guarda o catálogo colunar da versão atual e o remonta, em uma thread à parte,
+    # quando a versão do catálogo muda. A troca é só a atribuição da referência: quem
+    # já obteve o catálogo anterior termina a consulta com ele.
+    def __init__(self, engine):
+        self.engine = engine
+        self.atual = None
+        self.tempo_carga = None
+        self._trava = threading.Lock()
+        self._carregando = False
+
+    def obter(self, versao):
+        # O catálogo da versão pedida, ou None enquanto ele ainda está sendo montado.
+        atual = self.atual
+        if atual is not None and atual.versao == versao:
+            return atual
+        with self._trava:
+            if self._carregando:
+                return None
+            self._carregando = True
+        threading.Thread(target=self._recarregar, daemon=True).start()
+        return None
+
+    def _recarregar(self):
+        try:
+            inicio = time.perf_counter()
+            novo = carregar(self.engine)
+            if novo is not None:
+                self.tempo_carga = time.perf_counter() - inicio
+                self.atual = novo
+        finally:
+            with self._trava:
+                self._carregando = False
+
+    def aguardar(self, versao, tempo_maximo=60.0):
+        # Espera o catálogo da versão pedida ficar pronto (usado no aquecimento e nos benchmarks).
+        limite = time.perf_counter() + tempo_maximo
+        while time.perf_counter() < limite:
+            atual = self.obter(versao)
+            if atual is not None:
+                return atual
+            time.sleep(0.01)
+        return None
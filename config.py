@@ -1,10 +1,61 @@
+import os
+
 SECRET_KEY = 'CHAVE SECRETA'
 CACHE_TYPE = 'simple'
 SWAGGER = {
     'title': 'Catalogo de Livrso - Techchallenge FIAP',
     'uiversion': 3
 }
+# Arquivos da interface do Swagger UI servida em /apidocs (a especificação vem de apispec.json,
+# gerado por 'python gerar_apispec.py').
+SWAGGER_UI_URL = 'https://cdn.jsdelivr.net/npm/swagger-ui-dist@3'
 
-SQLALCHEMY_DATABASE_URI = 'sqlite:///base.db'
+# DATABASE_URL permite apontar a API para outro banco (ex: nos benchmarks).
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///base.db')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-JWT_SECRET_KEY = 'jwt-secret'
\ No newline at end of file
+
+# Pool de conexões: cada requisição em andamento usa uma conexão. Com o SQLite em modo
+# WAL (ver banco.py) as leituras acontecem em paralelo, inclusive durante a ingestão.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 10,
+}
+JWT_SECRET_KEY = 'jwt-secret'
+
+# Paginação por cursor das listas de livros
+LIMITE_PADRAO_PAGINA = 100
+LIMITE_MAXIMO_PAGINA = 1000
+
+# Livros lidos do banco por lote nas respostas em streaming
+TAMANHO_LOTE_STREAMING = 1000
+
+# Sugestões de títulos retornadas por /api/v1/books/suggest (padrão e máximo de 'limit')
+LIMITE_PADRAO_SUGESTOES = 10
+LIMITE_MAXIMO_SUGESTOES = 50
+
+# Máximo de IDs aceitos por requisição em /api/v1/books/batch
+LIMITE_IDS_LOTE = 5000
+
+# Cache das respostas da API: 'simple' (memória do processo), 'sqlite' (arquivo local
+# compartilhado entre processos, CACHE_ARQUIVO_SQLITE na pasta 'instance') ou 'null'
+CACHE_LIMITE_BYTES = 64 * 1024 * 1024
+CACHE_LIMITE_ITENS = 10000
+CACHE_ARQUIVO_SQLITE = 'cache_respostas.db'
+
+# Livros com o JSON já serializado guardados em memória (serializacao.py); ao atingir o
+# limite o cache é esvaziado e volta a ser preenchido pelas próximas respostas.
+SERIALIZACAO_LIMITE_ITENS = 200000
+
+# Métricas por requisição expostas em /metrics. Com METRICAS_LIMITE_LENTA_MS (em ms), as
+# requisições mais lentas são registradas no log 'livros.lentas' com os comandos SQL.
+METRICAS_ATIVAS = True
+METRICAS_LIMITE_LENTA_MS = None
+
+# Catálogo em memória (catalogo_colunar.py, requer NumPy) para as listas paginadas de
+# /api/v1/books: filtros, ordenação e paginação vetorizados, sem consultar o banco.
+CATALOGO_EM_MEMORIA = os.environ.get('CATALOGO_EM_MEMORIA', '0') == '1'
+
+# Com o banco desatualizado (ou inacessível), segundos até a API verificá-lo de novo;
+# nesse intervalo as rotas do catálogo respondem 503 sem consultar o banco.
+VERIFICACAO_BANCO_INTERVALO_S = 30
@@ -0,0 +1,310 @@
+# Camada de extração do HTML do 'books.toscrape.com'.
+#
+# O mesmo resultado (listas e dicionários simples) pode ser produzido por três
+# analisadores diferentes, escolhidos pelo que estiver instalado:
+#   - 'selectolax' (lexbor) e 'lxml': analisadores em C, muito mais rápidos;
+#   - 'bs4': o BeautifulSoup com 'html.parser', caminho original do projeto e referência.
+#
+# Em todos eles cada página é percorrida uma única vez: só o <h1>, os
+# 'article.product_pod' da grade de produtos e a paginação ('li.next' e 'li.current')
+# são lidos, e cada livro é montado de uma vez. Na página de um livro (etapa opcional
+# de detalhes da ingestão), só a descrição e a tabela "Product Information".
+#
+# Para conferir que os analisadores rápidos produzem exatamente a mesma saída do
+# BeautifulSoup nas páginas salvas em 'fixtures/':
+#   python extracao.py --verificar
+
+import argparse
+import os
+import re
+
+# 'BeautifulSoup' continua sendo o analisador de referência (e o único obrigatório).
+from bs4 import BeautifulSoup
+
+# Analisadores opcionais: usados apenas se estiverem instalados.
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+
+BACKENDS_DISPONIVEIS = [
+    nome for nome, modulo in (('selectolax', LexborHTMLParser), ('lxml', lxml)) if modulo is not None
+] + ['bs4']
+
+# O mais rápido disponível é o padrão.
+BACKEND_PADRAO = BACKENDS_DISPONIVEIS[0]
+
+PASTA_FIXTURES = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'fixtures')
+
+SELETOR_CATEGORIAS = 'div.side_categories ul.nav-list ul li a'
+
+
+def _total_paginas(texto):
+    # "Page 1 of 8" -> 8
+    encontrado = re.search(r'of\s+(\d+)', texto)
+    return int(encontrado.group(1)) if encontrado else 1
+
+
+def _avaliacao(classes):
+    # ["star-rating", "Three"] -> "Three"
+    return [c for c in classes if c != "star-rating"][0]
+
+
+def _quantidade_estoque(disponibilidade):
+    # "In stock (22 available)" -> 22; "Out of stock" -> 0
+    if disponibilidade is None:
+        return None
+    encontrado = re.search(r'(\d+)\s+available', disponibilidade)
+    if encontrado:
+        return int(encontrado.group(1))
+    return None if disponibilidade.strip().lower().startswith('in stock') else 0
+
+
+def _inteiro(texto):
+    return int(texto) if texto is not None and texto.strip().isdigit() else None
+
+
+def _detalhes(informacoes, descricao):
+    # informacoes: linhas da tabela "Product Information" (cabeçalho -> valor).
+    return {
+        'upc': informacoes.get('UPC'),
+        'descricao': descricao or None,
+        'quantidade_estoque': _quantidade_estoque(informacoes.get('Availability')),
+        'quantidade_avaliacoes': _inteiro(informacoes.get('Number of reviews')),
+    }
+
+
+def _resultado(categoria, livros, proxima, pagina_atual):
+    return {
+        'categoria': categoria,
+        'livros': livros,
+        'proxima': proxima,
+        'total_paginas': _total_paginas(pagina_atual) if pagina_atual is not None else 1,
+    }
+
+
+# =============================================================================
+# BEAUTIFULSOUP (REFERÊNCIA)
+# =============================================================================
+
+def _categorias_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+    return [cat['href'] for cat in soup.select(SELETOR_CATEGORIAS)]
+
+
+def _pagina_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+
+    livros = []
+    for livro in soup.find_all('article', class_="product_pod"):
+        livros.append({
+            'titulo': livro.find('h3').text.strip(),
+            'link': livro.find('h3').find('a')['href'],
+            'imagem': livro.find('img')['src'],
+            'preco': livro.find('p', class_='price_color').text.strip(),
+            'disponibilidade': livro.select_one('p.instock.availability').get_text(strip=True),
+            'avaliacao': _avaliacao(livro.find('p', class_='star-rating').get("class", [])),
+        })
+
+    next_button = soup.select_one('li.next > a')
+    pagina_atual = soup.select_one('li.current')
+
+    return _resultado(
+        soup.find('h1').text.strip(),
+        livros,
+        next_button['href'] if next_button else None,
+        pagina_atual.text if pagina_atual else None,
+    )
+
+
+def _livro_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+    informacoes = {
+        linha.find('th').text.strip(): linha.find('td').text.strip()
+        for linha in soup.select('table.table-striped tr')
+    }
+    descricao = soup.select_one('#product_description + p')
+    return _detalhes(informacoes, descricao.text.strip() if descricao else None)
+
+
+# =============================================================================
+# SELECTOLAX (LEXBOR)
+# =============================================================================
+
+def _categorias_selectolax(html):
+    arvore = LexborHTMLParser(html)
+    return [no.attributes['href'] for no in arvore.css(SELETOR_CATEGORIAS)]
+
+
+def _pagina_selectolax(html):
+    arvore = LexborHTMLParser(html)
+
+    livros = []
+    for livro in arvore.css('article.product_pod'):
+        livros.append({
+            'titulo': livro.css_first('h3').text().strip(),
+            'link': livro.css_first('h3 > a').attributes['href'],
+            'imagem': livro.css_first('img').attributes['src'],
+            'preco': livro.css_first('p.price_color').text().strip(),
+            'disponibilidade': livro.css_first('p.instock.availability').text(separator='', strip=True),
+            'avaliacao': _avaliacao(livro.css_first('p.star-rating').attributes.get('class', '').split()),
+        })
+
+    next_button = arvore.css_first('li.next > a')
+    pagina_atual = arvore.css_first('li.current')
+
+    return _resultado(
+        arvore.css_first('h1').text().strip(),
+        livros,
+        next_button.attributes['href'] if next_button else None,
+        pagina_atual.text() if pagina_atual else None,
+    )
+
+
+def _livro_selectolax(html):
+    arvore = LexborHTMLParser(html)
+    informacoes = {
+        linha.css_first('th').text().strip(): linha.css_first('td').text().strip()
+        for linha in arvore.css('table.table-striped tr')
+    }
+    descricao = arvore.css_first('#product_description + p')
+    return _detalhes(informacoes, descricao.text().strip() if descricao else None)
+
+
+# =============================================================================
+# LXML
+# =============================================================================
+
+def _classe(nome):
+    # Equivalente em XPath ao seletor CSS '.nome'.
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {nome} ')"
+
+
+XPATH_CATEGORIAS = f"//div[{_classe('side_categories')}]//ul[{_classe('nav-list')}]//ul//li//a"
+XPATH_LIVROS = f"//article[{_classe('product_pod')}]"
+XPATH_PRECO = f".//p[{_classe('price_color')}]"
+XPATH_ESTOQUE = f".//p[{_classe('instock')} and {_classe('availability')}]"
+XPATH_AVALIACAO = f".//p[{_classe('star-rating')}]"
+XPATH_PROXIMA = f"//li[{_classe('next')}]/a"
+XPATH_PAGINA_ATUAL = f"//li[{_classe('current')}]"
+XPATH_INFORMACOES = f"//table[{_classe('table-striped')}]//tr"
+# Equivalente ao seletor CSS '#product_description + p' (o elemento seguinte, se for um <p>).
+XPATH_DESCRICAO = "//*[@id='product_description']/following-sibling::*[1][self::p]"
+
+
+def _texto_sem_espacos(elemento):
+    # Equivalente a 'get_text(strip=True)' do BeautifulSoup.
+    return ''.join(parte.strip() for parte in elemento.itertext())
+
+
+def _categorias_lxml(html):
+    arvore = lxml.html.fromstring(html)
+    return [a.get('href') for a in arvore.xpath(XPATH_CATEGORIAS)]
+
+
+def _pagina_lxml(html):
+    arvore = lxml.html.fromstring(html)
+
+    livros = []
+    for livro in arvore.xpath(XPATH_LIVROS):
+        livros.append({
+            'titulo': livro.find('.//h3').text_content().strip(),
+            'link': livro.find('.//h3/a').get('href'),
+            'imagem': livro.find('.//img').get('src'),
+            'preco': livro.xpath(XPATH_PRECO)[0].text_content().strip(),
+            'disponibilidade': _texto_sem_espacos(livro.xpath(XPATH_ESTOQUE)[0]),
+            'avaliacao': _avaliacao(livro.xpath(XPATH_AVALIACAO)[0].get('class', '').split()),
+        })
+
+    next_button = arvore.xpath(XPATH_PROXIMA)
+    pagina_atual = arvore.xpath(XPATH_PAGINA_ATUAL)
+
+    return _resultado(
+        arvore.find('.//h1').text_content().strip(),
+        livros,
+        next_button[0].get('href') if next_button else None,
+        pagina_atual[0].text_content() if pagina_atual else None,
+    )
+
+
+def _livro_lxml(html):
+    arvore = lxml.html.fromstring(html)
+    informacoes = {
+        linha.find('.//th').text_content().strip(): linha.find('.//td').text_content().strip()
+        for linha in arvore.xpath(XPATH_INFORMACOES)
+    }
+    descricao = arvore.xpath(XPATH_DESCRICAO)
+    return _detalhes(informacoes, descricao[0].text_content().strip() if descricao else None)
+
+
+_EXTRATORES = {
+    'selectolax': (_categorias_selectolax, _pagina_selectolax, _livro_selectolax),
+    'lxml': (_categorias_lxml, _pagina_lxml, _livro_lxml),
+    'bs4': (_categorias_bs4, _pagina_bs4, _livro_bs4),
+}
+
+
+def _extratores(backend):
+    backend = backend or BACKEND_PADRAO
+    if backend not in BACKENDS_DISPONIVEIS:
+        raise ValueError(f"Analisador '{backend}' indisponível. Opções: {', '.join(BACKENDS_DISPONIVEIS)}")
+    return _EXTRATORES[backend]
+
+
+def extrair_categorias(html, url, backend=None):
+    # Links de categorias da barra lateral, já com a URL completa.
+    return [url + href for href in _extratores(backend)[0](html)]
+
+
+def extrair_pagina_categoria(html, backend=None):
+    # Nome da categoria, livros da grade e paginação de uma página de categoria.
+    return _extratores(backend)[1](html)
+
+
+def extrair_pagina_livro(html, backend=None):
+    # UPC, descrição, quantidade em estoque e de avaliações da página de um livro.
+    return _extratores(backend)[2](html)
+
+
+def _extrair_fixture(nome, html, backend):
+    # As páginas de livro salvas começam com 'livro_'; as demais são de categoria.
+    if nome.startswith('livro_'):
+        return extrair_pagina_livro(html, backend)
+    return extrair_categorias(html, '', backend), extrair_pagina_categoria(html, backend)
+
+
+def verificar_fixtures(pasta=PASTA_FIXTURES):
+    # Compara a saída de cada analisador disponível com a do BeautifulSoup.
+    divergencias = 0
+    for nome in sorted(os.listdir(pasta)):
+        if not nome.endswith('.html'):
+            continue
+        with open(os.path.join(pasta, nome), encoding='utf-8') as arquivo:
+            html = arquivo.read()
+
+        referencia = _extrair_fixture(nome, html, 'bs4')
+        for backend in BACKENDS_DISPONIVEIS:
+            resultado = _extrair_fixture(nome, html, backend)
+            situacao = 'ok' if resultado == referencia else 'DIVERGENTE'
+            divergencias += resultado != referencia
+            resumo = f"UPC {resultado['upc']}" if isinstance(resultado, dict) else f"{len(resultado[1]['livros']):>3} livros"
+            print(f"{nome:<40} {backend:<12} {resumo}  {situacao}")
+    return divergencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Camada de extração do HTML do 'books.toscrape.com'.")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Confere se todos os analisadores produzem a mesma saída nas fixtures.")
+    args = parser.parse_args()
+
+    if args.verificar:
+        print(f"Analisadores disponíveis: {', '.join(BACKENDS_DISPONIVEIS)}")
+        raise SystemExit(1 if verificar_fixtures() else 0)
+    parser.print_help()
@@ -0,0 +1,55 @@
+# Gera a especificação OpenAPI (Swagger 2.0) da API a partir das docstrings YAML das
+# rotas de livros.py e a grava em 'apispec.json', servido pela própria API em
+# '/apispec_1.json' e usado pelo Swagger UI em '/apidocs/'.
+#
+# O flasgger só é importado aqui: a API em produção lê o arquivo pronto, sem analisar o
+# YAML de todas as rotas a cada partida. Depois de alterar a docstring de uma rota:
+#   python gerar_apispec.py
+# Para conferir (ex: na integração contínua) que o arquivo está em dia com as rotas:
+#   python gerar_apispec.py --verificar
+
+import argparse
+import json
+
+from flasgger import Swagger
+
+import livros
+
+# Rotas da própria documentação, que não entram na especificação.
+ROTAS_DOCUMENTACAO = {"especificacao_api", "documentacao_api"}
+
+
+def gerar_especificacao():
+    configuracao = dict(Swagger.DEFAULT_CONFIG)
+    configuracao["specs"] = [dict(
+        Swagger.DEFAULT_CONFIG["specs"][0],
+        rule_filter=lambda regra: regra.endpoint not in ROTAS_DOCUMENTACAO,
+    )]
+    # A interface e as rotas do flasgger não são usadas: só a geração da especificação.
+    configuracao.update(swagger_ui=False, specs_route=None)
+    swagger = Swagger(livros.app, config=configuracao)
+    with livros.app.test_request_context():
+        return swagger.get_apispecs("apispec_1")
+
+
+def serializar(especificacao):
+    return json.dumps(especificacao, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o arquivo apispec.json a partir das rotas de livros.py.")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Só confere se o apispec.json gravado corresponde às rotas atuais.")
+    args = parser.parse_args()
+
+    conteudo = serializar(gerar_especificacao())
+    if args.verificar:
+        with open(livros.ARQUIVO_APISPEC, encoding='utf-8') as arquivo:
+            em_dia = arquivo.read() == conteudo
+        print("apispec.json em dia com as rotas." if em_dia else
+              "apispec.json desatualizado: execute 'python gerar_apispec.py'.")
+        raise SystemExit(0 if em_dia else 1)
+
+    with open(livros.ARQUIVO_APISPEC, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(conteudo)
+    print(f"Especificação gravada em {livros.ARQUIVO_APISPEC} ({len(conteudo)} bytes).")
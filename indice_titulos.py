@@ -0,0 +1,204 @@
+# Índice de prefixos dos títulos, para as sugestões de '/api/v1/books/suggest'.
+#
+# Os títulos são normalizados (sem acentos, em minúsculas, só as palavras separadas por
+# um espaço) e cada livro entra no índice uma vez para cada palavra do título, com o
+# texto a partir dela: "It's Only the Himalayas" -> "it s only the himalayas", ...,
+# "himalayas". Essas chaves ficam em listas ordenadas, e os livros cujo título tem uma
+# palavra começando pelo texto digitado formam um intervalo contínuo, achado por busca
+# binária ('bisect').
+#
+# Há uma lista por nota (5 a 1, e os livros sem nota) e, dentro de cada nota, uma para
+# o começo do título e outra para as demais palavras. Percorrendo as listas nessa ordem,
+# os primeiros livros encontrados já são os de maior nota, sem ordenar os resultados:
+# uma consulta custa algumas buscas binárias mais os 'limite' livros devolvidos.
+#
+# O índice é montado uma vez a partir da tabela 'livros' e, a cada nova versão do
+# catálogo, recebe só os livros alterados ou removidos depois da última sequência lida
+# (ver 'Feed de alterações' em banco.py).
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import text
+
+from banco import ultima_sequencia
+
+# Caracteres guardados de cada chave; consultas mais longas são conferidas no título.
+COMPRIMENTO_CHAVE = 24
+
+# Notas em ordem de prioridade (None: livros sem nota).
+NOTAS = (5, 4, 3, 2, 1, None)
+
+# Acima desta quantidade de livros alterados, o índice é montado de novo em vez de
+# atualizado: cada inserção em uma lista ordenada desloca os itens seguintes, e o custo
+# das duas opções cresce igualmente com o tamanho do catálogo.
+MAXIMO_ALTERACOES_INCREMENTAIS = 2000
+
+MAIOR_CARACTERE = chr(0x10FFFF)
+
+PALAVRA = re.compile(r"\w+")
+
+CONSULTA_LIVROS = text("SELECT id, titulo, nota, sequencia FROM livros")
+CONSULTA_ALTERADOS = text("SELECT id, titulo, nota, sequencia FROM livros WHERE sequencia > :sequencia")
+CONSULTA_REMOVIDOS = text("SELECT id, sequencia FROM livros_removidos WHERE sequencia > :sequencia")
+
+
+def normalizar(texto):
+    # "Noah’s Ark: Émile" -> "noah s ark emile"
+    texto = texto or ""
+    if not texto.isascii():
+        texto = "".join(
+            caractere for caractere in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(caractere)
+        )
+    return " ".join(PALAVRA.findall(texto.casefold()))
+
+
+def _chaves(normalizado):
+    # Uma chave para cada palavra do título normalizado; a primeira é o começo do título.
+    chaves = []
+    inicio = 0
+    while True:
+        chaves.append(normalizado[inicio:inicio + COMPRIMENTO_CHAVE])
+        inicio = normalizado.find(" ", inicio) + 1
+        if not inicio:
+            return chaves
+
+
+def _listas(nota):
+    # Posições das listas (de chaves e de Ids) de um livro com a nota informada: a do
+    # começo do título e a das demais palavras.
+    posicao = NOTAS.index(nota if nota in NOTAS else None) * 2
+    return posicao, posicao + 1
+
+
+class IndiceTitulos:
+    def __init__(self):
+        self.versao = None
+        self.sequencia = 0
+        # Listas ordenadas de chaves, e os Ids na mesma posição.
+        self._chaves = [[] for _ in range(len(NOTAS) * 2)]
+        self._ids = [[] for _ in range(len(NOTAS) * 2)]
+        # Id -> (título, nota, título normalizado)
+        self._livros = {}
+        self._trava = threading.Lock()
+        self._sincronizacao = threading.Lock()
+
+    def __len__(self):
+        return len(self._livros)
+
+    # ---- consulta ----------------------------------------------------------------
+
+    def consultar(self, texto, limite):
+        # Até 'limite' livros (Id, título, nota) com uma palavra do título começando por
+        # 'texto' (ou com o título contendo 'texto' a partir de uma palavra), por nota.
+        procurado = normalizar(texto)
+        if not procurado:
+            return []
+        chave = procurado[:COMPRIMENTO_CHAVE]
+        conferir = len(procurado) > COMPRIMENTO_CHAVE
+        resultado = []
+        vistos = set()
+        with self._trava:
+            for chaves, ids in zip(self._chaves, self._ids):
+                inicio = bisect_left(chaves, chave)
+                fim = bisect_left(chaves, chave + MAIOR_CARACTERE, inicio)
+                for posicao in range(inicio, fim):
+                    id_livro = ids[posicao]
+                    if id_livro in vistos:
+                        continue
+                    titulo, nota, normalizado = self._livros[id_livro]
+                    if conferir and not (normalizado.startswith(procurado) or " " + procurado in normalizado):
+                        continue
+                    vistos.add(id_livro)
+                    resultado.append((id_livro, titulo, nota))
+                    if len(resultado) >= limite:
+                        return resultado
+        return resultado
+
+    # ---- atualização -------------------------------------------------------------
+
+    def sincronizar(self, engine, versao):
+        # Deixa o índice na versão informada do catálogo: na primeira vez lê todos os
+        # livros; depois, só as alterações desde a última sequência lida.
+        if self.versao == versao:
+            return
+        with self._sincronizacao:
+            if self.versao == versao:
+                return
+            with engine.connect() as conexao:
+                if self.versao is None or not self._aplicar_alteracoes(conexao):
+                    self._montar(conexao)
+            self.versao = versao
+
+    def _montar(self, conexao):
+        # As chaves de todos os livros são ordenadas de uma vez e trocadas pelas atuais.
+        sequencia = ultima_sequencia(conexao)
+        livros = {}
+        entradas = [[] for _ in self._chaves]
+        for id_livro, titulo, nota, _ in conexao.execute(CONSULTA_LIVROS):
+            normalizado = normalizar(titulo)
+            livros[id_livro] = (titulo, nota, normalizado)
+            no_inicio, nas_palavras = _listas(nota)
+            primeira, *demais = _chaves(normalizado)
+            entradas[no_inicio].append((primeira, id_livro))
+            entradas[nas_palavras].extend((chave, id_livro) for chave in demais)
+        chaves, ids = [], []
+        for lista in entradas:
+            lista.sort()
+            chaves.append([chave for chave, _ in lista])
+            ids.append([id_livro for _, id_livro in lista])
+        with self._trava:
+            self._chaves, self._ids, self._livros = chaves, ids, livros
+            self.sequencia = sequencia
+
+    def _aplicar_alteracoes(self, conexao):
+        # Livros gravados ou removidos depois da última sequência lida. Devolve False se
+        # forem muitos (o índice deve ser montado de novo).
+        parametros = {"sequencia": self.sequencia}
+        alterados = conexao.execute(CONSULTA_ALTERADOS, parametros).all()
+        removidos = conexao.execute(CONSULTA_REMOVIDOS, parametros).all()
+        if len(alterados) + len(removidos) > MAXIMO_ALTERACOES_INCREMENTAIS:
+            return False
+
+        # Um livro por vez, para as consultas não esperarem a atualização inteira.
+        for id_livro, _ in removidos:
+            with self._trava:
+                self._remover(id_livro)
+        for id_livro, titulo, nota, _ in alterados:
+            with self._trava:
+                self._remover(id_livro)
+                self._adicionar(id_livro, titulo, nota)
+        self.sequencia = max([self.sequencia] + [linha[-1] for linha in alterados + removidos])
+        return True
+
+    def _adicionar(self, id_livro, titulo, nota):
+        normalizado = normalizar(titulo)
+        self._livros[id_livro] = (titulo, nota, normalizado)
+        no_inicio, nas_palavras = _listas(nota)
+        for posicao_chave, chave in enumerate(_chaves(normalizado)):
+            lista = nas_palavras if posicao_chave else no_inicio
+            chaves, ids = self._chaves[lista], self._ids[lista]
+            # Mesma ordem da montagem: por chave e, na mesma chave, por Id.
+            posicao = bisect_left(chaves, chave)
+            fim = bisect_right(chaves, chave, posicao)
+            while posicao < fim and ids[posicao] < id_livro:
+                posicao += 1
+            chaves.insert(posicao, chave)
+            ids.insert(posicao, id_livro)
+
+    def _remover(self, id_livro):
+        livro = self._livros.pop(id_livro, None)
+        if livro is None:
+            return
+        _, nota, normalizado = livro
+        no_inicio, nas_palavras = _listas(nota)
+        for posicao_chave, chave in enumerate(_chaves(normalizado)):
+            lista = nas_palavras if posicao_chave else no_inicio
+            chaves, ids = self._chaves[lista], self._ids[lista]
+            posicao = bisect_left(chaves, chave)
+            while ids[posicao] != id_livro:
+                posicao += 1
+            del chaves[posicao]
+            del ids[posicao]
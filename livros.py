@@ -1,14 +1,25 @@
-from operator import or_
-from pydoc import text
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import (
-    JWTManager, create_access_token, jwt_required, get_jwt_identity
+    JWTManager, create_access_token, jwt_required
 )
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from flasgger import Swagger
+from sqlalchemy import exc
+from functools import lru_cache, wraps
+from urllib.parse import urlencode
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+from banco import esquema_pendente, expressao_busca, versao_catalogo, configurar_sqlite
+from cache_respostas import criar_cache
+from indice_titulos import IndiceTitulos
+from metricas import instrumentar, metricas, serializando
+from serializacao import SerializadorLivros
+import serializacao
 
 
 # Inicialização da aplicação
@@ -19,7 +30,6 @@ app.config.from_object('config')
 # Inicialização de extensões
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
-swagger = Swagger(app)
 
 from flask import current_app
 
@@ -31,6 +41,41 @@ class Livros(db.Model):
     Disponibilidade = db.Column(db.String , nullable=False)
     Categoria = db.Column(db.String , nullable=False)
     Imagem = db.Column(db.String , nullable=False)
+    PrecoCentavos = db.Column("preco_centavos", db.Integer, index=True)
+    Nota = db.Column("nota", db.Integer, index=True)
+    EmEstoque = db.Column("em_estoque", db.Boolean, index=True)
+    CategoriaId = db.Column("categoria_id", db.Integer, db.ForeignKey("categorias.id"), index=True)
+    CriadoEm = db.Column("criado_em", db.DateTime)
+    AtualizadoEm = db.Column("atualizado_em", db.DateTime)
+    Sequencia = db.Column("sequencia", db.Integer, index=True)
+    Upc = db.Column("upc", db.String)
+    Descricao = db.Column("descricao", db.Text)
+    QuantidadeEstoque = db.Column("quantidade_estoque", db.Integer)
+    QuantidadeAvaliacoes = db.Column("quantidade_avaliacoes", db.Integer)
+
+class LivrosRemovidos(db.Model):
+    __tablename__ = "livros_removidos"
+    Id = db.Column("id", db.Integer, primary_key=True)
+    Titulo = db.Column("titulo", db.String)
+    CategoriaId = db.Column("categoria_id", db.Integer)
+    Sequencia = db.Column("sequencia", db.Integer, nullable=False, index=True)
+    RemovidoEm = db.Column("removido_em", db.DateTime)
+
+class LivrosSemelhantes(db.Model):
+    __tablename__ = "livros_semelhantes"
+    LivroId = db.Column("livro_id", db.Integer, primary_key=True)
+    Posicao = db.Column("posicao", db.Integer, primary_key=True)
+    SemelhanteId = db.Column("semelhante_id", db.Integer, nullable=False)
+    Similaridade = db.Column("similaridade", db.Float, nullable=False)
+
+class Categorias(db.Model):
+    __tablename__ = "categorias"
+    Id = db.Column(db.Integer, primary_key=True)
+    Nome = db.Column(db.String, unique=True, nullable=False)
+    QuantidadeLivros = db.Column("quantidade_livros", db.Integer, nullable=False, default=0)
+    PrecoMinimoCentavos = db.Column("preco_minimo_centavos", db.Integer)
+    PrecoMaximoCentavos = db.Column("preco_maximo_centavos", db.Integer)
+    PrecoMedioCentavos = db.Column("preco_medio_centavos", db.Float)
 
 class Usuario(db.Model):
     Id = db.Column(db.Integer, primary_key=True)
@@ -38,6 +83,578 @@ class Usuario(db.Model):
     senha = db.Column(db.String(120), nullable=False)
 
 
+# Antes da primeira conexão, registra os PRAGMAs compartilhados com a ingestão (ver banco.py).
+# Nada aqui abre o banco: a importação do módulo (a partida a frio no Vercel) fica leve.
+with app.app_context():
+    configurar_sqlite(db.engine)
+    # Latência por rota, comandos SQL, serialização e tamanho das respostas (ver /metrics).
+    if app.config["METRICAS_ATIVAS"]:
+        instrumentar(app, db.engine)
+
+
+# Estado do banco, verificado só com leituras na primeira requisição que o usa (não há
+# nada na importação nem em um 'before_request': a partida a frio fica leve). A API não
+# grava no banco (no Vercel o arquivo fica em um sistema de arquivos somente leitura): as
+# migrações e o índice de busca textual ficam com a ingestão ('python alimenta_base.py'
+# ou só 'python alimenta_base.py --migrar'). Com migrações pendentes, ou se o banco não
+# abrir, as rotas do catálogo respondem 503; sem o índice FTS5, a busca usa o filtro por
+# substring.
+_estado_banco = {}
+_verificacao_banco = threading.Lock()
+
+
+def _banco_verificado():
+    # Em dia, o resultado vale até o fim do processo. Senão (inclusive quando a verificação
+    # falha), vale por VERIFICACAO_BANCO_INTERVALO_S segundos: uma ingestão pode migrar o
+    # banco com a API no ar, mas as requisições nesse intervalo não repetem a verificação.
+    if _estado_banco.get("em_dia") or time.monotonic() < _estado_banco.get("proxima_verificacao", 0):
+        return _estado_banco
+    with _verificacao_banco:
+        if _estado_banco.get("em_dia") or time.monotonic() < _estado_banco.get("proxima_verificacao", 0):
+            return _estado_banco
+        try:
+            with db.engine.connect() as conexao:
+                pendente = esquema_pendente(conexao)
+                busca_textual = _existe_busca_textual(conexao)
+            falha = None
+        except exc.OperationalError as erro:
+            # Ex: "unable to open database file".
+            pendente, busca_textual, falha = set(), False, str(erro.orig)
+        _estado_banco.update(
+            pendente=pendente, busca_textual=busca_textual, falha=falha,
+            em_dia=not pendente and busca_textual and falha is None,
+            proxima_verificacao=time.monotonic() + app.config["VERIFICACAO_BANCO_INTERVALO_S"],
+        )
+    return _estado_banco
+
+
+def _existe_busca_textual(conexao):
+    try:
+        conexao.execute(db.text("SELECT rowid FROM livros_fts LIMIT 1")).all()
+        return True
+    except exc.OperationalError:
+        # Índice ainda não criado, ou SQLite sem FTS5 ("no such module").
+        return False
+
+
+class BancoIndisponivel(Exception):
+    pass
+
+
+@app.errorhandler(BancoIndisponivel)
+def trata_banco_indisponivel(erro):
+    return jsonify({"Erro": str(erro)}), 503
+
+
+def _exigir_esquema_atual():
+    estado = _banco_verificado()
+    if estado["falha"]:
+        raise BancoIndisponivel("Não foi possível abrir o banco de dados.")
+    if estado["pendente"]:
+        raise BancoIndisponivel(
+            "O banco ainda não foi migrado para esta versão da API: execute 'python alimenta_base.py --migrar'."
+        )
+
+
+# Cache das respostas de leitura do catálogo (ver cache_respostas.py).
+cache_respostas = criar_cache(app.config, app.instance_path)
+
+# JSON de cada livro já serializado, por (campos, Id, sequência) (ver serializacao.py).
+serializador_livros = SerializadorLivros(app.config["SERIALIZACAO_LIMITE_ITENS"])
+
+
+def leitura_do_catalogo(rota):
+    # Rotas de leitura do catálogo. Cada resposta é identificada por (versão do catálogo,
+    # rota, parâmetros, formato); uma ingestão incrementa a versão, invalidando todas.
+    #   - ETag forte derivado dessa chave: 'If-None-Match' igual responde 304 sem consultar
+    #     nem serializar os livros (a única leitura é a da versão do catálogo);
+    #   - corpo das respostas 200 guardado em cache_respostas.
+    @wraps(rota)
+    def envolvida(*args, **kwargs):
+        _exigir_esquema_atual()
+        # Só as leituras por GET dependem apenas da URL (um POST traz os dados no corpo).
+        if request.method != "GET":
+            return rota(*args, **kwargs)
+
+        # A versão fica na requisição para o catálogo em memória (ver _pagina_em_memoria).
+        g.versao_catalogo = versao_catalogo(db.session)
+        chave = "|".join([
+            str(g.versao_catalogo),
+            request.path,
+            urlencode(sorted(request.args.items(multi=True))),
+            "ndjson" if _prefere_ndjson() else "json",
+        ])
+        etag = hashlib.sha1(chave.encode()).hexdigest()
+
+        if request.if_none_match.contains_weak(etag):
+            resposta = Response(status=304)
+            _cabecalhos_de_leitura(resposta, etag)
+            return resposta
+
+        guardada = cache_respostas.obter(chave)
+        if guardada is not None:
+            status, mimetype, corpo = guardada
+            resposta = Response(corpo, status=status, mimetype=mimetype)
+            resposta.headers["X-Cache"] = "HIT"
+            _cabecalhos_de_leitura(resposta, etag)
+            return resposta
+
+        resposta = app.make_response(rota(*args, **kwargs))
+        if resposta.status_code != 200:
+            return resposta
+        # Respostas em streaming existem justamente para não montar o corpo em memória.
+        if not resposta.is_streamed:
+            cache_respostas.guardar(chave, resposta.status_code, resposta.mimetype, resposta.get_data())
+            resposta.headers["X-Cache"] = "MISS"
+        _cabecalhos_de_leitura(resposta, etag)
+        return resposta
+    return envolvida
+
+
+def _cabecalhos_de_leitura(resposta, etag):
+    resposta.set_etag(etag)
+    # O cliente pode guardar a resposta, mas deve revalidá-la (com o ETag) a cada uso.
+    resposta.headers["Cache-Control"] = "no-cache"
+    resposta.vary.add("Accept")
+
+
+# Campos públicos de um livro (nome na resposta -> coluna), usados na projeção 'fields='.
+CAMPOS_LIVRO = {
+    "id": Livros.Id,
+    "titulo": Livros.Titulo,
+    "Categoria": Livros.Categoria,
+    "preco": Livros.Preco,
+    "Avaliacao": Livros.Avaliacao,
+    "Disponibilidade": Livros.Disponibilidade,
+    "Imagem": Livros.Imagem,
+    "preco_centavos": Livros.PrecoCentavos,
+    "nota": Livros.Nota,
+    "em_estoque": Livros.EmEstoque,
+    "categoria_id": Livros.CategoriaId,
+    "sequencia": Livros.Sequencia,
+    # Da página de detalhe de cada livro (ingestão com '--detalhes'); nulos sem ela.
+    "upc": Livros.Upc,
+    "descricao": Livros.Descricao,
+    "quantidade_estoque": Livros.QuantidadeEstoque,
+    "quantidade_avaliacoes": Livros.QuantidadeAvaliacoes,
+}
+
+# Campos retornados quando 'fields=' não é informado (os numéricos só sob demanda).
+CAMPOS_PADRAO = ["id", "titulo", "Categoria", "preco", "Avaliacao", "Disponibilidade", "Imagem"]
+
+# Valores aceitos em 'sort=' (com '-' na frente para ordem decrescente).
+ORDENACOES = {
+    "id": Livros.Id,
+    "preco": Livros.PrecoCentavos,
+    "avaliacao": Livros.Nota,
+    "titulo": Livros.Titulo,
+}
+
+
+class ParametroInvalido(Exception):
+    pass
+
+
+@app.errorhandler(ParametroInvalido)
+def trata_parametro_invalido(erro):
+    return jsonify({"Erro": str(erro)}), 400
+
+
+# Maior valor de um INTEGER do SQLite (int64): IDs, cursores e sequências acima dele não
+# podem nem ser enviados ao banco ("Python int too large to convert to SQLite INTEGER").
+MAIOR_INTEIRO_SQLITE = 2 ** 63 - 1
+
+
+def _inteiro(nome, minimo=None, maximo=MAIOR_INTEIRO_SQLITE):
+    valor = request.args.get(nome)
+    if valor is None:
+        return None
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"O parâmetro '{nome}' deve ser um número inteiro")
+    if minimo is not None and valor < minimo:
+        raise ParametroInvalido(f"O parâmetro '{nome}' deve ser maior ou igual a {minimo}")
+    if valor > maximo:
+        raise ParametroInvalido(f"O parâmetro '{nome}' deve ser menor ou igual a {maximo}")
+    return valor
+
+
+def _campos_solicitados():
+    # fields=titulo,preco -> ["titulo", "preco"]; sem o parâmetro, todos os campos.
+    fields = request.args.get("fields")
+    if not fields:
+        return CAMPOS_PADRAO
+
+    campos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in CAMPOS_LIVRO]
+    if invalidos or not campos:
+        raise ParametroInvalido(
+            f"Campos inválidos em 'fields': {', '.join(invalidos)}. Opções: {', '.join(CAMPOS_LIVRO)}"
+        )
+    return campos
+
+
+# Maior preço aceito nos filtros, em libras: bem acima de qualquer livro e, em centavos,
+# dentro do INTEGER do SQLite (e do int64 do catálogo em memória).
+PRECO_MAXIMO_FILTRO = 10 ** 9
+
+
+def _preco_em_centavos(nome):
+    valor = request.args.get(nome)
+    if valor is None:
+        return None
+    try:
+        valor = float(valor)
+    except ValueError:
+        raise ParametroInvalido(f"O parâmetro '{nome}' deve ser um número (ex: 45.17)")
+    # Recusa também inf e nan, que não viram um número de centavos.
+    if not math.isfinite(valor) or abs(valor) > PRECO_MAXIMO_FILTRO:
+        raise ParametroInvalido(f"O parâmetro '{nome}' deve estar entre -{PRECO_MAXIMO_FILTRO} e {PRECO_MAXIMO_FILTRO}")
+    return round(valor * 100)
+
+
+def _valores_filtros_numericos():
+    # min_price/max_price (em libras), min_rating (1 a 5), in_stock e categoria_id
+    # validados; None para os filtros ausentes.
+    em_estoque = request.args.get("in_stock")
+    if em_estoque is not None:
+        if em_estoque.lower() not in ("1", "0", "true", "false"):
+            raise ParametroInvalido("O parâmetro 'in_stock' deve ser true ou false")
+        em_estoque = em_estoque.lower() in ("1", "true")
+
+    return {
+        "preco_minimo": _preco_em_centavos("min_price"),
+        "preco_maximo": _preco_em_centavos("max_price"),
+        "nota_minima": _inteiro("min_rating", minimo=1),
+        "em_estoque": em_estoque,
+        "categoria_id": _inteiro("categoria_id", minimo=1),
+    }
+
+
+def _filtros_numericos(valores):
+    # Os mesmos filtros aplicados no SQL sobre colunas numéricas indexadas.
+    filtros = []
+    if valores["preco_minimo"] is not None:
+        filtros.append(Livros.PrecoCentavos >= valores["preco_minimo"])
+    if valores["preco_maximo"] is not None:
+        filtros.append(Livros.PrecoCentavos <= valores["preco_maximo"])
+    if valores["nota_minima"] is not None:
+        filtros.append(Livros.Nota >= valores["nota_minima"])
+    if valores["em_estoque"] is not None:
+        filtros.append(Livros.EmEstoque == valores["em_estoque"])
+    if valores["categoria_id"] is not None:
+        filtros.append(Livros.CategoriaId == valores["categoria_id"])
+    return filtros
+
+
+def _ids_categorias(nome):
+    # Ids das categorias cujo nome contém o texto: a busca por trecho percorre só a
+    # tabela (pequena) de categorias e os livros são filtrados pelo índice de 'categoria_id'.
+    return db.select(Categorias.Id).where(Categorias.Nome.ilike(f"%{nome}%"))
+
+
+def _ordenacao_solicitada():
+    # sort=-preco -> (Livros.PrecoCentavos, True); sem o parâmetro (ou sort=id), None.
+    sort = request.args.get("sort")
+    if not sort or sort == "id":
+        return None
+    decrescente = sort.startswith("-")
+    coluna = ORDENACOES.get(sort.lstrip("-"))
+    if coluna is None:
+        raise ParametroInvalido(
+            f"Ordenação inválida em 'sort'. Opções: {', '.join(ORDENACOES)} (com '-' para decrescente)"
+        )
+    return coluna, decrescente
+
+
+def _ids_solicitados():
+    # IDs do lote: corpo JSON {"ids": [1, 2, 3]} no POST ou ?ids=1,2,3 no GET.
+    if request.method == "POST":
+        dados = request.get_json(silent=True)
+        ids = dados.get("ids") if isinstance(dados, dict) else None
+        if not isinstance(ids, list):
+            raise ParametroInvalido("Informe os IDs no corpo como {\"ids\": [1, 2, 3]}")
+    else:
+        ids = [i.strip() for i in request.args.get("ids", "").split(",") if i.strip()]
+
+    try:
+        ids = [_id_inteiro(i) for i in ids]
+    except ValueError:
+        raise ParametroInvalido("Os IDs devem ser números inteiros")
+    if any(abs(i) > MAIOR_INTEIRO_SQLITE for i in ids):
+        raise ParametroInvalido(f"Os IDs devem estar entre -{MAIOR_INTEIRO_SQLITE} e {MAIOR_INTEIRO_SQLITE}")
+    if not ids:
+        raise ParametroInvalido("Informe ao menos um ID")
+
+    limite = current_app.config["LIMITE_IDS_LOTE"]
+    if len(ids) > limite:
+        raise ParametroInvalido(f"No máximo {limite} IDs por requisição")
+    return ids
+
+
+def _id_inteiro(valor):
+    # Aceita 3 e "3"; recusa 3.5, true, null etc.
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValueError(valor)
+    return int(valor)
+
+
+def _livro_para_dict(linha, campos):
+    return {campo: getattr(linha, CAMPOS_LIVRO[campo].key) for campo in campos}
+
+
+def _versao_do_livro(linha):
+    return linha.Id, linha.Sequencia
+
+
+def _livros_json(linhas, campos):
+    # JSON de cada livro (linhas do ORM com Id e Sequencia), reaproveitando os já serializados.
+    return serializador_livros.fragmentos(linhas, campos, _versao_do_livro, lambda l: _livro_para_dict(l, campos))
+
+
+def _resposta_json(corpo):
+    # Resposta com o corpo já serializado, com a quebra de linha final do jsonify.
+    return Response(corpo + b"\n", mimetype="application/json")
+
+
+def _pagina_json(fragmentos, paginacao):
+    # {"livros": [...], "paginacao": {...}}, nessa ordem, como as chaves ordenadas do jsonify.
+    return _resposta_json(
+        b'{"livros":[' + b",".join(fragmentos) + b'],"paginacao":' + serializacao.dumps(paginacao) + b"}"
+    )
+
+
+def _prefere_ndjson():
+    return request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+
+def _quer_streaming():
+    # ?stream=1 ou 'Accept: application/x-ndjson' ativam a resposta em streaming.
+    return request.args.get("stream") in ("1", "true") or _prefere_ndjson()
+
+
+def _transmitir_livros(consulta, campos):
+    # Envia os livros à medida que são lidos do banco, em lotes de 'yield_per', sem
+    # montar a lista inteira em memória: o consumo de memória e o tempo até o primeiro
+    # byte não dependem do tamanho do catálogo.
+    tamanho_lote = current_app.config["TAMANHO_LOTE_STREAMING"]
+    ndjson = _prefere_ndjson()
+
+    def gerar():
+        lote = []
+        primeiro = True
+        if not ndjson:
+            yield b"["
+        for l in consulta.yield_per(tamanho_lote):
+            lote.append(l)
+            if len(lote) >= tamanho_lote:
+                yield _juntar(_livros_json(lote, campos), ndjson, primeiro)
+                lote = []
+                primeiro = False
+        if lote:
+            yield _juntar(_livros_json(lote, campos), ndjson, primeiro)
+        if not ndjson:
+            yield b"]"
+
+    if ndjson:
+        return Response(stream_with_context(gerar()), mimetype="application/x-ndjson")
+    # Array JSON enviado em partes (chunked), com o mesmo conteúdo da resposta sem streaming.
+    return Response(stream_with_context(gerar()), mimetype="application/json")
+
+
+def _juntar(lote, ndjson, primeiro):
+    if ndjson:
+        return b"\n".join(lote) + b"\n"
+    return (b"" if primeiro else b",") + b",".join(lote)
+
+
+def _codificar_cursor(valor, id_livro):
+    # Cursor opaco para ordenações diferentes do Id: (valor da ordenação, Id) em JSON/base64.
+    return base64.urlsafe_b64encode(json.dumps([valor, id_livro]).encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor):
+    try:
+        valor, id_livro = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if valor is not None and not isinstance(valor, (str, int, float)):
+            raise TypeError(valor)
+        id_livro = int(id_livro)
+        if any(isinstance(n, int) and abs(n) > MAIOR_INTEIRO_SQLITE for n in (valor, id_livro)):
+            raise ValueError(cursor)
+        return valor, id_livro
+    except (ValueError, TypeError):
+        raise ParametroInvalido("Cursor inválido em 'after'")
+
+
+def _depois_do_cursor(ordem, decrescente, valor, id_livro):
+    # Livros depois de (valor, Id) na ordenação. O SQLite põe os nulos (ex: preço que não
+    # pôde ser convertido) antes de todos os valores na ordem crescente e depois deles
+    # na decrescente; os empates, nulos inclusive, seguem pelo Id.
+    mesmo_valor = db.and_(ordem.is_(None) if valor is None else ordem == valor, Livros.Id > id_livro)
+    if valor is None:
+        return mesmo_valor if decrescente else db.or_(ordem.is_not(None), mesmo_valor)
+    if decrescente:
+        return db.or_(ordem < valor, mesmo_valor, ordem.is_(None))
+    return db.or_(ordem > valor, mesmo_valor)
+
+
+def _listar_livros(*filtros, ordem=None, juncao=None):
+    # Lista os livros que atendem aos filtros, selecionando apenas as colunas pedidas.
+    # Com 'limit' e/ou 'after' a lista é paginada por cursor (keyset): cada página é uma
+    # busca por índice a partir do último registro devolvido, sem OFFSET.
+    #   - ordem: expressão usada antes do Id na ordenação (ex: relevância da busca);
+    #            'sort=' tem prioridade sobre ela. Fora da ordenação por Id o cursor é opaco;
+    #   - juncao: (tabela, condição) a juntar à consulta (ex: resultados do FTS5).
+    campos = _campos_solicitados()
+    # Só as listas sem filtros de texto, junções ou relevância podem vir do catálogo em memória.
+    em_memoria = not filtros and juncao is None and ordem is None
+    numericos = _valores_filtros_numericos()
+    filtros = list(filtros) + _filtros_numericos(numericos)
+    decrescente = False
+    solicitada = _ordenacao_solicitada()
+    if solicitada is not None:
+        ordem, decrescente = solicitada
+
+    limite = _inteiro("limit", minimo=1)
+    if ordem is None:
+        cursor = _inteiro("after", minimo=0)
+    else:
+        cursor = request.args.get("after") or None
+
+    colunas = [CAMPOS_LIVRO[campo] for campo in campos]
+    for coluna in (Livros.Id, Livros.Sequencia):
+        if coluna not in colunas:
+            colunas.append(coluna)
+    if ordem is not None:
+        colunas.append(ordem.label("_ordem"))
+
+    consulta = db.session.query(*colunas)
+    if juncao is not None:
+        consulta = consulta.join(*juncao)
+    consulta = consulta.filter(*filtros)
+    if ordem is None:
+        consulta = consulta.order_by(Livros.Id)
+    else:
+        consulta = consulta.order_by(ordem.desc() if decrescente else ordem, Livros.Id)
+
+    if limite is None and cursor is None:
+        if _quer_streaming():
+            return _transmitir_livros(consulta, campos)
+        livros = consulta.all()
+        with serializando():
+            return _resposta_json(b"[" + b",".join(_livros_json(livros, campos)) + b"]")
+
+    limite = min(limite or current_app.config["LIMITE_PADRAO_PAGINA"], current_app.config["LIMITE_MAXIMO_PAGINA"])
+    if em_memoria:
+        pagina = _pagina_em_memoria(campos, numericos, limite, cursor)
+        if pagina is not None:
+            return pagina
+
+    if cursor is not None:
+        if ordem is None:
+            consulta = consulta.filter(Livros.Id > cursor)
+        else:
+            valor, id_livro = _decodificar_cursor(cursor)
+            consulta = consulta.filter(_depois_do_cursor(ordem, decrescente, valor, id_livro))
+
+    # Um registro a mais indica se existe próxima página.
+    livros = consulta.limit(limite + 1).all()
+    proximo_cursor = None
+    if len(livros) > limite:
+        ultimo = livros[limite - 1]
+        proximo_cursor = ultimo.Id if ordem is None else _codificar_cursor(ultimo._ordem, ultimo.Id)
+
+    with serializando():
+        return _pagina_json(_livros_json(livros[:limite], campos), {
+            "limite": limite,
+            "proximo_cursor": proximo_cursor,
+        })
+
+
+# Catálogo em memória (opcional, ver catalogo_colunar.py), criado na primeira listagem.
+_catalogo_em_memoria = {}
+
+
+def _catalogo_colunar():
+    # O catálogo colunar da versão atual, ou None (desligado, sem NumPy ou ainda carregando).
+    if not current_app.config["CATALOGO_EM_MEMORIA"]:
+        return None
+    instantaneo = _catalogo_em_memoria.get("instantaneo")
+    if instantaneo is None:
+        # Importado só quando ligado: o NumPy pesa na partida a frio.
+        import catalogo_colunar
+        if not catalogo_colunar.DISPONIVEL:
+            return None
+        instantaneo = _catalogo_em_memoria.setdefault("instantaneo", catalogo_colunar.InstantaneoCatalogo(db.engine))
+    versao = g.versao_catalogo if "versao_catalogo" in g else versao_catalogo(db.session)
+    return instantaneo.obter(versao)
+
+
+def _pagina_em_memoria(campos, numericos, limite, cursor):
+    # A mesma página de _listar_livros, calculada sobre o catálogo colunar; None quando
+    # ele não está disponível ou não responde a consulta (segue pelo SQL).
+    catalogo = _catalogo_colunar()
+    if catalogo is None:
+        return None
+    # Campos que o catálogo em memória não guarda (ex: 'descricao') seguem pelo SQL.
+    if not catalogo.tem_colunas(CAMPOS_LIVRO[campo].name.lower() for campo in campos):
+        return None
+
+    ordenacao = None
+    decrescente = False
+    if _ordenacao_solicitada() is not None:
+        sort = request.args["sort"]
+        ordenacao, decrescente = sort.lstrip("-"), sort.startswith("-")
+        if cursor is not None:
+            cursor = _decodificar_cursor(cursor)
+
+    posicoes = catalogo.consultar(numericos, limite, cursor, ordenacao, decrescente)
+    if posicoes is None:
+        return None
+
+    proximo_cursor = None
+    if len(posicoes) > limite:
+        ultimo = posicoes[limite - 1]
+        if ordenacao is None:
+            proximo_cursor = catalogo.id_livro(ultimo)
+        else:
+            proximo_cursor = _codificar_cursor(catalogo.valor_ordenacao(ordenacao, ultimo), catalogo.id_livro(ultimo))
+
+    # Id e sequência vão no fim de cada linha, para o cache de JSON dos livros.
+    colunas = [CAMPOS_LIVRO[campo].name.lower() for campo in campos] + ["id", "sequencia"]
+    with serializando():
+        fragmentos = serializador_livros.fragmentos(
+            catalogo.linhas(posicoes[:limite], colunas), campos,
+            lambda valores: (valores[-2], valores[-1]), lambda valores: dict(zip(campos, valores)),
+        )
+        return _pagina_json(fragmentos, {
+            "limite": limite,
+            "proximo_cursor": proximo_cursor,
+        })
+
+
+# Índice de prefixos dos títulos para as sugestões (ver indice_titulos.py), montado na
+# primeira sugestão e atualizado com as alterações de cada nova versão do catálogo.
+indice_titulos = IndiceTitulos()
+
+
+def _busca_textual_disponivel():
+    return _banco_verificado()["busca_textual"]
+
+
+def _resultados_busca_textual(categoria, titulo):
+    # Subconsulta com os Ids encontrados pelo FTS5 e a relevância (bm25) de cada um.
+    expressoes = [e for e in (expressao_busca(titulo, "titulo"), expressao_busca(categoria, "categoria")) if e]
+    if not expressoes:
+        return None
+    return db.text(
+        "SELECT rowid AS id, rank AS relevancia FROM livros_fts WHERE livros_fts MATCH :consulta"
+    ).bindparams(consulta=" OR ".join(f"({e})" for e in expressoes)).columns(
+        id=db.Integer, relevancia=db.Float
+    ).subquery("busca")
+
+
 @app.route("/registro", methods=["POST"])
 def registro_usuario():
     """
@@ -166,6 +783,7 @@ responses:
 
 @app.route("/api/v1/books", methods=["GET"])
 @jwt_required()
+@leitura_do_catalogo
 def busca_livros():
 
     """
@@ -176,10 +794,90 @@ def busca_livros():
     security:
     - Bearer: []
     summary: Retorna todos os livros disponíveis no catálogo
+    produces:
+      - application/json
+      - application/x-ndjson
     description: >
-      Endpoint que retorna a lista completa de livros do catálogo.  
-      Não requer parâmetros.
+      Endpoint que retorna a lista de livros do catálogo.  
+      Sem parâmetros, retorna a lista completa (com `stream=1` ou `Accept: application/x-ndjson`,
+      em streaming, lendo o banco em lotes).  
+      Com `limit` e/ou `after`, retorna uma página de livros ordenada por ID e o cursor da próxima página
+      no formato `{"livros": [...], "paginacao": {"limite": 100, "proximo_cursor": 100}}`.
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Quantidade máxima de livros por página
+        example: 100
+      - name: after
+        in: query
+        type: integer
+        required: false
+        description: Cursor da página (retorna os livros com ID maior que este valor)
+        example: 100
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Campos a retornar, separados por vírgula
+        example: id,titulo,preco
+      - name: stream
+        in: query
+        type: integer
+        required: false
+        description: >
+          Com 1, a lista completa é enviada em streaming (array JSON em partes).
+          Com o cabeçalho `Accept: application/x-ndjson`, é enviada um livro por linha (NDJSON).
+        example: 1
+      - name: min_price
+        in: query
+        type: number
+        required: false
+        description: Preço mínimo, em libras
+        example: 20.5
+      - name: max_price
+        in: query
+        type: number
+        required: false
+        description: Preço máximo, em libras
+        example: 45
+      - name: min_rating
+        in: query
+        type: integer
+        required: false
+        description: Avaliação mínima (1 a 5)
+        example: 4
+      - name: in_stock
+        in: query
+        type: boolean
+        required: false
+        description: Apenas livros em estoque (true) ou esgotados (false)
+        example: true
+      - name: categoria_id
+        in: query
+        type: integer
+        required: false
+        description: ID da categoria (ver `/api/v1/categories?detalhes=1`)
+        example: 3
+      - name: sort
+        in: query
+        type: string
+        required: false
+        enum: [id, -id, preco, -preco, avaliacao, -avaliacao, titulo, -titulo]
+        description: Ordenação (com '-' para decrescente)
+        example: -avaliacao
     responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
+      400:
+        description: Parâmetro inválido
+        schema:
+          type: object
+          properties:
+            Erro:
+              type: string
+              example: O parâmetro 'limit' deve ser um número inteiro
       200:
         description: Lista de livros retornada com sucesso
         schema:
@@ -211,26 +909,11 @@ def busca_livros():
                 example: "../../../../media/cache/27/a5/27a53d0bb95bdd88288eaf66c9230d7e.jpg"
     """
  
-    consulta = Livros.query  
-    livros = consulta.all()
-
-    return jsonify(
-        [
-            {
-                "id": l.Id,
-                "titulo": l.Titulo,
-                "Categoria": l.Categoria,
-                "preco": l.Preco,
-                "Avaliacao": l.Avaliacao,
-                "Disponibilidade": l.Disponibilidade,
-                "Imagem": l.Imagem
-            }
-            for l in  livros
-        ]
-    )
+    return _listar_livros()
 
-@app.route("/api/v1/books/<int:id_livro>", methods=["GET"])
+@app.route(f"/api/v1/books/<int(max={MAIOR_INTEIRO_SQLITE}):id_livro>", methods=["GET"])
 @jwt_required()
+@leitura_do_catalogo
 def busca_livro_id(id_livro):
     """
     Retorna o livro do catálogo com base no ID.
@@ -252,6 +935,8 @@ def busca_livro_id(id_livro):
         description: ID do livro a ser buscado
         example: 1
     responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
       200:
         description: Livro encontrado com sucesso
         schema:
@@ -290,19 +975,377 @@ def busca_livro_id(id_livro):
     """
 
     livro = Livros.query.get_or_404(id_livro)
-    return jsonify({
-        "id": livro.Id,
-        "titulo": livro.Titulo,
-        "Categoria": livro.Categoria,
-        "preco": livro.Preco,
-        "Avaliacao": livro.Avaliacao,
-        "Disponibilidade": livro.Disponibilidade,
-        "Imagem": livro.Imagem
-    })
+    with serializando():
+        return _resposta_json(_livros_json([livro], CAMPOS_PADRAO)[0])
+
+
+@app.route(f"/api/v1/books/<int(max={MAIOR_INTEIRO_SQLITE}):id_livro>/similar", methods=["GET"])
+@jwt_required()
+@leitura_do_catalogo
+def busca_livros_semelhantes(id_livro):
+    """
+    Retorna os livros mais parecidos com um livro.
+    ---
+    tags:
+      - Livros
+    security:
+      - Bearer: []
+    summary: Livros semelhantes (recomendações)
+    description: >
+      Os vizinhos de cada livro são calculados pela ingestão (`semelhantes.py`), comparando
+      o título (palavras e trechos de palavras, com TF-IDF), a categoria, o preço e a
+      avaliação. A rota só lê os vizinhos já gravados, em ordem de similaridade (de 0 a 1).  
+      A lista vem vazia se os vizinhos ainda não foram calculados (ingestão sem o NumPy).
+    parameters:
+      - name: id_livro
+        in: path
+        type: integer
+        required: true
+        description: ID do livro
+        example: 1
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Quantidade máxima de livros (até 10)
+        example: 5
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Campos dos livros a retornar, separados por vírgula
+        example: id,titulo,preco
+    responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
+      200:
+        description: Livros semelhantes, do mais parecido para o menos parecido
+        schema:
+          type: object
+          properties:
+            id:
+              type: integer
+              example: 1
+            semelhantes:
+              type: array
+              items:
+                type: object
+                properties:
+                  similaridade:
+                    type: number
+                    example: 0.7312
+                  livro:
+                    type: object
+                    description: Campos do livro
+      400:
+        description: Parâmetro inválido
+        schema:
+          type: object
+          properties:
+            Erro:
+              type: string
+              example: O parâmetro 'limit' deve ser maior ou igual a 1
+      404:
+        description: Livro não encontrado
+    """
+    limite = _inteiro("limit", minimo=1)
+    campos = _campos_solicitados()
+
+    colunas = [CAMPOS_LIVRO[campo] for campo in campos]
+    for coluna in (Livros.Id, Livros.Sequencia):
+        if coluna not in colunas:
+            colunas.append(coluna)
+
+    # Uma leitura pela chave primária (livro, posição), com os vizinhos pelo Id.
+    consulta = (
+        db.session.query(LivrosSemelhantes.Similaridade, *colunas)
+        .join(Livros, Livros.Id == LivrosSemelhantes.SemelhanteId)
+        .filter(LivrosSemelhantes.LivroId == id_livro)
+        .order_by(LivrosSemelhantes.Posicao)
+    )
+    if limite is not None:
+        consulta = consulta.limit(limite)
+    semelhantes = consulta.all()
+    if not semelhantes:
+        db.session.query(Livros.Id).filter(Livros.Id == id_livro).first_or_404()
+
+    with serializando():
+        fragmentos = _livros_json(semelhantes, campos)
+        itens = [
+            b'{"livro":' + fragmento + b',"similaridade":' + serializacao.dumps(linha.Similaridade) + b"}"
+            for linha, fragmento in zip(semelhantes, fragmentos)
+        ]
+        return _resposta_json(
+            b'{"id":' + serializacao.dumps(id_livro) + b',"semelhantes":[' + b",".join(itens) + b"]}"
+        )
+
+
+# IDs por comando 'IN', abaixo do limite de parâmetros de versões antigas do SQLite (999).
+TAMANHO_BLOCO_IDS = 900
+
+
+@app.route("/api/v1/books/batch", methods=["GET", "POST"])
+@jwt_required()
+@leitura_do_catalogo
+def busca_livros_lote():
+    """
+    Retorna vários livros pelos IDs em uma única requisição.
+    ---
+    tags:
+      - Livros
+    security:
+      - Bearer: []
+    summary: Busca um lote de livros pelos IDs
+    description: >
+      Recebe uma lista de IDs (no corpo do POST ou em `ids=` no GET) e retorna os livros
+      encontrados na mesma ordem dos IDs informados, com a lista dos IDs que não existem.  
+      Os livros são lidos com consultas `IN` em blocos, e não um a um.  
+      IDs repetidos são retornados uma única vez.
+    parameters:
+      - name: body
+        in: body
+        required: false
+        description: IDs dos livros (POST)
+        schema:
+          type: object
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              example: [3, 1, 999999]
+      - name: ids
+        in: query
+        type: string
+        required: false
+        description: IDs separados por vírgula (GET)
+        example: 3,1,999999
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Campos a retornar, separados por vírgula
+        example: id,titulo,preco
+    responses:
+      304:
+        description: Não modificado (GET com `If-None-Match` igual ao ETag atual da resposta)
+      200:
+        description: Livros encontrados, na ordem dos IDs informados
+        schema:
+          type: object
+          properties:
+            livros:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    example: 3
+                  titulo:
+                    type: string
+                    example: "Soumission"
+            nao_encontrados:
+              type: array
+              items:
+                type: integer
+              example: [999999]
+      400:
+        description: IDs ausentes, inválidos ou acima do limite
+        schema:
+          type: object
+          properties:
+            Erro:
+              type: string
+              example: Os IDs devem ser números inteiros
+    """
+    ids = list(dict.fromkeys(_ids_solicitados()))
+    campos = _campos_solicitados()
+
+    colunas = [CAMPOS_LIVRO[campo] for campo in campos]
+    for coluna in (Livros.Id, Livros.Sequencia):
+        if coluna not in colunas:
+            colunas.append(coluna)
+
+    linhas = []
+    for inicio in range(0, len(ids), TAMANHO_BLOCO_IDS):
+        bloco = ids[inicio:inicio + TAMANHO_BLOCO_IDS]
+        linhas.extend(db.session.query(*colunas).filter(Livros.Id.in_(bloco)))
+
+    with serializando():
+        encontrados = dict(zip((linha.Id for linha in linhas), _livros_json(linhas, campos)))
+        return _resposta_json(
+            b'{"livros":[' + b",".join(encontrados[i] for i in ids if i in encontrados)
+            + b'],"nao_encontrados":' + serializacao.dumps([i for i in ids if i not in encontrados]) + b"}"
+        )
+
+
+def _data_iso(valor):
+    return valor.isoformat() if valor is not None else None
+
+
+@app.route("/api/v1/books/changes", methods=["GET"])
+@jwt_required()
+@leitura_do_catalogo
+def busca_alteracoes():
+    """
+    Retorna as alterações do catálogo a partir de um número de sequência.
+    ---
+    tags:
+      - Livros
+    security:
+      - Bearer: []
+    summary: Feed de alterações para sincronização incremental
+    description: >
+      Cada livro inserido, alterado ou removido pela ingestão recebe o próximo número de uma
+      sequência crescente. Um cliente que mantém uma cópia do catálogo guarda o último número
+      recebido e pede apenas o que mudou depois dele, em páginas ordenadas pela sequência.  
+      Com `since=0` o feed traz o catálogo inteiro (um item por livro, com a última alteração).  
+      Livros que sumiram do site aparecem como `"tipo": "removido"`.  
+      Para continuar, envie o `proximo_since` da resposta enquanto `tem_mais` for verdadeiro.
+    parameters:
+      - name: since
+        in: query
+        type: integer
+        required: false
+        description: Último número de sequência já recebido (padrão 0)
+        example: 1500
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Quantidade máxima de alterações por página
+        example: 100
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Campos do livro a retornar nas alterações, separados por vírgula
+        example: id,titulo,preco
+    responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
+      200:
+        description: Alterações posteriores a `since`, em ordem de sequência
+        schema:
+          type: object
+          properties:
+            alteracoes:
+              type: array
+              items:
+                type: object
+                properties:
+                  sequencia:
+                    type: integer
+                    example: 1501
+                  tipo:
+                    type: string
+                    enum: [alterado, removido]
+                    example: alterado
+                  id:
+                    type: integer
+                    example: 3
+                  livro:
+                    type: object
+                    description: Campos do livro (apenas em alterações)
+                  criado_em:
+                    type: string
+                    example: "2024-05-01T12:00:00"
+                  atualizado_em:
+                    type: string
+                    example: "2024-05-02T08:30:00"
+                  titulo:
+                    type: string
+                    description: Título do livro removido (apenas em remoções)
+                  removido_em:
+                    type: string
+                    example: "2024-05-02T08:30:00"
+            paginacao:
+              type: object
+              properties:
+                limite:
+                  type: integer
+                  example: 100
+                proximo_since:
+                  type: integer
+                  example: 1600
+                tem_mais:
+                  type: boolean
+                  example: true
+      400:
+        description: Parâmetro inválido
+        schema:
+          type: object
+          properties:
+            Erro:
+              type: string
+              example: O parâmetro 'since' deve ser maior ou igual a 0
+    """
+    desde = _inteiro("since", minimo=0) or 0
+    limite = min(_inteiro("limit", minimo=1) or current_app.config["LIMITE_PADRAO_PAGINA"],
+                 current_app.config["LIMITE_MAXIMO_PAGINA"])
+    campos = _campos_solicitados()
+
+    colunas = [CAMPOS_LIVRO[campo] for campo in campos]
+    for coluna in (Livros.Id, Livros.Sequencia, Livros.CriadoEm, Livros.AtualizadoEm):
+        if coluna not in colunas:
+            colunas.append(coluna)
+
+    # As duas tabelas são lidas pelo índice da sequência, um registro além do limite cada;
+    # a junção das duas listas ordenadas dá a página e indica se existe continuação.
+    alterados = (
+        db.session.query(*colunas)
+        .filter(Livros.Sequencia > desde)
+        .order_by(Livros.Sequencia)
+        .limit(limite + 1)
+        .all()
+    )
+    removidos = (
+        db.session.query(LivrosRemovidos)
+        .filter(LivrosRemovidos.Sequencia > desde)
+        .order_by(LivrosRemovidos.Sequencia)
+        .limit(limite + 1)
+        .all()
+    )
+
+    alteracoes = [
+        {
+            "sequencia": l.Sequencia,
+            "tipo": "alterado",
+            "id": l.Id,
+            "livro": _livro_para_dict(l, campos),
+            "criado_em": _data_iso(l.CriadoEm),
+            "atualizado_em": _data_iso(l.AtualizadoEm),
+        }
+        for l in alterados
+    ] + [
+        {
+            "sequencia": r.Sequencia,
+            "tipo": "removido",
+            "id": r.Id,
+            "titulo": r.Titulo,
+            "removido_em": _data_iso(r.RemovidoEm),
+        }
+        for r in removidos
+    ]
+    alteracoes.sort(key=lambda alteracao: alteracao["sequencia"])
+
+    tem_mais = len(alteracoes) > limite
+    alteracoes = alteracoes[:limite]
+    with serializando():
+        return _resposta_json(serializacao.dumps({
+            "alteracoes": alteracoes,
+            "paginacao": {
+                "limite": limite,
+                "proximo_since": alteracoes[-1]["sequencia"] if alteracoes else desde,
+                "tem_mais": tem_mais,
+            },
+        }))
 
 
 @app.route("/api/v1/books/search", methods=["GET"])
 @jwt_required()
+@leitura_do_catalogo
 def busca_livro_categoria():
     """
     Retorna os livros de acordo com o título ou categoria.
@@ -314,7 +1357,10 @@ def busca_livro_categoria():
     summary: Busca livros filtrando por título ou categoria
     description: >
       Retorna uma lista de livros que correspondem ao filtro informado via query string.  
-      Os parâmetros são opcionais e podem ser usados juntos ou separadamente.
+      Os parâmetros são opcionais e podem ser usados juntos ou separadamente.  
+      A busca usa o índice de texto completo (FTS5): cada palavra é buscada por prefixo, sem diferenciar
+      maiúsculas, minúsculas e acentos, e os resultados vêm ordenados por relevância.
+      Com `modo=substring`, usa a busca original por trecho do texto (ordenada por ID).
     parameters:
       - name: categoria
         in: query
@@ -328,7 +1374,70 @@ def busca_livro_categoria():
         required: false
         description: Título para filtrar os livros
         example: Himalayas
+      - name: modo
+        in: query
+        type: string
+        required: false
+        enum: [texto, substring]
+        description: Tipo de busca (padrão texto, com o índice de texto completo)
+        example: substring
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Quantidade máxima de livros por página (ativa a paginação por cursor)
+        example: 100
+      - name: after
+        in: query
+        type: string
+        required: false
+        description: Cursor da página (o valor de `proximo_cursor` da página anterior)
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Campos a retornar, separados por vírgula
+        example: id,titulo,preco
+      - name: min_price
+        in: query
+        type: number
+        required: false
+        description: Preço mínimo, em libras
+        example: 20.5
+      - name: max_price
+        in: query
+        type: number
+        required: false
+        description: Preço máximo, em libras
+        example: 45
+      - name: min_rating
+        in: query
+        type: integer
+        required: false
+        description: Avaliação mínima (1 a 5)
+        example: 4
+      - name: in_stock
+        in: query
+        type: boolean
+        required: false
+        description: Apenas livros em estoque (true) ou esgotados (false)
+        example: true
+      - name: categoria_id
+        in: query
+        type: integer
+        required: false
+        description: ID da categoria (ver `/api/v1/categories?detalhes=1`)
+        example: 3
+      - name: sort
+        in: query
+        type: string
+        required: false
+        enum: [id, -id, preco, -preco, avaliacao, -avaliacao, titulo, -titulo]
+        description: Ordenação (com '-' para decrescente)
+        example: -avaliacao
     responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
       200:
         description: Lista de livros filtrada retornada com sucesso
         schema:
@@ -362,37 +1471,105 @@ def busca_livro_categoria():
     categoria = request.args.get("categoria")
     titulo = request.args.get("titulo")
 
-    query = Livros.query
+    if (categoria or titulo) and request.args.get("modo") != "substring" and _busca_textual_disponivel():
+        busca = _resultados_busca_textual(categoria, titulo)
+        if busca is not None:
+            return _listar_livros(ordem=busca.c.relevancia, juncao=(busca, busca.c.id == Livros.Id))
+
+    filtros = []
 
     if categoria and titulo:
-        query = query.filter(
-            or_(
-                Livros.Categoria.ilike(f"%{categoria}%"),
+        filtros.append(
+            db.or_(
+                Livros.CategoriaId.in_(_ids_categorias(categoria)),
                 Livros.Titulo.ilike(f"%{titulo}%")
             )
         )
     elif categoria:
-        query = query.filter(Livros.Categoria.ilike(f"%{categoria}%"))
+        filtros.append(Livros.CategoriaId.in_(_ids_categorias(categoria)))
     elif titulo:
-        query = query.filter(Livros.Titulo.ilike(f"%{titulo}%"))
+        filtros.append(Livros.Titulo.ilike(f"%{titulo}%"))
 
-    livros = query.all()
+    return _listar_livros(*filtros)
+
+
+@app.route("/api/v1/books/suggest", methods=["GET"])
+@jwt_required()
+@leitura_do_catalogo
+def sugere_titulos():
+    """
+    Retorna sugestões de títulos para o texto digitado (autocompletar).
+    ---
+    tags:
+      - Livros
+    security:
+      - Bearer: []
+    summary: Sugestões de títulos por prefixo
+    description: >
+      Retorna os livros com uma palavra do título começando pelo texto informado (ou com o
+      título contendo o texto a partir de uma palavra), sem diferenciar maiúsculas, minúsculas
+      e acentos: `himal` e `only the hi` encontram "It's Only the Himalayas".  
+      Os livros vêm ordenados pela avaliação (maior primeiro); na mesma avaliação, os que
+      começam pelo texto vêm antes.  
+      As sugestões vêm de um índice em memória, sem consultar o banco a cada tecla digitada.
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Texto digitado
+        example: himal
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Quantidade máxima de sugestões (padrão 10, máximo 50)
+        example: 5
+    responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
+      200:
+        description: Sugestões em ordem de avaliação
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              id:
+                type: integer
+                example: 1
+              titulo:
+                type: string
+                example: "It's Only the Himalayas"
+              nota:
+                type: integer
+                example: 2
+      400:
+        description: Parâmetro inválido
+        schema:
+          type: object
+          properties:
+            Erro:
+              type: string
+              example: O parâmetro 'q' é obrigatório
+    """
+    texto = request.args.get("q", "").strip()
+    if not texto:
+        raise ParametroInvalido("O parâmetro 'q' é obrigatório")
+    limite = min(_inteiro("limit", minimo=1) or current_app.config["LIMITE_PADRAO_SUGESTOES"],
+                 current_app.config["LIMITE_MAXIMO_SUGESTOES"])
+
+    indice_titulos.sincronizar(db.engine, g.versao_catalogo)
+    sugestoes = indice_titulos.consultar(texto, limite)
+    with serializando():
+        return _resposta_json(serializacao.dumps([
+            {"id": id_livro, "titulo": titulo, "nota": nota} for id_livro, titulo, nota in sugestoes
+        ]))
 
-    return jsonify([
-        {
-            "id": l.Id,
-            "titulo": l.Titulo,
-            "Categoria": l.Categoria,
-            "preco": l.Preco,
-            "Avaliacao": l.Avaliacao,
-            "Disponibilidade": l.Disponibilidade,
-            "Imagem": l.Imagem
-        }
-        for l in livros
-    ])
 
 @app.route("/api/v1/categories", methods=["GET"])
 @jwt_required()
+@leitura_do_catalogo
 def busca_categorias():
     """
     Retorna as categorias de livros disponíveis na base.
@@ -404,8 +1581,19 @@ def busca_categorias():
     summary: Retorna todas as categorias de livros distintas
     description: >
       Endpoint que retorna uma lista das categorias distintas disponíveis no catálogo de livros.  
-      Não requer parâmetros.
+      Lê a tabela de categorias mantida pela ingestão, sem percorrer os livros.  
+      Com `detalhes=1`, retorna também o ID (usado no filtro `categoria_id`), a quantidade de livros
+      e os preços mínimo, máximo e médio (em centavos) de cada categoria.
+    parameters:
+      - name: detalhes
+        in: query
+        type: integer
+        required: false
+        description: Com 1, retorna os dados de cada categoria em vez de apenas o nome
+        example: 1
     responses:
+      304:
+        description: Não modificado (o `If-None-Match` enviado é igual ao ETag atual da resposta)
       200:
         description: Lista de categorias retornada com sucesso
         schema:
@@ -414,10 +1602,28 @@ def busca_categorias():
             type: string
             example: Travel
     """
-    #id_livro = request.args.get('id')
-    categorias = db.session.query(Livros.Categoria).distinct().all()
-    categorias_lista = [c[0] for c in categorias]
-    return jsonify(categorias_lista)
+    categorias = (
+        Categorias.query
+        .filter(Categorias.QuantidadeLivros > 0)
+        .order_by(Categorias.Id)
+        .all()
+    )
+
+    with serializando():
+        if request.args.get("detalhes") not in ("1", "true"):
+            return _resposta_json(serializacao.dumps([c.Nome for c in categorias]))
+
+        return _resposta_json(serializacao.dumps([
+            {
+                "id": c.Id,
+                "nome": c.Nome,
+                "quantidade_livros": c.QuantidadeLivros,
+                "preco_minimo_centavos": c.PrecoMinimoCentavos,
+                "preco_maximo_centavos": c.PrecoMaximoCentavos,
+                "preco_medio_centavos": round(c.PrecoMedioCentavos) if c.PrecoMedioCentavos is not None else None,
+            }
+            for c in categorias
+        ]))
 
 
 
@@ -447,7 +1653,7 @@ responses:
               type: string
               example: "Banco: Tudo ok por aqui."
   503:
-    description: Problema, algum dos serviços não está funcionando.
+    description: Problema, algum dos serviços não está funcionando (ou o banco ainda não foi migrado).
     content:
       application/json:
         schema:
@@ -465,14 +1671,21 @@ responses:
     banco_status = 'Banco: Tudo ok por aqui.'
 
     try:
-        Livros.query.get_or_404(1)
-        banco_ok = True
+        estado = _banco_verificado()
+        if estado["falha"]:
+            raise BancoIndisponivel(estado["falha"])
+        if estado["pendente"]:
+            banco_status = "Banco: Migração pendente (execute 'python alimenta_base.py --migrar')."
+        else:
+            Livros.query.get_or_404(1)
+        banco_ok = not estado["pendente"]
     except Exception:
         banco_ok = False
+        banco_status = 'Banco: Problema na conexão.'
 
     resposta_final = {
         'Servidor de api': flask_status,
-        'Banco de dados': banco_status if banco_ok else 'Banco: Problema na conexão.'
+        'Banco de dados': banco_status
     }
 
     if banco_ok:
@@ -481,6 +1694,68 @@ responses:
         return jsonify(resposta_final), 503
       
 
+@app.route('/metrics', methods=['GET'])
+def exporta_metricas():
+    """
+Métricas da API no formato do Prometheus.
+---
+tags:
+  - Health
+summary: Retorna as métricas de desempenho da API
+description: >
+  Histogramas de latência por rota, quantidade e tempo dos comandos SQL por requisição,
+  tempo de serialização JSON e tamanho das respostas, no formato de texto do Prometheus.  
+  Não requer parâmetros.
+produces:
+  - text/plain
+responses:
+  200:
+    description: Métricas no formato de exposição do Prometheus
+"""
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4")
+
+
+# DOCUMENTAÇÃO (Swagger UI)
+# A especificação OpenAPI é gerada a partir das docstrings das rotas por 'gerar_apispec.py'
+# (o único lugar que usa o flasgger) e gravada em 'apispec.json'. A API só lê esse arquivo
+# na primeira visita à documentação, em vez de importar o flasgger e analisar o YAML de
+# todas as rotas a cada partida. A interface vem da distribuição 'swagger-ui-dist'.
+ARQUIVO_APISPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "apispec.json")
+
+PAGINA_APIDOCS = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>{titulo}</title>
+  <link rel="stylesheet" href="{ui}/swagger-ui.css">
+</head>
+<body>
+  <div id="swagger-ui"></div>
+  <script src="{ui}/swagger-ui-bundle.js"></script>
+  <script>
+    SwaggerUIBundle({{url: "/apispec_1.json", dom_id: "#swagger-ui", deepLinking: true}});
+  </script>
+</body>
+</html>
+"""
+
+
+@lru_cache(maxsize=1)
+def _apispec():
+    with open(ARQUIVO_APISPEC, "rb") as arquivo:
+        return arquivo.read()
+
+
+@app.route("/apispec_1.json", methods=["GET"])
+def especificacao_api():
+    return Response(_apispec(), mimetype="application/json")
+
+
+@app.route("/apidocs/", methods=["GET"])
+def documentacao_api():
+    return PAGINA_APIDOCS.format(titulo=app.config["SWAGGER"]["title"], ui=app.config["SWAGGER_UI_URL"])
+
+
 # ROTAS
 
 # INICIAR APP
@@ -0,0 +1,221 @@
+# Métricas da API no formato de texto do Prometheus, sem dependências externas.
+#
+# Por requisição são medidos:
+#   - a latência, em um histograma por rota;
+#   - a quantidade e o tempo total dos comandos SQL (eventos do SQLAlchemy na engine;
+#     o tempo é o da execução de cada comando, sem a leitura das linhas pelo cursor);
+#   - o tempo gasto serializando JSON (provedor JSON do Flask instrumentado e os trechos
+#     marcados com 'serializando()');
+#   - o tamanho da resposta.
+# Com METRICAS_LIMITE_LENTA_MS definido, as requisições mais lentas que o limite são
+# registradas no log 'livros.lentas' junto com os comandos SQL que executaram.
+#
+# Cada observação custa alguns contadores sob uma trava, então a instrumentação pode
+# ficar ligada em produção (METRICAS_ATIVAS no config.py).
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+# Limites dos histogramas: segundos (latência, SQL e serialização) e bytes (respostas).
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Comandos SQL guardados por requisição para o log de requisições lentas.
+MAXIMO_COMANDOS_REGISTRADOS = 50
+
+log_lentas = logging.getLogger("livros.lentas")
+
+
+class Histograma:
+    def __init__(self, nome, descricao, limites):
+        self.nome = nome
+        self.descricao = descricao
+        self.limites = limites
+        # rótulos -> [contagem por faixa..., soma, total]
+        self._series = {}
+
+    def observar(self, rotulos, valor):
+        serie = self._series.get(rotulos)
+        if serie is None:
+            serie = self._series[rotulos] = [0] * len(self.limites) + [0.0, 0]
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                serie[i] += 1
+                break
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        for rotulos, serie in sorted(self._series.items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.limites, serie):
+                acumulado += quantidade
+                linhas.append(f'{self.nome}_bucket{_rotulos(rotulos, le=limite)} {acumulado}')
+            linhas.append(f'{self.nome}_bucket{_rotulos(rotulos, le="+Inf")} {serie[-1]}')
+            linhas.append(f'{self.nome}_sum{_rotulos(rotulos)} {serie[-2]}')
+            linhas.append(f'{self.nome}_count{_rotulos(rotulos)} {serie[-1]}')
+        return linhas
+
+
+class Contador:
+    def __init__(self, nome, descricao):
+        self.nome = nome
+        self.descricao = descricao
+        self._series = {}
+
+    def incrementar(self, rotulos, valor=1):
+        self._series[rotulos] = self._series.get(rotulos, 0) + valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        for rotulos, valor in sorted(self._series.items()):
+            linhas.append(f"{self.nome}{_rotulos(rotulos)} {valor}")
+        return linhas
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(rotulos, le=None):
+    # (("rota", "/api/v1/books"), ("metodo", "GET")) -> {rota="/api/v1/books",metodo="GET"}
+    pares = list(rotulos) + ([("le", le)] if le is not None else [])
+    texto = ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares)
+    return "{" + texto + "}" if texto else ""
+
+
+class Metricas:
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.requisicoes = Contador("livros_http_requisicoes_total", "Requisições atendidas, por rota, método e status.")
+        self.latencia = Histograma("livros_http_latencia_segundos", "Latência das requisições, por rota.",
+                                   LIMITES_SEGUNDOS)
+        self.consultas = Histograma("livros_sql_consultas_por_requisicao", "Comandos SQL executados por requisição.",
+                                    LIMITES_CONSULTAS)
+        self.tempo_sql = Histograma("livros_sql_segundos_por_requisicao",
+                                    "Tempo total dos comandos SQL por requisição.", LIMITES_SEGUNDOS)
+        self.serializacao = Histograma("livros_serializacao_segundos_por_requisicao",
+                                       "Tempo gerando JSON por requisição.", LIMITES_SEGUNDOS)
+        self.tamanho = Histograma("livros_http_resposta_bytes", "Tamanho do corpo das respostas (sem streaming).",
+                                  LIMITES_BYTES)
+        self.lentas = Contador("livros_http_requisicoes_lentas_total",
+                               "Requisições acima de METRICAS_LIMITE_LENTA_MS, por rota.")
+
+    def registrar(self, rota, metodo, status, duracao, consultas, tempo_sql, serializacao, tamanho, lenta):
+        por_rota = (("rota", rota),)
+        with self._trava:
+            self.requisicoes.incrementar((("rota", rota), ("metodo", metodo), ("status", status)))
+            self.latencia.observar(por_rota, duracao)
+            self.consultas.observar(por_rota, consultas)
+            self.tempo_sql.observar(por_rota, tempo_sql)
+            self.serializacao.observar(por_rota, serializacao)
+            if tamanho is not None:
+                self.tamanho.observar(por_rota, tamanho)
+            if lenta:
+                self.lentas.incrementar(por_rota)
+
+    def exportar(self):
+        with self._trava:
+            linhas = []
+            for metrica in (self.requisicoes, self.latencia, self.consultas, self.tempo_sql,
+                            self.serializacao, self.tamanho, self.lentas):
+                linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+metricas = Metricas()
+
+
+def _em_requisicao():
+    return has_request_context() and "metricas_inicio" in g
+
+
+class ProvedorJSONMedido(DefaultJSONProvider):
+    # O mesmo provedor JSON do Flask, somando o tempo de cada 'dumps' à requisição atual.
+    def dumps(self, obj, **kwargs):
+        if not _em_requisicao():
+            return super().dumps(obj, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            g.metricas_serializacao += time.perf_counter() - inicio
+
+
+@contextmanager
+def serializando():
+    # Soma à requisição atual o tempo de um trecho que gera JSON sem passar pelo
+    # provedor do Flask (ex: as listas de livros montadas por serializacao.py).
+    if not _em_requisicao():
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.metricas_serializacao += time.perf_counter() - inicio
+
+
+def _antes_do_comando(conexao, cursor, comando, parametros, contexto, executemany):
+    # O início fica no contexto de execução do próprio comando (e não na conexão, que
+    # volta ao pool): se o comando falhar, 'after_cursor_execute' não é chamado e o
+    # valor some junto com o contexto.
+    contexto.metricas_inicio = time.perf_counter()
+
+
+def _depois_do_comando(conexao, cursor, comando, parametros, contexto, executemany):
+    duracao = time.perf_counter() - contexto.metricas_inicio
+    if _em_requisicao():
+        g.metricas_consultas += 1
+        g.metricas_tempo_sql += duracao
+        if g.metricas_comandos is not None and len(g.metricas_comandos) < MAXIMO_COMANDOS_REGISTRADOS:
+            g.metricas_comandos.append((duracao, comando))
+
+
+def instrumentar(app, engine):
+    # Liga a coleta de métricas na aplicação e na engine do SQLAlchemy.
+    limite_lenta = app.config.get("METRICAS_LIMITE_LENTA_MS")
+
+    app.json = ProvedorJSONMedido(app)
+    event.listen(engine, "before_cursor_execute", _antes_do_comando)
+    event.listen(engine, "after_cursor_execute", _depois_do_comando)
+
+    @app.before_request
+    def iniciar_medicao():
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_consultas = 0
+        g.metricas_tempo_sql = 0.0
+        g.metricas_serializacao = 0.0
+        # Os comandos só são guardados quando o log de requisições lentas está ligado.
+        g.metricas_comandos = [] if limite_lenta is not None else None
+
+    @app.after_request
+    def registrar_medicao(resposta):
+        if "metricas_inicio" not in g:
+            return resposta
+        duracao = time.perf_counter() - g.metricas_inicio
+        rota = request.url_rule.rule if request.url_rule is not None else "(sem rota)"
+        tamanho = None if resposta.is_streamed else resposta.calculate_content_length()
+        lenta = limite_lenta is not None and duracao * 1000 >= limite_lenta
+
+        metricas.registrar(
+            rota, request.method, resposta.status_code, duracao, g.metricas_consultas,
+            g.metricas_tempo_sql, g.metricas_serializacao, tamanho, lenta,
+        )
+        if lenta:
+            log_lentas.warning(
+                "%s %s -> %s em %.1fms (%d comandos SQL, %.1fms; JSON %.1fms)\n%s",
+                request.method, request.full_path.rstrip("?"), resposta.status_code, duracao * 1000, g.metricas_consultas,
+                g.metricas_tempo_sql * 1000, g.metricas_serializacao * 1000,
+                "\n".join(f"  [{tempo * 1000:.1f}ms] {' '.join(comando.split())}"
+                          for tempo, comando in g.metricas_comandos),
+            )
+        return resposta
@@ -0,0 +1,235 @@
+# Livros semelhantes, calculados pela ingestão para '/api/v1/books/<id>/similar'.
+#
+# Cada livro vira um vetor com quatro blocos, cada um de norma 1 e multiplicado pela
+# raiz do seu peso em PESOS:
+#   - título: TF-IDF das palavras e dos trigramas de caracteres de cada palavra
+#     (parecidos: "Himalaya" e "Himalayas"), espalhados por hashing em DIMENSOES_TITULO
+#     posições ("hashing trick", com sinal para as colisões se anularem em média);
+#   - categoria: a categoria do livro (mesma categoria = 1);
+#   - preço e nota, normalizados entre 0 e 1 e codificados por funções de base radial
+#     (valores próximos = blocos parecidos).
+# O produto interno de dois vetores é a média ponderada dos cossenos dos blocos (1 para
+# livros iguais). A categoria (um vetor "one-hot" com uma posição por categoria) é
+# comparada direto pelos IDs, sem montar esse bloco.
+#
+# Os vizinhos são calculados em blocos de livros: uma multiplicação de matrizes (NumPy)
+# dá a similaridade de cada livro do bloco com todos os outros, e 'argpartition' separa
+# os K maiores sem ordenar a linha inteira (só nos grupos de colunas onde eles podem
+# estar). O resultado vai para a tabela 'livros_semelhantes' (livro, posição) ->
+# (semelhante, similaridade), e a API responde com uma leitura pela chave primária.
+#
+# Requer o NumPy; sem ele a ingestão não calcula os vizinhos (DISPONIVEL = False).
+
+import math
+import re
+import time
+import zlib
+from collections import Counter
+
+from sqlalchemy import text
+
+from banco import incrementar_versao_catalogo
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DISPONIVEL = numpy is not None
+
+# Vizinhos guardados por livro.
+K_SEMELHANTES = 10
+
+# Peso de cada bloco na similaridade (somam 1).
+PESOS = {"titulo": 0.55, "categoria": 0.25, "preco": 0.12, "nota": 0.08}
+
+DIMENSOES_TITULO = 128
+# Centros das funções de base radial de preço e nota.
+CENTROS_PRECO = 8
+CENTROS_NOTA = 5
+
+# Colunas por grupo na escolha dos k maiores (ver _maiores).
+COLUNAS_POR_GRUPO = 256
+
+# Similaridades calculadas de uma vez (livros do bloco x catálogo), ~200 MB em float32.
+ELEMENTOS_POR_BLOCO = 50_000_000
+
+# Linhas gravadas por comando.
+LOTE_GRAVACAO = 5000
+
+CONSULTA_LIVROS = text("SELECT id, titulo, categoria_id, preco_centavos, nota FROM livros ORDER BY id")
+
+
+def termos(titulo):
+    # Palavras e trigramas de cada palavra (com as bordas marcadas): "moon" ->
+    # "moon", "<mo", "moo", "oon", "on>".
+    resultado = []
+    for palavra in re.findall(r"\w+", (titulo or "").casefold()):
+        resultado.append(palavra)
+        marcada = f"<{palavra}>"
+        resultado.extend(marcada[i:i + 3] for i in range(len(marcada) - 2))
+    return resultado
+
+
+def _hash(termo):
+    # Estável entre processos (o hash() do Python muda a cada execução).
+    return zlib.crc32(termo.encode())
+
+
+def _base_radial(valores, centros):
+    # valores entre 0 e 1 (NaN = ausente) -> matriz (n x centros) com norma 1 por linha,
+    # zerada nos ausentes.
+    posicoes = numpy.linspace(0.0, 1.0, centros, dtype=numpy.float32)
+    largura = 1.0 / (centros - 1)
+    bloco = numpy.exp(-(((valores[:, None] - posicoes[None, :]) / largura) ** 2))
+    bloco = numpy.nan_to_num(bloco, nan=0.0)
+    return _normalizar_linhas(bloco)
+
+
+def _normalizar_linhas(matriz):
+    normas = numpy.linalg.norm(matriz, axis=1, keepdims=True)
+    return numpy.divide(matriz, normas, out=numpy.zeros_like(matriz), where=normas > 0)
+
+
+def _entre_0_e_1(valores):
+    if numpy.isnan(valores).all():
+        return valores.astype(numpy.float32)
+    minimo, maximo = numpy.nanmin(valores), numpy.nanmax(valores)
+    if not maximo > minimo:
+        return numpy.where(numpy.isnan(valores), numpy.nan, 0.5).astype(numpy.float32)
+    return ((valores - minimo) / (maximo - minimo)).astype(numpy.float32)
+
+
+def vetores(linhas):
+    # linhas: (id, título, categoria_id, preço em centavos, nota) de cada livro.
+    # Devolve (ids, matriz n x d em float32, categorias), com os blocos já pesados.
+    quantidade = len(linhas)
+    ids = numpy.fromiter((linha[0] for linha in linhas), dtype=numpy.int64, count=quantidade)
+    categorias = numpy.fromiter((-1 if linha[2] is None else linha[2] for linha in linhas),
+                                dtype=numpy.int64, count=quantidade)
+
+    # Título: frequência de cada termo no livro e em quantos livros ele aparece (IDF).
+    contagens = [Counter(termos(linha[1])) for linha in linhas]
+    documentos = Counter(termo for contagem in contagens for termo in contagem)
+    idf = {termo: math.log((1 + quantidade) / (1 + frequencia)) + 1 for termo, frequencia in documentos.items()}
+    posicao = {}
+    for termo in documentos:
+        valor = _hash(termo)
+        posicao[termo] = (valor % DIMENSOES_TITULO, 1.0 if valor & 0x80000000 else -1.0)
+
+    linhas_matriz, colunas, pesos = [], [], []
+    for linha_matriz, contagem in enumerate(contagens):
+        for termo, frequencia in contagem.items():
+            coluna, sinal = posicao[termo]
+            linhas_matriz.append(linha_matriz)
+            colunas.append(coluna)
+            pesos.append(sinal * (1 + math.log(frequencia)) * idf[termo])
+    titulo = numpy.zeros((quantidade, DIMENSOES_TITULO), dtype=numpy.float32)
+    numpy.add.at(titulo, (numpy.array(linhas_matriz, dtype=numpy.int64), numpy.array(colunas, dtype=numpy.int64)),
+                 numpy.array(pesos, dtype=numpy.float32))
+
+    precos = numpy.array([numpy.nan if linha[3] is None else linha[3] for linha in linhas], dtype=numpy.float64)
+    notas = numpy.array([numpy.nan if linha[4] is None else linha[4] for linha in linhas], dtype=numpy.float64)
+
+    matriz = numpy.hstack([
+        _normalizar_linhas(titulo) * math.sqrt(PESOS["titulo"]),
+        _base_radial(_entre_0_e_1(precos), CENTROS_PRECO) * math.sqrt(PESOS["preco"]),
+        _base_radial(_entre_0_e_1(notas), CENTROS_NOTA) * math.sqrt(PESOS["nota"]),
+    ]).astype(numpy.float32)
+    return ids, matriz, categorias
+
+
+def _maiores(similaridades, k):
+    # Posições dos k maiores valores de cada linha (fora de ordem). As colunas são
+    # divididas em grupos de COLUNAS_POR_GRUPO: os k maiores valores da linha estão
+    # sempre nos k grupos de maior máximo, então 'argpartition' só percorre esses grupos.
+    # (O máximo por grupo é bem mais rápido que um 'argpartition' na linha inteira.)
+    linhas, colunas = similaridades.shape
+    if colunas % COLUNAS_POR_GRUPO or colunas < 4 * k * COLUNAS_POR_GRUPO:
+        return numpy.argpartition(similaridades, -k, axis=1)[:, -k:]
+    maximos = similaridades.reshape(linhas, -1, COLUNAS_POR_GRUPO).max(axis=2)
+    grupos = numpy.argpartition(maximos, -k, axis=1)[:, -k:]
+    candidatas = (grupos[:, :, None] * COLUNAS_POR_GRUPO + numpy.arange(COLUNAS_POR_GRUPO)).reshape(linhas, -1)
+    escolhidas = numpy.argpartition(numpy.take_along_axis(similaridades, candidatas, axis=1), -k, axis=1)[:, -k:]
+    return numpy.take_along_axis(candidatas, escolhidas, axis=1)
+
+
+def vizinhos(matriz, categorias, k=K_SEMELHANTES, elementos_por_bloco=ELEMENTOS_POR_BLOCO):
+    # Para cada bloco de livros: (início do bloco, posições dos k vizinhos, similaridades),
+    # com os vizinhos em ordem decrescente de similaridade (empate: menor posição antes).
+    quantidade = len(matriz)
+    k = min(k, quantidade - 1)
+    if k <= 0:
+        return
+    # Colunas completadas até um múltiplo do grupo (similaridade -inf, nunca escolhidas).
+    colunas = quantidade + (-quantidade) % COLUNAS_POR_GRUPO
+    transposta = numpy.zeros((matriz.shape[1], colunas), dtype=numpy.float32)
+    transposta[:, :quantidade] = matriz.T
+    categorias_colunas = numpy.full(colunas, -1, dtype=numpy.int64)
+    categorias_colunas[:quantidade] = categorias
+
+    tamanho_bloco = max(1, elementos_por_bloco // colunas)
+    for inicio in range(0, quantidade, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, quantidade)
+        similaridades = matriz[inicio:fim] @ transposta
+        categorias_bloco = categorias[inicio:fim, None]
+        mesma_categoria = (categorias_bloco == categorias_colunas[None, :]) & (categorias_bloco >= 0)
+        numpy.add(similaridades, PESOS["categoria"], out=similaridades, where=mesma_categoria)
+        similaridades[:, quantidade:] = -numpy.inf
+        # O próprio livro não é vizinho dele mesmo.
+        linhas = numpy.arange(fim - inicio)
+        similaridades[linhas, linhas + inicio] = -numpy.inf
+
+        melhores = _maiores(similaridades, k)
+        valores = numpy.take_along_axis(similaridades, melhores, axis=1)
+        ordem = numpy.lexsort((melhores, -valores), axis=1)
+        yield inicio, numpy.take_along_axis(melhores, ordem, axis=1), numpy.take_along_axis(valores, ordem, axis=1)
+
+
+def calcular_semelhantes(engine, k=K_SEMELHANTES):
+    # Recalcula os vizinhos de todos os livros. Os livros são lidos em uma transação e
+    # o resultado é gravado em outra, curta: a trava de escrita do SQLite não fica presa
+    # durante o cálculo. O conteúdo de 'livros_semelhantes' é trocado na mesma transação
+    # que incrementa a versão do catálogo (as respostas em cache de '/similar' deixam de
+    # valer junto). Devolve o tempo de cada etapa.
+    tempos = {}
+    inicio = time.perf_counter()
+    with engine.connect() as conexao:
+        linhas = conexao.execute(CONSULTA_LIVROS).all()
+    ids, matriz, categorias = vetores(linhas)
+    tempos["vetores_s"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    blocos = list(vizinhos(matriz, categorias, k))
+    tempos["vizinhos_s"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    comando = text(
+        "INSERT INTO livros_semelhantes (livro_id, posicao, semelhante_id, similaridade) "
+        "VALUES (:livro_id, :posicao, :semelhante_id, :similaridade)"
+    )
+    with engine.begin() as conexao:
+        conexao.execute(text("DELETE FROM livros_semelhantes"))
+        lote = []
+        for primeiro, melhores, valores in blocos:
+            livros_bloco = ids[primeiro:primeiro + len(melhores)].tolist()
+            for livro, semelhantes, similaridades in zip(livros_bloco, ids[melhores].tolist(), valores.tolist()):
+                lote.extend(
+                    {"livro_id": livro, "posicao": posicao, "semelhante_id": semelhante,
+                     "similaridade": round(similaridade, 4)}
+                    for posicao, (semelhante, similaridade) in enumerate(zip(semelhantes, similaridades), start=1)
+                )
+                if len(lote) >= LOTE_GRAVACAO:
+                    conexao.execute(comando, lote)
+                    lote = []
+        if lote:
+            conexao.execute(comando, lote)
+        incrementar_versao_catalogo(conexao)
+    tempos["gravacao_s"] = time.perf_counter() - inicio
+
+    tempos["livros"] = len(ids)
+    return tempos
+
+
+def semelhantes_calculados(conexao):
+    return conexao.execute(text("SELECT 1 FROM livros_semelhantes LIMIT 1")).first() is not None
@@ -0,0 +1,74 @@
+# Serialização dos livros nas respostas da API.
+#
+# O JSON de cada livro (com os campos pedidos em 'fields=') é guardado em memória, com a
+# chave (campos, Id, sequência). A sequência muda a cada gravação do livro pela ingestão
+# (ver 'Feed de alterações' em banco.py), então um livro alterado nunca reaproveita o JSON
+# antigo. As listas são montadas juntando os trechos já prontos, sem criar um dicionário
+# nem chamar o codificador JSON de novo para cada livro a cada requisição.
+#
+# Com o orjson instalado ele é usado como codificador; sem ele, o 'json' da biblioteca
+# padrão com as mesmas opções do Flask (chaves ordenadas, ASCII, sem espaços), o que
+# gera exatamente os mesmos bytes de antes.
+
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+else:
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode()
+
+
+class SerializadorLivros:
+    # Quando o limite de itens é atingido o cache é esvaziado de uma vez: as leituras não
+    # pagam a manutenção de uma ordem LRU, e os livros mais pedidos voltam logo em seguida.
+    def __init__(self, limite_itens):
+        self.limite_itens = limite_itens
+        self._fragmentos = {}
+        self._trava = threading.Lock()
+
+    def fragmentos(self, linhas, campos, versao_da_linha, para_dict):
+        # JSON (bytes) de cada linha. 'versao_da_linha(linha)' devolve (Id, sequência);
+        # sem sequência (livro gravado fora da ingestão e ainda não migrado) não há cache.
+        chave_campos = tuple(campos)
+        guardados = self._fragmentos
+        resultado = []
+        novos = {}
+        for linha in linhas:
+            id_livro, sequencia = versao_da_linha(linha)
+            chave = (chave_campos, id_livro, sequencia)
+            fragmento = guardados.get(chave)
+            if fragmento is None:
+                fragmento = dumps(para_dict(linha))
+                if sequencia is not None:
+                    novos[chave] = fragmento
+            resultado.append(fragmento)
+        if novos:
+            self._guardar(novos)
+        return resultado
+
+    def lista(self, linhas, campos, versao_da_linha, para_dict):
+        return b"[" + b",".join(self.fragmentos(linhas, campos, versao_da_linha, para_dict)) + b"]"
+
+    def _guardar(self, novos):
+        if len(novos) > self.limite_itens:
+            return
+        with self._trava:
+            if len(self._fragmentos) + len(novos) > self.limite_itens:
+                self._fragmentos = {}
+            self._fragmentos.update(novos)
+
+    def __len__(self):
+        return len(self._fragmentos)
+
+    def limpar(self):
+        with self._trava:
+            self._fragmentos = {}